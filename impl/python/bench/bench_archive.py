@@ -0,0 +1,110 @@
+"""Archive size and per-message decode latency vs. gzip.
+
+    python bench/bench_archive.py [--messages N] [--repeat N]
+
+Three corpora: the repository examples, `--messages` small synthetic
+messages (10–40 records each, distinct seeds), and the medium corpus
+profiles. Each is stored as:
+
+  gzip each     every message gzipped on its own (seekable, like the archive)
+  gzip stream   all messages in one gzip stream (best ratio, not seekable)
+  archive       `ArchiveWriter` with the built-in vocabulary dictionary
+  trained       `ArchiveWriter` with `build_dictionary()` of a disjoint sample
+
+Ratio is input bytes over output bytes (the archive file, dictionary and
+index included); "frames" leaves out the dictionary, which an archive stores
+once however many messages it holds. Decode is the mean time to get one
+message's text back by index (for gzip stream: the whole stream, divided by
+the message count, which hides that it cannot seek).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import LARGE, PROFILES, CorpusSpec, examples, generate  # noqa: E402
+from pairl.archive import Archive, ArchiveWriter, build_dictionary  # noqa: E402
+
+
+def small(n: int, seed0: int) -> list[str]:
+    rng = random.Random(seed0)
+    return [generate(CorpusSpec(records=rng.randint(10, 40), turns=2, tool_depth=1, content_len=120,
+                                seed=seed0 + i)) for i in range(n)]
+
+
+def _per_message(fn, n: int, repeat: int) -> float:
+    rng = random.Random(0)
+    picks = [rng.randrange(n) for _ in range(max(n, 200))]
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for i in picks:
+            fn(i)
+        best = min(best, (time.perf_counter() - t0) / len(picks))
+    return best
+
+
+def measure(texts: list[str], zdict: bytes, tmp: str, repeat: int) -> list[tuple[str, float, float, float]]:
+    data = [t.encode("utf-8") for t in texts]
+    size = sum(map(len, data))
+    out = []
+
+    each = [gzip.compress(d, 9) for d in data]
+    ratio = size / sum(map(len, each))
+    out.append(("gzip each", ratio, ratio, _per_message(lambda i: gzip.decompress(each[i]), len(each), repeat)))
+    stream = gzip.compress(b"".join(data), 9)
+    t0 = time.perf_counter()
+    gzip.decompress(stream)
+    out.append(("gzip stream", size / len(stream), size / len(stream), (time.perf_counter() - t0) / len(data)))
+
+    for label, d in (("archive", None), ("trained", zdict)):
+        path = os.path.join(tmp, f"{label}.pza")
+        if os.path.exists(path):
+            os.remove(path)
+        with ArchiveWriter(path, dictionary=d) as w:
+            w.extend(data)
+        with Archive(path) as a:
+            assert a.raw(len(data) - 1) == data[-1]
+            total = os.path.getsize(path)
+            decode = _per_message(a.raw, len(a), repeat)
+            out.append((label, size / total, size / (total - len(a.dictionary)), decode))
+    return out
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv[1:])
+
+    zdict = build_dictionary(small(500, 1_000_000))  # training sample, disjoint from every corpus
+    corpora = {
+        "examples": list(examples().values()),
+        f"{args.messages} small": small(args.messages, 0),
+        "profiles": [generate(replace(spec, seed=7)) for name, spec in PROFILES.items()
+                     if name not in LARGE and spec.records <= 1_000],
+    }
+    print(f"trained dictionary: {len(zdict)} bytes")
+    print(f"{'corpus':<12} {'KB':>7} {'format':<12} {'ratio':>6} {'frames':>7} {'decode µs/msg':>14}")
+    with tempfile.TemporaryDirectory(prefix="pairl-archive-") as tmp:
+        for name, texts in corpora.items():
+            kb = sum(len(t.encode("utf-8")) for t in texts) / 1024
+            for label, ratio, frames, decode in measure(texts, zdict, tmp, args.repeat):
+                print(f"{name:<12} {kb:>7.0f} {label:<12} {ratio:>6.2f} {frames:>7.2f} {decode * 1e6:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,59 @@
+"""Columnar compaction: size saved on the examples and corpus profiles.
+
+    python bench/bench_compact.py [--measure bytes|tokens] [--cases PATTERN ...]
+
+For each case: the input as written, its canonical `key=value` form, and
+`compact()` of it, in bytes and estimated tokens, plus the compaction time.
+"saved" is relative to the canonical form, which is what an encoder that
+never builds blocks would send. Every output is checked to hash like its input.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from corpus import LARGE, PROFILES, examples, generate  # noqa: E402
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--measure", choices=("bytes", "tokens"), default="bytes")
+    ap.add_argument("--cases", nargs="*", default=[], metavar="PATTERN")
+    args = ap.parse_args(argv[1:])
+
+    cases = dict(examples())
+    cases.update((name, generate(spec)) for name, spec in PROFILES.items() if name not in LARGE)
+    print(f"{'case':<32} {'input B':>8} {'canon B':>8} {'compact B':>10} {'saved':>6} "
+          f"{'canon tok':>10} {'compact tok':>12} {'saved':>6} {'ms':>7}")
+    totals = [0, 0, 0, 0, 0]
+    for name, text in cases.items():
+        if args.cases and not any(fnmatch.fnmatchcase(name, p) for p in args.cases):
+            continue
+        msg = pairl.parse(text)
+        canon = pairl.canonicalize(msg, for_hash=False)
+        t0 = time.perf_counter()
+        out = pairl.compact(msg, measure=args.measure)
+        ms = (time.perf_counter() - t0) * 1e3
+        assert pairl.compute_hash(pairl.parse(out)) == pairl.compute_hash(msg), name
+        sizes = [len(text.encode("utf-8")), len(canon.encode("utf-8")), len(out.encode("utf-8")),
+                 pairl.estimate_tokens(canon), pairl.estimate_tokens(out)]
+        totals = [a + b for a, b in zip(totals, sizes)]
+        print(f"{name:<32} {sizes[0]:>8} {sizes[1]:>8} {sizes[2]:>10} {1 - sizes[2] / sizes[1]:>6.1%} "
+              f"{sizes[3]:>10} {sizes[4]:>12} {1 - sizes[4] / sizes[3]:>6.1%} {ms:>7.2f}")
+    if totals[1]:
+        print(f"{'total':<32} {totals[0]:>8} {totals[1]:>8} {totals[2]:>10} {1 - totals[2] / totals[1]:>6.1%} "
+              f"{totals[3]:>10} {totals[4]:>12} {1 - totals[4] / totals[3]:>6.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,79 @@
+"""Record-level deltas: `diff()` size and cost vs. re-sending the whole body.
+
+    python bench/bench_diff.py [--sizes N ...] [--changed F ...]
+
+A session of `--sizes` records (a seeded corpus message) is edited: a
+`--changed` fraction of its records is touched, split evenly between
+modified (a value changed, same @rid), deleted, and newly inserted records.
+Reports the canonical size of the new version, the delta size, and the
+time to diff and to apply the delta (with and without the `!base`/`!hash`
+checks). Every applied delta is checked to reproduce the target's hash.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROFILES, generate  # noqa: E402
+from pairl import Message, apply_delta, canonicalize, compute_hash, diff, parse  # noqa: E402
+from pairl.core import Record  # noqa: E402
+
+
+def edited(base: Message, changed: float, seed: int) -> Message:
+    rng = random.Random(seed)
+    records = list(base.iter_records())
+    n = max(3, int(len(records) * changed)) // 3
+    for i in rng.sample([i for i, r in enumerate(records) if r.kv], n):
+        r = records[i]
+        records[i] = Record(r.kind, r.name, {**r.kv, "rev": "2"}, rid=r.rid, m=r.m)
+    for i in sorted(rng.sample(range(len(records)), n), reverse=True):
+        del records[i]
+    for k in range(n):
+        records.insert(rng.randrange(len(records) + 1), Record("fact", "fact", {"added": str(k)}))
+    return Message(headers={**base.headers, "id": base.headers["id"] + "-2"}, records=records)
+
+
+def best(fn, repeat: int = 3) -> float:
+    t = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        t = min(t, time.perf_counter() - t0)
+    return t
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[2_000, 10_000])
+    ap.add_argument("--changed", type=float, nargs="*", default=[0.01, 0.05, 0.2])
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'records':>8} {'changed':>8} {'body KB':>8} {'delta KB':>9} {'ratio':>6} {'diff ms':>8} "
+          f"{'apply ms':>9} {'+verify ms':>11}")
+    for n in args.sizes:
+        base = parse(generate(replace(PROFILES["r10k"], records=n, seed=5)))
+        for changed in args.changed:
+            target = edited(base, changed, seed=n)
+            delta = diff(base, target)
+            assert compute_hash(apply_delta(base, delta)) == compute_hash(target)
+            size = len(canonicalize(target, for_hash=False).encode())
+            d = len(delta.encode())
+            t_diff = best(lambda: diff(base, target))
+            t_apply = best(lambda: apply_delta(base, delta, verify=False))
+            t_verify = best(lambda: apply_delta(base, delta))
+            print(f"{n:>8} {changed:>8.0%} {size / 1024:>8.0f} {d / 1024:>9.1f} {size / d:>6.0f} "
+                  f"{t_diff * 1e3:>8.1f} {t_apply * 1e3:>9.2f} {t_verify * 1e3:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
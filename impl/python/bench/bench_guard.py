@@ -0,0 +1,87 @@
+"""Guarded parsing (§15.1) on adversarial input: time and memory per KB.
+
+    python bench/bench_guard.py [--sizes KB ...] [--repeat N]
+
+Each case is generated at doubling sizes and parsed with limits set. Time and
+the tracemalloc peak are reported per KB of input, so a linear parser shows
+flat columns; a limit that stops the parse early shows them falling as the
+input grows, since only the prefix up to the limit is ever read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pairl  # noqa: E402
+
+HEAD = "@v 1\n@id m1\n@ts 2026-06-22T10:00:00Z\n\n#u1\n"
+
+
+def _tags(n: int) -> str:  # one line ending in n trailing tags
+    return HEAD + "#fact k=v" + " @rid=x" * (n // 7) + "\n"
+
+
+def _blanks(n: int) -> str:  # tags separated by long whitespace runs
+    return HEAD + "#fact k=v" + (" " * 1000 + "@m=u1") * (n // 1005) + "\n"
+
+
+def _records(n: int) -> str:  # many small records, stopped by max_records
+    return HEAD + "#fact k=v\n" * (n // 10)
+
+
+def _line(n: int) -> str:  # one huge line, stopped by max_line_len
+    return HEAD + "#fact k=" + "v" * n + "\n"
+
+
+CASES = {
+    "trailing tags": (_tags, {"max_size_bytes": 1 << 30}),
+    "whitespace runs": (_blanks, {"max_size_bytes": 1 << 30}),
+    "max_records=1000": (_records, {"max_records": 1000}),
+    "max_line_len=4096": (_line, {"max_line_len": 4096}),
+}
+
+
+def _run(text: str, limits: dict, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            pairl.parse(text, **limits)
+        except pairl.LimitExceeded:
+            pass
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        pairl.parse(text, **limits)
+    except pairl.LimitExceeded:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[64, 128, 256, 512, 1024], metavar="KB")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'case':<20} {'KB':>6} {'ms':>9} {'µs/KB':>8} {'peak KB/KB':>11}")
+    for name, (gen, limits) in CASES.items():
+        for kb in args.sizes:
+            text = gen(kb * 1024)
+            size = len(text) / 1024
+            t, peak = _run(text, limits, args.repeat)
+            print(f"{name:<20} {size:6.0f} {t * 1e3:9.2f} {t * 1e6 / size:8.1f} {peak / 1024 / size:11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
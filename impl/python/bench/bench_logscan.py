@@ -0,0 +1,100 @@
+"""Bulk log scan: `scan_log()` with type pushdown vs. `parse()` of every message.
+
+    python bench/bench_logscan.py [--mb N] [--path FILE]
+
+Writes a log of corpus messages (distinct ids and sessions) up to about
+`--mb` MB, then answers two queries over it: every `#cost` with `cur=USD`,
+and every `#evid` with `conf<0.6`. The baseline parses each message and
+filters its records; the scan reads the memory-mapped log. Both must find
+the same records. Peak memory is from tracemalloc.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from corpus import PROFILES, generate  # noqa: E402
+from pairl.logscan import scan_log  # noqa: E402
+
+QUERIES = {
+    "#cost cur=USD": (("#cost",), lambda r: r.kv.get("cur") == "USD"),
+    "#evid conf<0.6": (("#evid",), lambda r: float(r.kv.get("conf", 1)) < 0.6),
+}
+
+
+def write_log(path: str, mb: int) -> int:
+    """Messages are r1k corpus messages with their @id/@sid rewritten; returns the count."""
+    bodies = [generate(replace(PROFILES["r1k"], seed=s)) for s in range(8)]
+    size, n = 0, 0
+    with open(path, "w", encoding="utf-8") as f:
+        while size < mb << 20:
+            text = bodies[n % len(bodies)].replace("@id ", f"@id x{n}-", 1)
+            text = text.replace("@sid ref:sess:", f"@sid ref:sess:S{n // 100}-", 1)
+            f.write(text)
+            size += len(text.encode("utf-8"))
+            n += 1
+    return n
+
+
+def parse_all(path: str, select: tuple[str, ...], where) -> int:
+    """Baseline: split at each `@v` header and parse every message in full."""
+    types = {s[1:] for s in select}
+    hits = 0
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    for part in ("\n" + text).split("\n@v ")[1:]:
+        for r in pairl.parse("@v " + part).iter_records():
+            hits += r.kind in types and where(r)
+    return hits
+
+
+def _timed(fn, *args) -> tuple[float, int, int]:
+    """Seconds, peak bytes, and the result; memory is traced in a second run."""
+    t0 = time.perf_counter()
+    hits = fn(*args)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, hits
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mb", type=int, default=32)
+    ap.add_argument("--path", help="log file to write (default: a temporary one, removed afterwards)")
+    args = ap.parse_args(argv[1:])
+    path = args.path or tempfile.mktemp(prefix="pairl-log-", suffix=".pairl")
+    try:
+        n = write_log(path, args.mb)
+        mb = os.path.getsize(path) / 2**20
+        print(f"{n} messages, {mb:.0f} MB")
+        print(f"{'query':<16} {'hits':>7} {'parse MB/s':>11} {'peak MB':>8} {'scan MB/s':>10} {'peak MB':>8} "
+              f"{'speedup':>8}")
+        for name, (select, where) in QUERIES.items():
+            full, full_peak, expect = _timed(parse_all, path, select, where)
+            scan, scan_peak, hits = _timed(lambda: sum(1 for _ in scan_log(path, select, where)))
+            assert hits == expect, (hits, expect)
+            print(f"{name:<16} {hits:>7} {mb / full:>11.1f} {full_peak / 2**20:>8.1f} {mb / scan:>10.1f} "
+                  f"{scan_peak / 2**20:>8.2f} {full / scan:>7.1f}x")
+    finally:
+        if not args.path and os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
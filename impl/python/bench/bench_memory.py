@@ -0,0 +1,119 @@
+"""Per-record memory of the slotted, lazily decoded Record vs. the 1.6.2 layout.
+
+    python bench/bench_memory.py [--records N]
+
+Counts every object reachable from `msg.records` + `msg.blocks` once (deep
+size, de-duplicated by identity). The 1.6.2 layout — a plain dataclass with an
+eagerly built `kv` dict and per-record kind/key strings, and blocks holding
+row lists of (value, was_quoted) tuples — is rebuilt from the same parse for
+comparison. A columnar body is measured as parsed (rows kept in their column
+store) and after `msg.records` has expanded it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from bench_tokenizer import columnar_body, synthetic_body  # noqa: E402
+
+
+@dataclass
+class LegacyRecord:
+    kind: str
+    name: Optional[str] = None
+    kv: dict[str, str] = field(default_factory=dict)
+    rid: Optional[str] = None
+    m: Optional[str] = None
+    raw: str = ""
+    from_columnar: bool = False
+    role: Optional[str] = None
+    parent: Optional[str] = None
+    arg: Optional[str] = None
+
+
+def _fresh(s: Optional[str]) -> Optional[str]:
+    """A new string object equal to s (1.6.2 sliced every tag and key anew)."""
+    return None if s is None else (s + ".")[:-1]
+
+
+def legacy_records(msg: pairl.Message) -> list[LegacyRecord]:
+    return [LegacyRecord(_fresh(r.kind), _fresh(r.name), {_fresh(k): v for k, v in r.kv.items()},
+                         r.rid, r.m, r.raw, r.from_columnar, r.role, r.parent, r.arg)
+            for r in msg.records]
+
+
+def legacy_blocks(msg: pairl.Message) -> list[tuple[str, list[str], list[list[tuple[str, bool]]]]]:
+    return [(b.rtype, b.columns, b.rows) for b in msg.blocks]
+
+
+def deep_size(*roots: object) -> int:
+    seen: set[int] = set()
+    total = 0
+    stack = list(roots)
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or o is None or isinstance(o, (bool, int, float)):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set)):
+            stack.extend(o)
+        elif isinstance(o, str):
+            pass
+        elif hasattr(o, "__dict__"):
+            stack.append(o.__dict__)
+        else:
+            for cls in type(o).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+    return total
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=2000)
+    args = ap.parse_args(argv[1:])
+    text = synthetic_body(args.records)
+    msg = pairl.parse(text)
+    n = len(msg.records)
+    raw = deep_size([r.raw for r in msg.records])  # source lines, shared by every layout
+
+    lazy = deep_size(msg.records, msg.blocks) - raw
+    for r in msg.records:
+        r.kv
+    decoded = deep_size(msg.records, msg.blocks) - raw
+    legacy = deep_size(legacy_records(msg), legacy_blocks(msg)) - raw
+
+    print(f"{n} records; bytes per record, excluding the source lines themselves")
+    print(f"  1.6.2 dataclass, eager kv   {legacy / n:8.0f}")
+    print(f"  slotted, kv not accessed    {lazy / n:8.0f}   ({1 - lazy / legacy:.0%} less)")
+    print(f"  slotted, kv decoded         {decoded / n:8.0f}   ({1 - decoded / legacy:.0%} less)")
+
+    msg = pairl.parse(columnar_body(args.records))
+    raw = deep_size([r.raw for r in msg.iter_records()])
+    stored = deep_size(msg.body(), msg.blocks) - raw
+    legacy = deep_size(legacy_records(msg), legacy_blocks(msg)) - raw
+    n = len(msg.records)
+    expanded = deep_size(msg.records, msg.blocks) - raw
+    print(f"\n{n} columnar rows; bytes per row, excluding the source lines themselves")
+    print(f"  1.6.2 row lists + records   {legacy / n:8.0f}")
+    print(f"  column store                {stored / n:8.0f}   ({1 - stored / legacy:.0%} less)")
+    print(f"  column store + row views    {expanded / n:8.0f}   ({1 - expanded / legacy:.0%} less)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
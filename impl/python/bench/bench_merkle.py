@@ -0,0 +1,68 @@
+"""Merkle mode: proof size and rehash cost vs. the flat `compute_hash()`.
+
+    python bench/bench_merkle.py [--sizes N ...]
+
+For corpus messages of each `--sizes` record count, reports: a full tree
+build; the cost of re-rooting after one record is edited (flat: hash the
+whole message again; tree: `update()` then `root()`); and what proving one `#evid` record to a verifier takes (flat: the whole
+canonical text, re-hashed; Merkle: the line plus its proof, checked with
+`verify_proof()`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import PROFILES, generate  # noqa: E402
+from pairl import canonicalize, compute_hash, parse  # noqa: E402
+from pairl.merkle import MerkleTree, message_leaves, verify_proof  # noqa: E402
+
+
+def best(fn, repeat: int = 5) -> float:
+    t = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        t = min(t, time.perf_counter() - t0)
+    return t
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000])
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'records':>8} {'build ms':>9} {'edit: flat ms':>14} {'tree µs':>8} "
+          f"{'proof: flat KB':>15} {'merkle B':>9} {'verify: flat ms':>16} {'merkle µs':>10}")
+    for n in args.sizes:
+        msg = parse(generate(replace(PROFILES["r10k"], records=n, seed=3)))
+        lines = list(message_leaves(msg))
+        flat = best(lambda: compute_hash(msg))
+        build = best(lambda: MerkleTree(lines), 1)
+        tree = MerkleTree(lines)
+        i = next(j for j, line in enumerate(lines) if line.startswith("#evid"))
+        edited = lines[i].replace("conf=", "conf=1", 1)
+        edit = best(lambda: (tree.update(i, edited), tree.root()))
+        tree.update(i, lines[i])
+        root = tree.root()
+        proof = tree.prove(i)
+        size = len(lines[i]) + sum(len(h) // 2 for h in proof.hashes)
+        text = canonicalize(msg, for_hash=False)
+        verify_flat = best(lambda: compute_hash(parse(text)), 1)
+        verify = best(lambda: verify_proof(root, [lines[i]], proof))
+        assert verify_proof(root, [lines[i]], proof)
+        print(f"{n:>8} {build * 1e3:>9.1f} {flat * 1e3:>14.2f} {edit * 1e6:>8.1f} "
+              f"{len(text.encode()) / 1024:>15.0f} {size:>9} {verify_flat * 1e3:>16.1f} {verify * 1e6:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,105 @@
+"""V15 quotation checks on a long conversation: naive search vs. the turn index.
+
+    python bench/bench_quote.py [--turns N] [--turn-len CHARS] [--fragments K]
+
+An encoder compresses a conversation of `--turns` turns of about `--turn-len`
+characters (ragged whitespace), one turn at a time: each new turn gets a
+`#req`/`#rpt` of `--fragments` extracted fragments, and one record in ten has
+a paraphrased fragment that must be dropped. Per new turn it checks the new
+record three ways:
+
+    naive      every fragment against every turn so far, normalized afresh
+    indexed    verify_quotations() on the new record, with the session's QuoteIndex
+    full body  verify_quotations() on the whole body so far (index warm)
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pairl import Message, QuoteIndex, verify_quotations  # noqa: E402
+from pairl.core import Record  # noqa: E402
+from pairl.quote import ELISION  # noqa: E402
+
+WORDS = ("the", "billing", "migration", "replica", "Postgres", "16", "Friday", "deploy", "rollback", "index",
+         "latency", "p99", "ms", "cache", "shard", "owner", "ticket", "OPS-4471", "review", "schema", "and", "of")
+SPACES = (" ",) * 12 + ("  ", "\n", " \n  ", "\t")
+
+
+def conversation(turns: int, turn_len: int, fragments: int, seed: int) -> tuple[dict[str, str], list[Record]]:
+    rng = random.Random(seed)
+    source: dict[str, str] = {}
+    records: list[Record] = []
+    for k in range(1, turns + 1):
+        marker = f"{'ua'[k % 2 == 0]}{k}"
+        parts = []
+        size = 0
+        while size < turn_len:
+            parts += (rng.choice(WORDS), rng.choice(SPACES))
+            size += len(parts[-2]) + len(parts[-1])
+        text = source[marker] = "".join(parts)
+        norm = " ".join(text.split())
+        cuts = sorted(rng.sample(range(len(norm) - 80), fragments))
+        frags = [norm[c:c + rng.randrange(20, 80)].strip() for c in cuts]
+        frags = [f for i, f in enumerate(frags) if i == 0 or cuts[i] >= cuts[i - 1] + len(frags[i - 1]) + 1]
+        if k % 10 == 0:
+            frags.insert(1, "the team agreed to ship it")
+        records.append(Record("marker", marker))
+        records.append(Record("req" if marker[0] == "u" else "rpt", "req" if marker[0] == "u" else "rpt",
+                              {"content": ELISION.join(frags)}))
+    return source, records
+
+
+def naive(source: dict[str, str], turns: list[str], record: Record) -> int:
+    found = 0
+    for frag in record.kv["content"].split(ELISION):
+        frag = " ".join(frag.split())
+        found += any(" ".join(source[t].split()).find(frag) >= 0 for t in turns)
+    return found
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--turns", type=int, default=200)
+    ap.add_argument("--turn-len", type=int, default=4000)
+    ap.add_argument("--fragments", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv[1:])
+    source, records = conversation(args.turns, args.turn_len, args.fragments, args.seed)
+
+    t_naive = t_indexed = t_full = 0.0
+    dropped = 0
+    seen: dict[str, str] = {}
+    index = QuoteIndex()
+    for k in range(0, len(records), 2):
+        marker, record = records[k].name, records[k + 1]
+        seen[marker] = source[marker]
+        t0 = time.perf_counter()
+        naive(source, list(seen), record)
+        t1 = time.perf_counter()
+        (q,) = verify_quotations(records[k:k + 2], seen, index=index)
+        t2 = time.perf_counter()
+        verify_quotations(Message(headers={}, records=records[:k + 2]), seen, index=index)
+        t3 = time.perf_counter()
+        t_naive += t1 - t0
+        t_indexed += t2 - t1
+        t_full += t3 - t2
+        dropped += len(q.dropped)
+
+    chars = sum(map(len, source.values()))
+    print(f"{args.turns} turns, {chars / 1024:.0f} KB of source, {dropped} fragments dropped")
+    print(f"{'':<10} {'total ms':>10} {'per turn ms':>12}")
+    for name, t in (("naive", t_naive), ("indexed", t_indexed), ("full body", t_full)):
+        print(f"{name:<10} {t * 1e3:>10.1f} {t * 1e3 / args.turns:>12.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
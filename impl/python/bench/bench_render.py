@@ -0,0 +1,75 @@
+"""Session viewer cost: `render()` after every turn vs. `Renderer.append()`.
+
+    python bench/bench_render.py [--turns N ...] [--records N]
+
+A maintained session grows by one turn at a time (`--records` records each,
+with the repeated `#rule`s and `#quota` snapshots of real traffic). After each
+append the viewer needs the Markdown: either a full `render()` of the
+session, or the delta from a `Renderer`. Reports the mean cost per turn over
+the whole session; the full render grows with the session, the delta should
+not. The final outputs are checked to be identical.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pairl  # noqa: E402
+
+HEADERS = {"v": "1", "id": "m1", "sid": "ref:sess:S1", "ts": "2026-06-22T10:00:00Z"}
+
+
+def turn(i: int, records: int) -> str:
+    role = "u" if i % 2 else "a"
+    lines = [f"#{role}{i}", f"req{{t=step_{i},s=t}}", "#rule lang=en", "#rule style=terse"]
+    for j in range(records - 5):
+        lines.append(f'#evid claim="finding {i}.{j} holds" src=s{j % 7} conf=0.{50 + j % 50}')
+    lines.append(f"#quota type=tokens total=200000 used={1000 * (i // 10)} rem={200000 - 1000 * (i // 10)}")
+    return "\n".join(lines) + "\n"
+
+
+def run(turns: int, records: int) -> tuple[float, float]:
+    increments = [turn(i + 1, records) for i in range(turns)]
+    s = pairl.Session(HEADERS)
+    full = 0.0
+    for inc in increments:
+        s.append(inc)
+        t0 = time.perf_counter()
+        expect = pairl.render(s.message)
+        full += time.perf_counter() - t0
+
+    s = pairl.Session(HEADERS)
+    r = pairl.Renderer(s.message)
+    out = r.text()
+    delta = 0.0
+    for inc in increments:
+        new = s.append(inc)
+        t0 = time.perf_counter()
+        pos, text = r.append(new)
+        out = out[:pos] + text
+        delta += time.perf_counter() - t0
+    assert out == expect
+    return full / turns, delta / turns
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--turns", type=int, nargs="*", default=[50, 200, 800])
+    ap.add_argument("--records", type=int, default=20)
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'turns':>6} {'records':>8} {'render() ms/turn':>17} {'append() ms/turn':>17} {'speedup':>8}")
+    for turns in args.turns:
+        full, delta = run(turns, args.records)
+        print(f"{turns:>6} {turns * args.records:>8} {full * 1e3:>17.2f} {delta * 1e3:>17.3f} {full / delta:>7.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,111 @@
+"""Load test for `python -m pairl serve`: latency percentiles and throughput.
+
+    python bench/bench_serve.py [--clients N ...] [--requests N] [--depth N] [--op OP] [--jobs N] [--batch N]
+
+Starts the server on a temporary Unix socket, then for each `--clients`
+count opens that many connections; each sends `--requests` requests of
+`--op` on the repository examples, keeping up to `--depth` of them in
+flight (pipelined). Latency is per request, send to response. For scale,
+the last line times the same op as a one-shot `python -m pairl` process per
+message, which is what a gateway without the service pays.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import examples  # noqa: E402
+
+
+async def client(path: str, texts: list[str], op: str, n: int, depth: int, lat: list[float]) -> int:
+    reader, writer = await asyncio.open_unix_connection(path, limit=1 << 24)
+    sent: dict[int, float] = {}
+    window = asyncio.Semaphore(depth)
+    errors = 0
+
+    async def send() -> None:
+        for i in range(n):
+            await window.acquire()
+            sent[i] = time.perf_counter()
+            writer.write(json.dumps({"id": i, "op": op, "text": texts[i % len(texts)]}).encode() + b"\n")
+            await writer.drain()
+
+    sender = asyncio.ensure_future(send())
+    for _ in range(n):
+        res = json.loads(await reader.readline())
+        lat.append(time.perf_counter() - sent.pop(res["id"]))
+        errors += not res["ok"]
+        window.release()
+    await sender
+    writer.close()
+    return errors
+
+
+async def load(path: str, texts: list[str], op: str, clients: int, n: int, depth: int) -> tuple[list[float], float, int]:
+    lat: list[float] = []
+    t0 = time.perf_counter()
+    errors = await asyncio.gather(*(client(path, texts, op, n, depth, lat) for _ in range(clients)))
+    return sorted(lat), time.perf_counter() - t0, sum(errors)
+
+
+def spawn_cost(texts: list[str], op: str, tmp: str, n: int = 10) -> float:
+    """Mean seconds for one `python -m pairl <op> file` run."""
+    cmd = {"parse": "canon"}.get(op, op)
+    paths = []
+    for i, text in enumerate(texts[:n]):
+        paths.append(os.path.join(tmp, f"m{i}.pairl"))
+        with open(paths[-1], "w", encoding="utf-8") as f:
+            f.write(text)
+    t0 = time.perf_counter()
+    for p in paths:
+        subprocess.run([sys.executable, "-m", "pairl", cmd, p], cwd=ROOT, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - t0) / len(paths)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, nargs="*", default=[1, 8, 64])
+    ap.add_argument("--requests", type=int, default=500, help="per client")
+    ap.add_argument("--depth", type=int, default=8, help="requests in flight per client")
+    ap.add_argument("--op", default="validate", choices=("parse", "validate", "hash", "canon", "render"))
+    ap.add_argument("--jobs", type=int, default=0)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args(argv[1:])
+
+    texts = list(examples().values())
+    with tempfile.TemporaryDirectory(prefix="pairl-serve-") as tmp:
+        sock = os.path.join(tmp, "pairl.sock")
+        server = subprocess.Popen([sys.executable, "-m", "pairl", "serve", "--unix", sock, "--jobs", str(args.jobs),
+                                   "--batch", str(args.batch)], cwd=ROOT, stderr=subprocess.PIPE)
+        try:
+            server.stderr.readline()  # "listening on ..."
+            asyncio.run(load(sock, texts, args.op, 1, 50, 1))  # warm the workers
+            print(f"{args.op} on {len(texts)} example messages, depth {args.depth}")
+            print(f"{'clients':>8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            for clients in args.clients:
+                lat, elapsed, errors = asyncio.run(load(sock, texts, args.op, clients, args.requests, args.depth))
+                p50, p99 = lat[len(lat) // 2], lat[min(len(lat) - 1, len(lat) * 99 // 100)]
+                print(f"{clients:>8} {len(lat):>9} {len(lat) / elapsed:>8.0f} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f} "
+                      f"{errors:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+        spawn = spawn_cost(texts, args.op, tmp)
+        print(f"one-shot CLI: {spawn * 1e3:.0f} ms per message ({1 / spawn:.0f} req/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,79 @@
+"""Instrumentation overhead, and where the time goes.
+
+    python bench/bench_stats.py [--profile NAME] [--repeat N]
+
+Times parse → validate → canonicalize → render on a corpus profile three
+ways: never instrumented, after an `enable()`/`disable()` round trip (must
+match the first: disabled instrumentation leaves the original code in
+place), and instrumented. Then prints the instrumented run's per-stage and
+per-rule time and its parse counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from corpus import PROFILES, generate  # noqa: E402
+from pairl import stats  # noqa: E402
+
+
+def pipeline(text: str) -> None:
+    msg = pairl.parse(text)
+    pairl.validate(msg)
+    pairl.canonicalize(msg)
+    pairl.render(msg)
+
+
+def best(text: str, repeat: int) -> float:
+    t = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        pipeline(text)
+        t = min(t, time.perf_counter() - t0)
+    return t
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--profile", default="r10k", choices=sorted(PROFILES))
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv[1:])
+    text = generate(PROFILES[args.profile])
+    pipeline(text)  # warm up
+
+    plain = best(text, args.repeat)
+    stats.disable()
+    with stats.instrument():
+        pass
+    restored = best(text, args.repeat)
+    with stats.instrument():
+        on = best(text, args.repeat)
+    with stats.instrument() as st:
+        pipeline(text)
+
+    print(f"{args.profile}: {len(text.encode()) / 1024:.0f} KB")
+    print(f"{'never enabled':<16} {plain * 1e3:>8.1f} ms")
+    print(f"{'disabled':<16} {restored * 1e3:>8.1f} ms  ({restored / plain - 1:+.1%})")
+    print(f"{'enabled':<16} {on * 1e3:>8.1f} ms  ({on / plain - 1:+.1%})")
+    print()
+    for metric, label in (("pairl_stage_seconds_total", "stage"), ("pairl_rule_seconds_total", "rule")):
+        rows = sorted(((v, dict(labels)[label]) for (m, labels), v in st.totals.items() if m == metric), reverse=True)
+        for seconds, name in rows:
+            print(f"{label} {name:<12} {seconds * 1e3:>8.2f} ms")
+    for k in ("bytes", "lines", "records", "rows"):
+        print(f"parse {k:<12} {st.get(f'pairl_parse_{k}_total'):>8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,81 @@
+"""Store open and lookup cost as the store grows.
+
+    python bench/bench_store.py [--sizes N ...] [--lookups N] [--dir PATH]
+
+Fills one store in steps up to each size (messages of a dozen records, in
+batches of 1000) and after each step reopens it and times: the open itself,
+`raw()` by digest, `get()` by digest and by (sid, id), and `record()` by
+(sid, id, rid), on random keys. Both columns should stay flat as the store
+grows; only the append rate depends on message size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pairl  # noqa: E402
+from pairl.store import Store  # noqa: E402
+
+
+def message(i: int) -> str:
+    body = "".join(f'#fact k{j}="value {i}.{j}" @rid=f{j}\n' for j in range(10))
+    return (f"@v 1\n@id m{i}\n@sid ref:sess:S{i // 1000}\n@ts 2026-06-22T10:00:00Z\n\n"
+            f"#u1\nreq{{t=lookup,s=\"item {i}\"}} @rid=a1\n{body}")
+
+
+def _per_op(fn, keys: list) -> float:
+    t0 = time.perf_counter()
+    for k in keys:
+        fn(k)
+    return (time.perf_counter() - t0) / len(keys)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 300_000])
+    ap.add_argument("--lookups", type=int, default=2000)
+    ap.add_argument("--dir", help="store directory (default: a temporary one, removed afterwards)")
+    args = ap.parse_args(argv[1:])
+    path = args.dir or tempfile.mkdtemp(prefix="pairl-store-")
+    rng = random.Random(0)
+    digests: list[str] = []
+
+    print(f"{'messages':>9} {'MB':>7} {'append µs/msg':>14} {'open ms':>8} {'raw µs':>7} {'get µs':>7} "
+          f"{'by id µs':>9} {'record µs':>10}")
+    try:
+        for size in sorted(args.sizes):
+            before = len(digests)
+            with Store(path) as s:
+                t0 = time.perf_counter()
+                for lo in range(len(digests), size, 1000):
+                    digests += s.extend(pairl.parse(message(i)) for i in range(lo, min(size, lo + 1000)))
+                add = (time.perf_counter() - t0) / max(1, size - before)
+            t0 = time.perf_counter()
+            s = Store(path)
+            opened = time.perf_counter() - t0
+            picks = [rng.randrange(size) for _ in range(args.lookups)]
+            raw = _per_op(s.raw, [digests[i] for i in picks])
+            get = _per_op(s.get, [digests[i] for i in picks])
+            by_id = _per_op(s.get, [(f"S{i // 1000}", f"m{i}") for i in picks])
+            rec = _per_op(lambda k: s.record(*k), [(f"S{i // 1000}", f"m{i}", f"f{i % 10}") for i in picks])
+            mb = sum(f.stat().st_size for f in Path(path).iterdir()) / 2**20
+            s.close()
+            print(f"{size:>9,} {mb:7.0f} {add * 1e6:14.1f} {opened * 1e3:8.2f} {raw * 1e6:7.1f} {get * 1e6:7.1f} "
+                  f"{by_id * 1e6:9.1f} {rec * 1e6:10.1f}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(path, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,90 @@
+"""ThreadGraph at session-store scale: add, resolve, and V7 cost per message.
+
+    python bench/bench_thread.py [--messages N] [--deps K] [--window W]
+
+Builds header-only messages (the graph never looks at bodies beyond rids)
+for one session: each has `@p` on a recent message and up to K `@deps` on
+older ones. They are added in order, in reverse (every parent is a forward
+reference), and jittered (each message up to `--window` places late, as
+concurrent writers deliver them); then every reference is resolved once.
+Reports µs per message and the process's peak RSS. A fully random order is
+the worst case of the incremental topological order and is not a store's
+arrival pattern, so it is left out.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pairl  # noqa: E402
+from pairl.thread import ThreadGraph  # noqa: E402
+
+
+def messages(n: int, deps: int, seed: int = 0) -> list[pairl.Message]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        h = {"v": "1", "id": f"m{i}", "sid": "ref:sess:01JBENCH", "ts": "2026-06-22T10:00:00Z"}
+        if i:
+            h["p"] = f"m{max(0, i - rng.randint(1, 4))}"
+            extra = {f"@m{rng.randrange(i)}" for _ in range(rng.randint(0, deps))}
+            if extra:
+                h["deps"] = ",".join(sorted(extra))
+        out.append(pairl.Message(headers=h, records=[]))
+    return out
+
+
+def _add_all(msgs: list[pairl.Message]) -> tuple[ThreadGraph, float]:
+    g = ThreadGraph()
+    t0 = time.perf_counter()
+    for m in msgs:
+        if g.add(m):
+            raise AssertionError("unexpected cycle")
+    return g, time.perf_counter() - t0
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--deps", type=int, default=2)
+    ap.add_argument("--window", type=int, default=64)
+    args = ap.parse_args(argv[1:])
+    n = args.messages
+    msgs = messages(n, args.deps)
+    print(f"{n:,} messages, up to {args.deps} @deps each")
+
+    rng = random.Random(1)
+    late = [i + rng.randrange(args.window) for i in range(n)]
+    jittered = [msgs[i] for i in sorted(range(n), key=late.__getitem__)]
+    for label, order in (("in order", msgs), ("reverse", msgs[::-1]), ("jittered", jittered)):
+        g, dt = _add_all(order)
+        print(f"  add() {label:<10} {dt / n * 1e6:8.2f} µs/msg")
+
+    refs = [f"@m{i}" for i in range(n)]
+    t0 = time.perf_counter()
+    assert all(g.resolve(r) for r in refs)
+    print(f"  resolve()           {(time.perf_counter() - t0) / n * 1e6:8.2f} µs/ref")
+
+    back = pairl.Message(headers={"v": "1", "id": "m0", "sid": "ref:sess:01JBENCH", "ts": "t",
+                                  "p": f"m{n - 1}"}, records=[])
+    fresh = ThreadGraph()
+    for m in msgs[1:]:
+        fresh.add(m)
+    t0 = time.perf_counter()
+    cyc = fresh.cycles(back)
+    print(f"  cycles() closing    {(time.perf_counter() - t0) * 1e3:8.2f} ms (cycle of {len(cyc[0]) - 1} messages)")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"  peak RSS            {peak / 1024:8.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,198 @@
+"""Tokenizer throughput: compiled scanner vs. the v1.6.2 per-character loops.
+
+    python bench/bench_tokenizer.py [--repeat N]
+
+Reports MB/s and records/s for the record tokenizers (`split_fields`,
+`_parse_kvpairs`) and for a full `parse()`, over the examples corpus and a
+synthetic gateway-sized body (long `#req`/`#rpt` content, escapes, columnar
+rows). The legacy loops are kept here verbatim as the comparison baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pairl import core  # noqa: E402
+
+EXAMPLES = ROOT.parents[1] / "examples"
+
+
+def legacy_split_fields(s: str) -> list[tuple[str, bool]]:
+    out: list[tuple[str, bool]] = []
+    i, n = 0, len(s)
+    while i < n:
+        if s[i] == " ":
+            i += 1
+            continue
+        if s[i] == '"':
+            i += 1
+            buf: list[str] = []
+            while i < n:
+                if s[i] == "\\" and i + 1 < n and s[i + 1] == '"':
+                    buf.append('"')
+                    i += 2
+                    continue
+                if s[i] == '"':
+                    i += 1
+                    break
+                buf.append(s[i])
+                i += 1
+            out.append(("".join(buf), True))
+        else:
+            start = i
+            while i < n and s[i] != " ":
+                i += 1
+            out.append((s[start:i], False))
+    return out
+
+
+def legacy_parse_kvpairs(s: str) -> dict[str, str]:
+    kv: dict[str, str] = {}
+    i, n = 0, len(s)
+    while i < n:
+        if s[i] in " ,":
+            i += 1
+            continue
+        kstart = i
+        while i < n and s[i] not in "=":
+            if s[i] in " ,":
+                break
+            i += 1
+        key = s[kstart:i]
+        if i >= n or s[i] != "=":
+            continue
+        i += 1
+        if i < n and s[i] == '"':
+            i += 1
+            buf: list[str] = []
+            while i < n:
+                if s[i] == "\\" and i + 1 < n and s[i + 1] == '"':
+                    buf.append('"')
+                    i += 2
+                    continue
+                if s[i] == '"':
+                    i += 1
+                    break
+                buf.append(s[i])
+                i += 1
+            kv[key] = "".join(buf)
+        else:
+            vstart = i
+            while i < n and s[i] not in " ,":
+                i += 1
+            kv[key] = s[vstart:i]
+    return kv
+
+
+_PROSE = ("The migration plan keeps the \\\"legacy\\\" schema for now, moves the audit "
+          "tables first, and defers PostGIS until the extension versions line up. ")
+
+
+def synthetic_body(records: int = 400) -> str:
+    lines = ["@v 1", "@id m1", "@ts 2026-06-22T10:00:00.000+02:00", ""]
+    for i in range(records):
+        turn = i // 8
+        if i % 8 == 0:
+            lines.append(f"#{'u' if turn % 2 == 0 else 'a'}{turn + 1}")
+        kind = i % 4
+        if kind == 0:
+            tag = "req" if turn % 2 == 0 else "rpt"
+            lines.append(f'#{tag} content="{_PROSE * 6}" @rid=q{i}')
+        elif kind == 1:
+            lines.append(f'#evid claim="claim {i}, with commas and = signs" src=s{i} conf=0.{i % 10}5 @rid=e{i}')
+        elif kind == 2:
+            lines.append(f"#fact key{i}=value_{i} note=\"n {i}\" @rid=f{i}")
+        else:
+            lines.append(f"req{{t=topic_{i % 7},s=f,l=2}} @rid=a{i}")
+    lines.append("#quota[type,total,used,rem]")
+    lines.extend(f"t{j} 50000 {j * 10} {50000 - j * 10}" for j in range(50))
+    return "\n".join(lines) + "\n"
+
+
+def columnar_body(rows: int = 2000) -> str:
+    """A tool-heavy body: one large #evid block and one #cost block."""
+    lines = ["@v 1", "@id m1", "@ts 2026-06-22T10:00:00.000+02:00", "@budget 500USD", "",
+             "#evid[claim,src,conf]"]
+    lines.extend(f'"claim {i} holds" s{i % 40} 0.{i % 90 + 10}' for i in range(rows))
+    lines.append("#cost[item,val,cur]")
+    lines.extend(f"step_{i} 0.0{i % 9 + 1} USD" for i in range(rows))
+    return "\n".join(lines) + "\n"
+
+
+def _payloads(text: str) -> tuple[list[str], list[str]]:
+    """Split body lines into kvpair payloads and columnar rows."""
+    kv, rows = [], []
+    for line in text.split("\n\n", 1)[-1].split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#") and " " in line:
+            kv.append(line.split(" ", 1)[1])
+        elif not line.startswith("#") and "{" not in line:
+            rows.append(line)
+    return kv, rows
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _report(label: str, nbytes: int, nrec: int, secs: float) -> None:
+    print(f"  {label:<28} {nbytes / secs / 1e6:8.2f} MB/s {nrec / secs:12,.0f} rec/s")
+
+
+def run(name: str, texts: list[str], repeat: int) -> None:
+    kv: list[str] = []
+    rows: list[str] = []
+    for t in texts:
+        k, r = _payloads(t)
+        kv += k
+        rows += r
+    total = sum(len(t.encode()) for t in texts)
+    nrec = sum(len(core.parse(t).records) for t in texts)
+    print(f"{name}: {total:,} bytes, {nrec} records")
+
+    for s in kv:
+        assert legacy_parse_kvpairs(s) == core._parse_kvpairs(s)
+    for r in rows:
+        assert legacy_split_fields(r) == core.split_fields(r)
+
+    kv_bytes = sum(len(s.encode()) for s in kv)
+    row_bytes = sum(len(s.encode()) for s in rows)
+    _report("kvpairs legacy", kv_bytes, len(kv),
+            _best(lambda: [legacy_parse_kvpairs(s) for s in kv], repeat))
+    _report("kvpairs scanner", kv_bytes, len(kv),
+            _best(lambda: [core._parse_kvpairs(s) for s in kv], repeat))
+    if rows:
+        _report("split_fields legacy", row_bytes, len(rows),
+                _best(lambda: [legacy_split_fields(s) for s in rows], repeat))
+        _report("split_fields scanner", row_bytes, len(rows),
+                _best(lambda: [core.split_fields(s) for s in rows], repeat))
+    _report("parse()", total, nrec, _best(lambda: [core.parse(t) for t in texts], repeat))
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args(argv[1:])
+    examples = [p.read_text(encoding="utf-8") for p in sorted(EXAMPLES.glob("*.pairl"))]
+    print(f"python {sys.version.split()[0]}, best of {args.repeat}\n")
+    run(f"examples ({len(examples)} files)", examples, args.repeat)
+    print()
+    run("synthetic gateway body", [synthetic_body()], args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,71 @@
+"""Validation cost per message: full rule set, hot-path subset, streamed feed.
+
+    python bench/bench_validate.py [--records N] [--repeat N]
+
+Uses the synthetic gateway body from bench_tokenizer (default 1,000 records,
+the §15.1 recommended cap), then a columnar #evid/#cost body checked
+column-wide in its blocks vs. row by row over the expanded records.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from bench_tokenizer import columnar_body, synthetic_body  # noqa: E402
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _streamed(msg: pairl.Message) -> None:
+    v = pairl.Validator(msg, strict=True)
+    for r in msg.records:
+        v.feed(r)
+    v.finish()
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args(argv[1:])
+    msg = pairl.parse(synthetic_body(args.records))
+    print(f"{len(msg.records)} records, best of {args.repeat}")
+    cases = [
+        ("validate() all rules", lambda: pairl.validate(msg, strict=True)),
+        ("validate() V2/V6/V9", lambda: pairl.validate(msg, strict=True, rules=("V2", "V6", "V9"))),
+        ("Validator.feed() per record", lambda: _streamed(msg)),
+    ]
+    for label, fn in cases:
+        print(f"  {label:<30} {_best(fn, args.repeat) * 1e6:10.0f} µs")
+
+    col = pairl.parse(columnar_body(args.records))
+    expanded = pairl.parse(columnar_body(args.records))
+    expanded.records  # noqa: B018 - materialize the row views
+    assert pairl.validate(col).errors == pairl.validate(expanded).errors
+    print(f"\ncolumnar body, {2 * args.records} rows")
+    cases = [
+        ("validate() column-wide", lambda: pairl.validate(col)),
+        ("validate() per expanded row", lambda: pairl.validate(expanded)),
+    ]
+    for label, fn in cases:
+        print(f"  {label:<30} {_best(fn, args.repeat) * 1e6:10.0f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
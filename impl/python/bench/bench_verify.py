@@ -0,0 +1,68 @@
+"""V5 `@hash` verification: canonical fast path vs. the full round trip.
+
+    python bench/bench_verify.py [--repeat N] [--cases PATTERN ...]
+
+Each corpus profile is signed twice: once as written by the generator (quoted
+atoms, columnar blocks — not canonical) and once re-encoded in canonical form,
+as our own encoder emits it. Both are checked with `HashVerifier.verify()`
+and with `parse()` → `compute_hash()`; the last column says which path the
+verifier took.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from corpus import LARGE, PROFILES, generate  # noqa: E402
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def signed(text: str) -> str:
+    """`text` with a correct `@hash` as its last header."""
+    head, _, body = text.partition("\n\n")
+    return f"{head}\n@hash {pairl.hash_ref(pairl.parse(text))}\n\n{body}"
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--cases", nargs="*", default=[], metavar="PATTERN")
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'case':<24} {'KB':>7} {'round trip ms':>14} {'verify ms':>10} {'speedup':>8}  path")
+    hv = pairl.HashVerifier()
+    for name, spec in PROFILES.items():
+        if name in LARGE or (args.cases and not any(fnmatch.fnmatchcase(name, p) for p in args.cases)):
+            continue
+        raw = generate(spec)
+        for label, text in ((name, signed(raw)), (f"{name} (canonical)", signed(pairl.canonicalize(pairl.parse(raw))))):
+            fast_before = hv.fast
+            assert hv.verify(text) is True
+            path = "fast" if hv.fast > fast_before else "full"
+            full = _best(lambda: pairl.compute_hash(pairl.parse(text)), args.repeat)
+            fast = _best(lambda: hv.verify(text), args.repeat)
+            print(f"{label:<24} {len(text.encode()) / 1024:7.0f} {full * 1e3:14.2f} {fast * 1e3:10.2f} "
+                  f"{full / fast:7.1f}x  {path}")
+    print(f"\nfast path taken {hv.fast} times, full round trip {hv.full} times")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,216 @@
+"""Seeded synthetic PAIRL corpus for the benchmark suite.
+
+    python bench/corpus.py [PROFILE|--records N ...] > message.pairl
+
+`generate(CorpusSpec(...))` builds one message shaped like gateway traffic:
+turn-marked conversation history (`#req`/`#rpt`), facts, references and
+evidence, tool chains (`#think` → `#call`/`#ret` × depth → `#edit`), costs
+and quotas. Every knob is explicit and the output depends only on the spec,
+so a profile names the same bytes on every machine. Messages validate
+cleanly (non-strict), so the validate stage measures the common path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+EXAMPLES = ROOT.parents[1] / "examples"
+
+_WORDS = ("the migration plan keeps legacy schema audit tables first defers extension "
+          "versions proxy handler strips content encoding for streaming responses tests "
+          "passed after the header fix budget review quarterly revenue grew while costs "
+          "fell agents agreed on blue green rollout with manual trigger recreation").split()
+_TOOLS = ("Grep", "Read", "Bash", "Edit", "Search")
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    records: int = 200          # body records incl. markers and rows (groups are not split)
+    columnar: float = 0.3       # share of #evid/#call/#ret/#cost groups written as columnar blocks
+    quoting: float = 0.5        # share of free-text values that are quoted (spaces force quoting)
+    escapes: float = 0.1        # share of quoted values carrying \" escapes
+    turns: int = 8              # turn markers, alternating user/assistant
+    tool_depth: int = 3         # #call/#ret pairs per tool chain
+    content_len: int = 400      # mean #req/#rpt content length, in characters
+    seed: int = 0
+
+
+PROFILES: dict[str, CorpusSpec] = {
+    "r10": CorpusSpec(records=10, turns=2, tool_depth=1, content_len=120),
+    "r100": CorpusSpec(records=100, turns=4),
+    "r1k": CorpusSpec(records=1_000, turns=16),
+    "r10k": CorpusSpec(records=10_000, turns=64),
+    "r100k": CorpusSpec(records=100_000, turns=256),
+    "chat": CorpusSpec(records=300, columnar=0.0, turns=40, tool_depth=0, content_len=1_200),
+    "tools": CorpusSpec(records=1_000, columnar=0.0, turns=8, tool_depth=8, content_len=200),
+    "columnar": CorpusSpec(records=1_000, columnar=1.0, turns=4, tool_depth=4),
+    "quoted": CorpusSpec(records=1_000, quoting=1.0, escapes=0.6),
+    "long_content": CorpusSpec(records=200, turns=20, content_len=8_000),
+}
+LARGE = {"r100k"}  # left out of the default run
+
+
+def examples() -> dict[str, str]:
+    """The repository examples, as fixed cases."""
+    return {f"example:{p.stem}": p.read_text(encoding="utf-8") for p in sorted(EXAMPLES.glob("*.pairl"))}
+
+
+class _Gen:
+    def __init__(self, spec: CorpusSpec) -> None:
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.lines: list[str] = []
+        self.n = 0  # records emitted
+        self.rid = 0
+        self.in_block = False
+
+    def emit(self, line: str) -> None:
+        if line.startswith("#"):
+            self.in_block = False
+        elif self.in_block and "{" in line:  # an intent would read as a row
+            self.lines.append("---")
+            self.in_block = False
+        self.lines.append(line)
+        self.n += 1
+
+    def open_block(self, header: str) -> None:
+        self.lines.append(header)
+        self.in_block = True
+
+    def next_rid(self, prefix: str) -> str:
+        self.rid += 1
+        return f"{prefix}{self.rid}"
+
+    def text(self, length: int) -> str:
+        rng, out, size = self.rng, [], 0
+        while size < length:
+            w = rng.choice(_WORDS)
+            out.append(w)
+            size += len(w) + 1
+        return " ".join(out)
+
+    def value(self, text: str) -> str:
+        """Render free text as a field value, quoted per the spec's densities."""
+        rng, spec = self.rng, self.spec
+        if " " not in text and rng.random() >= spec.quoting:
+            return text
+        if rng.random() < spec.escapes:
+            words = text.split(" ")
+            words[rng.randrange(len(words))] = '\\"' + words[rng.randrange(len(words))] + '\\"'
+            text = " ".join(words)
+        return f'"{text}"'
+
+    def atom(self, text: str) -> str:
+        return text.replace(" ", "_")
+
+    def left(self) -> int:
+        return self.spec.records - self.n
+
+    # -- record groups ----------------------------------------------------------
+
+    def history(self, role: str) -> None:
+        length = max(8, int(self.rng.gauss(self.spec.content_len, self.spec.content_len / 4)))
+        tag = "req" if role == "u" else "rpt"
+        self.emit(f"#{tag} content={self.value(self.text(length))} @rid={self.next_rid('h')}")
+
+    def facts(self) -> None:
+        for _ in range(min(self.left(), self.rng.randint(1, 3))):
+            key = f"{self.rng.choice(_WORDS)}_{self.rid}"
+            self.emit(f"#fact {key}={self.value(self.text(self.rng.randint(4, 40)))} @rid={self.next_rid('f')}")
+
+    def evidence(self) -> None:
+        k = min(self.left(), self.rng.randint(2, 6))
+        if k < 1:
+            return
+        src = f"s{self.rid}"
+        self.emit(f"#ref {src}=ref:url:example:2026-{self.rng.randint(1, 12):02d}-01")
+        rows = [(self.text(self.rng.randint(12, 60)), f"{self.rng.randint(40, 99) / 100:.2f}") for _ in range(k - 1)]
+        if rows and self.rng.random() < self.spec.columnar:
+            self.open_block("#evid[claim,src,conf]")
+            for claim, conf in rows:
+                self.emit(f'"{claim}" {src} {conf}')
+        else:
+            for claim, conf in rows:
+                self.emit(f"#evid claim={self.value(claim)} src={src} conf={conf} @rid={self.next_rid('e')}")
+
+    def tools(self) -> None:
+        depth = min(self.spec.tool_depth, max(0, (self.left() - 2) // 2))
+        if depth < 1:
+            return
+        rng = self.rng
+        self.emit(f"#think summary={self.value(self.text(rng.randint(20, 80)))} @rid={self.next_rid('t')}")
+        calls = [(self.next_rid("c"), rng.choice(_TOOLS), f"/src/{rng.choice(_WORDS)}.py") for _ in range(depth)]
+        if rng.random() < self.spec.columnar:
+            self.open_block("#call[tool,path]")
+            for rid, tool, path in calls:
+                self.emit(f"{tool} {path} @rid={rid}")
+            self.open_block("#ret[call,status,lines]")
+            for rid, _tool, _path in calls:
+                self.emit(f"{rid} ok {rng.randint(1, 900)} @rid={self.next_rid('r')}")
+        else:
+            for rid, tool, path in calls:
+                self.emit(f"#call tool={tool} path={path} @rid={rid}")
+                self.emit(f"#ret call={rid} status=ok lines={rng.randint(1, 900)} "
+                          f"sig={self.value(self.text(rng.randint(10, 60)))} @rid={self.next_rid('r')}")
+        if self.left() > 0:
+            self.emit(f"#edit file={calls[-1][2]} changes={rng.randint(1, 9)} "
+                      f"summary={self.value(self.text(40))} @rid={self.next_rid('d')}")
+
+    def cost(self) -> None:
+        if self.rng.random() < self.spec.columnar and self.left() > 1:
+            self.open_block("#cost[item,val,cur]")
+            for _ in range(min(self.left(), 3)):
+                self.emit(f"{self.atom(self.rng.choice(_WORDS))} 0.00{self.rng.randint(1, 9)} USD")
+        else:
+            self.emit(f"#cost val=0.00{self.rng.randint(1, 9)} cur=USD model=m{self.rng.randint(1, 4)}")
+
+    def intent(self) -> None:
+        self.emit(f"{self.rng.choice(('req', 'rpt', 'upd', 'ack', 'pln'))}"
+                  f"{{t={self.rng.choice(_WORDS)},s=f,l={self.rng.randint(1, 3)}}} @rid={self.next_rid('a')}")
+
+
+def generate(spec: CorpusSpec) -> str:
+    """One synthetic message for `spec`; identical output for identical specs."""
+    g = _Gen(spec)
+    out = ["@v 1", f"@id m{spec.seed}", "@sid ref:sess:01JBENCH0000000000000000000",
+           "@ts 2026-06-22T10:00:00.000+02:00", "@budget 1000USD", ""]
+    turns = max(spec.turns, 0)
+    per_turn = spec.records / turns if turns else spec.records
+    groups = (g.facts, g.evidence, g.tools, g.cost, g.intent)
+    weights = (3, 3, 2 if spec.tool_depth else 0, 1, 1)
+    turn = 0
+    while g.n < spec.records - 1:  # the closing #quota row is the last record
+        if turns and turn < turns and g.n >= turn * per_turn:
+            turn += 1
+            role = "u" if turn % 2 else "a"
+            g.emit(f"#{role}{turn}")
+            if g.left():
+                g.history(role)
+            continue
+        g.rng.choices(groups, weights)[0]()
+    out.extend(g.lines)
+    out.append("#quota[type,total,used,rem]")
+    out.append(f"tokens 200000 {g.n * 37} {200000 - g.n * 37}")
+    return "\n".join(out) + "\n"
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("profile", nargs="?", choices=sorted(PROFILES))
+    for f in fields(CorpusSpec):
+        ap.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=None)
+    args = ap.parse_args(argv[1:])
+    spec = PROFILES[args.profile] if args.profile else CorpusSpec()
+    spec = replace(spec, **{f.name: getattr(args, f.name) for f in fields(CorpusSpec)
+                            if getattr(args, f.name) is not None})
+    sys.stdout.write(generate(spec))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,176 @@
+"""Per-stage benchmark suite with JSON baselines and a regression gate.
+
+    python bench/suite.py [--cases PATTERN ...] [--large] [--min-time S]
+                          [--save FILE] [--compare FILE] [--threshold F]
+
+Runs `parse`, `validate`, `canonicalize`, `compute_hash`, and `render` over
+the nine `examples/*.pairl` files (fixed cases) and the synthetic profiles in
+`corpus.PROFILES` (`--large` adds the 100k-record one). For each case and
+stage it reports latency percentiles, throughput (MB/s and records/s at the
+median), and peak traced memory of one call. `--save` writes the results as
+a JSON baseline; `--compare` checks them against one and exits 1 when any
+stage's median latency or peak memory grew by more than `--threshold`
+(default 0.25, i.e. 25%). Baselines are only comparable on the same machine
+and Python version; both are recorded in the file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pairl  # noqa: E402
+from corpus import LARGE, PROFILES, examples, generate  # noqa: E402
+
+STAGES = ("parse", "validate", "canonicalize", "compute_hash", "render")
+
+
+def cases(patterns: list[str], large: bool) -> dict[str, str]:
+    """Case name -> message text, in run order."""
+    out = examples()
+    out.update((name, generate(spec)) for name, spec in PROFILES.items() if large or name not in LARGE)
+    if patterns:
+        out = {k: v for k, v in out.items() if any(fnmatch.fnmatchcase(k, p) for p in patterns)}
+    return out
+
+
+def stages(text: str) -> dict[str, Callable[[], object]]:
+    msg = pairl.parse(text)
+    return {
+        "parse": lambda: pairl.parse(text),
+        "validate": lambda: pairl.validate(msg),
+        "canonicalize": lambda: pairl.canonicalize(msg),
+        "compute_hash": lambda: pairl.compute_hash(msg),
+        "render": lambda: pairl.render(msg),
+    }
+
+
+def timings(fn: Callable[[], object], min_time: float, max_runs: int = 10_000) -> list[float]:
+    """Per-call latencies: at least 5 calls and `min_time` seconds in total."""
+    fn()  # warm-up
+    lat: list[float] = []
+    spent = 0.0
+    while (spent < min_time or len(lat) < 5) and len(lat) < max_runs:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        lat.append(dt)
+        spent += dt
+    return lat
+
+
+def peak_memory(fn: Callable[[], object]) -> int:
+    """Peak bytes allocated during one call (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(sorted_vals: list[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_vals[max(0, math.ceil(p / 100 * len(sorted_vals)) - 1)]
+
+
+def run_case(text: str, min_time: float, memory: bool = True) -> dict[str, dict[str, float]]:
+    nbytes = len(text.encode())
+    nrec = len(pairl.parse(text).records)
+    out: dict[str, dict[str, float]] = {}
+    for stage, fn in stages(text).items():
+        lat = sorted(timings(fn, min_time))
+        p50 = percentile(lat, 50)
+        out[stage] = {
+            "runs": len(lat),
+            "p50_ms": p50 * 1e3,
+            "p90_ms": percentile(lat, 90) * 1e3,
+            "p99_ms": percentile(lat, 99) * 1e3,
+            "mb_s": nbytes / p50 / 1e6,
+            "records_s": nrec / p50,
+        }
+        if memory:
+            out[stage]["peak_kb"] = peak_memory(fn) / 1024
+    return out
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions of `results` against `baseline`, one line each."""
+    found = []
+    for case, per_stage in results.items():
+        base_case = baseline.get(case, {})
+        for stage, m in per_stage.items():
+            base = base_case.get(stage)
+            if not base:
+                continue
+            for metric in ("p50_ms", "peak_kb"):
+                if metric in m and base.get(metric) and m[metric] > base[metric] * (1 + threshold):
+                    found.append(f"{case} {stage} {metric}: {base[metric]:.3f} -> {m[metric]:.3f} "
+                                 f"(+{m[metric] / base[metric] - 1:.0%})")
+    return found
+
+
+def _print_row(case: str, stage: str, m: dict[str, float]) -> None:
+    peak = f"{m['peak_kb']:10.0f}" if "peak_kb" in m else f"{'-':>10}"
+    print(f"{case:<34} {stage:<13} {m['p50_ms']:9.3f} {m['p90_ms']:9.3f} {m['p99_ms']:9.3f} "
+          f"{m['mb_s']:8.2f} {m['records_s']:12,.0f} {peak}")
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cases", nargs="*", default=[], metavar="PATTERN",
+                    help="case name globs, e.g. 'example:*' r1k (default: all)")
+    ap.add_argument("--large", action="store_true", help="include the 100k-record profile")
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per stage (default 0.2)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--save", metavar="FILE", help="write results as a JSON baseline")
+    ap.add_argument("--compare", metavar="FILE", help="fail on regressions against a baseline")
+    ap.add_argument("--threshold", type=float, default=0.25)
+    args = ap.parse_args(argv[1:])
+
+    selected = cases(args.cases, args.large)
+    if not selected:
+        print("no cases match", file=sys.stderr)
+        return 2
+    print(f"python {platform.python_version()}, {len(selected)} cases, {args.min_time}s per stage\n")
+    print(f"{'case':<34} {'stage':<13} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'MB/s':>8} "
+          f"{'records/s':>12} {'peak KB':>10}")
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for name, text in selected.items():
+        results[name] = run_case(text, args.min_time, memory=not args.no_memory)
+        for stage in STAGES:
+            _print_row(name, stage, results[name][stage])
+
+    if args.save:
+        doc = {"python": platform.python_version(), "machine": platform.machine(),
+               "platform": platform.platform(), "results": results}
+        Path(args.save).write_text(json.dumps(doc, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("python") != platform.python_version():
+            print(f"\nnote: baseline is from python {baseline.get('python')}", file=sys.stderr)
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno regressions over {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
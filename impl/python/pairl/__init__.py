@@ -3,13 +3,36 @@
 from .core import (
     SPEC_VERSION,
     ColumnarBlock,
+    LimitExceeded,
     Message,
     Record,
+    StreamParser,
+    aparse_stream,
     parse,
+    parse_stream,
 )
-from .canonical import canonicalize, compute_hash, hash_ref, serialize_record
-from .render import render
-from .validate import Result, validate
+from .archive import Archive, ArchiveWriter
+from .canonical import (
+    CanonicalWriter,
+    HashVerifier,
+    canonicalize,
+    compute_hash,
+    fast_hash,
+    hash_ref,
+    serialize_record,
+)
+from .columnar import compact, estimate_tokens
+from .delta import apply_delta, diff
+from .legend import FrozenLegend, Legend, body_legend
+from .logscan import scan_buffer, scan_log
+from .merkle import MerkleTree, merkle_root, prove_records, verify_proof
+from .quote import QuoteIndex, verify_quotations
+from .render import Renderer, render
+from .session import Session
+from .stats import Stats, instrument
+from .store import Store
+from .thread import ThreadGraph
+from .validate import Result, Rule, ValidationError, Validator, register_rule, rule_names, validate
 
 __all__ = [
     "SPEC_VERSION",
@@ -17,11 +40,46 @@ __all__ = [
     "Record",
     "ColumnarBlock",
     "parse",
+    "parse_stream",
+    "aparse_stream",
+    "StreamParser",
+    "LimitExceeded",
     "validate",
     "Result",
+    "Validator",
+    "ValidationError",
+    "Rule",
+    "register_rule",
+    "rule_names",
     "canonicalize",
+    "compact",
+    "estimate_tokens",
+    "CanonicalWriter",
     "serialize_record",
     "compute_hash",
+    "fast_hash",
     "hash_ref",
+    "HashVerifier",
+    "diff",
+    "apply_delta",
+    "MerkleTree",
+    "merkle_root",
+    "prove_records",
+    "verify_proof",
+    "QuoteIndex",
+    "verify_quotations",
     "render",
+    "Renderer",
+    "scan_log",
+    "scan_buffer",
+    "body_legend",
+    "Legend",
+    "FrozenLegend",
+    "Session",
+    "Stats",
+    "instrument",
+    "Store",
+    "Archive",
+    "ArchiveWriter",
+    "ThreadGraph",
 ]
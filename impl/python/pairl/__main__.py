@@ -1,28 +1,74 @@
-"""CLI: python -m pairl <validate|render|hash> [--strict] <file.pairl>"""
+"""CLI: python -m pairl <validate|render|hash|canon|compact> [--strict] [--jobs N] [--jsonl]
+                       [--stats] <path>...
+     python -m pairl serve [options]  (see pairl.serve)
+
+A single file prints human-readable output. Several paths, directories (walked
+for *.pairl), globs, `--jobs`, or `--jsonl` switch to batch mode: one JSON line
+per file, in input order, then a summary on stderr. The exit code is the worst
+over all files: 0 ok, 1 invalid, 2 unreadable. `--stats` instruments the run
+(see pairl.stats) and writes the metrics to stderr in the Prometheus format.
+"""
 
 from __future__ import annotations
 
+import argparse
+import glob
+import json
+import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from . import canonicalize, compact, compute_hash, fast_hash, parse, render, stats, validate
 
-from . import canonicalize, compute_hash, parse, render, validate
+_COMMANDS = ("validate", "render", "hash", "canon", "compact")
+_CHUNK = 16  # files per worker task
 
 
 def _usage() -> int:
-    print("usage: python -m pairl <validate|render|hash|canon> [--strict] <file.pairl>")
+    print("usage: python -m pairl <validate|render|hash|canon|compact> [--strict] [--jobs N] [--jsonl] "
+          "[--stats] <path>...")
+    print("       python -m pairl serve [--unix PATH | --host HOST --port PORT] [--jobs N] ...")
     return 2
 
 
 def main(argv: list[str]) -> int:
-    args = argv[1:]
-    if len(args) < 2:
+    if argv[1:2] == ["serve"]:
+        from .serve import main as serve
+        return serve(argv[2:])
+    if len(argv) < 3:
         return _usage()
-    cmd = args[0]
-    strict = "--strict" in args
-    files = [a for a in args[1:] if not a.startswith("-")]
-    if not files:
+    ap = argparse.ArgumentParser(prog="python -m pairl", add_help=False, exit_on_error=False)
+    ap.add_argument("cmd")
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--strict", action="store_true")
+    ap.add_argument("--jobs", type=int, default=None)
+    ap.add_argument("--jsonl", action="store_true")
+    ap.add_argument("--stats", action="store_true")
+    try:
+        args, unknown = ap.parse_known_intermixed_args(argv[1:])
+    except argparse.ArgumentError:
         return _usage()
-    path = files[0]
+    if unknown or not args.paths or args.cmd not in _COMMANDS or (args.jobs is not None and args.jobs < 0):
+        return _usage()
+
+    collector = stats.enable() if args.stats else None
+    try:
+        single = args.paths[0]
+        if len(args.paths) == 1 and args.jobs is None and not args.jsonl and not glob.has_magic(single) \
+                and not os.path.isdir(single):
+            return _run_one(args.cmd, single, args.strict)
+        return _run_batch(args.cmd, args.paths, args.strict, 1 if args.jobs is None else args.jobs, collector)
+    finally:
+        if collector is not None:
+            stats.disable()
+            sys.stdout.flush()
+            sys.stderr.write(collector.prometheus())
+
 
+def _run_one(cmd: str, path: str, strict: bool) -> int:
     try:
         with open(path, encoding="utf-8") as f:
             text = f.read()
@@ -30,6 +76,9 @@ def main(argv: list[str]) -> int:
         print(f"error: {e}")
         return 2
 
+    if cmd == "hash":
+        print(f"ref:hash:sha256:{fast_hash(text) or compute_hash(parse(text))}")
+        return 0
     msg = parse(text)
 
     if cmd == "validate":
@@ -43,13 +92,171 @@ def main(argv: list[str]) -> int:
     if cmd == "render":
         sys.stdout.write(render(msg))
         return 0
-    if cmd == "hash":
-        print(f"ref:hash:sha256:{compute_hash(msg)}")
+    if cmd == "compact":
+        sys.stdout.write(compact(msg))
         return 0
-    if cmd == "canon":
-        sys.stdout.write(canonicalize(msg, for_hash=not strict))
-        return 0
-    return _usage()
+    sys.stdout.write(canonicalize(msg, for_hash=not strict))
+    return 0
+
+
+# -- batch mode ---------------------------------------------------------------
+
+
+def expand_paths(specs: Iterable[str]) -> Iterator[str]:
+    """Yield the files named by paths, directories, and globs, lazily.
+
+    Directories are walked depth-first in sorted order for *.pairl files; glob
+    matches come in filesystem order. Plain paths are yielded as given, so a
+    missing file is reported rather than dropped.
+    """
+    for spec in specs:
+        if os.path.isdir(spec):
+            yield from _walk(spec)
+        elif glob.has_magic(spec):
+            for p in glob.iglob(spec, recursive=True):
+                if os.path.isdir(p):
+                    yield from _walk(p)
+                else:
+                    yield p
+        else:
+            yield spec
+
+
+def _walk(top: str) -> Iterator[str]:
+    with os.scandir(top) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for e in entries:
+        if e.is_dir():
+            yield from _walk(e.path)
+        elif e.name.endswith(".pairl"):
+            yield e.path
+
+
+def check_file(cmd: str, path: str, strict: bool = False) -> dict:
+    """Run one CLI command on a file; return its JSON Lines result."""
+    out: dict = {"path": path}
+    timings: dict[str, float] = {}
+    t = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + now - t
+        t = now
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        out["error"] = str(e)
+        return out
+    lap("read")
+
+    digest = None
+    if cmd in ("validate", "hash"):
+        # Input already in canonical form hashes as-is, without a parse.
+        digest = fast_hash(text)
+        out["fast_path"] = digest is not None
+        lap("hash")
+    if cmd != "hash" or digest is None:
+        msg = parse(text)
+        lap("parse")
+        if cmd in ("validate", "hash") and digest is None:
+            digest = compute_hash(msg)
+            lap("hash")
+        if cmd == "validate":
+            res = validate(msg, strict=strict, digest=digest)
+            lap("validate")
+            out.update(valid=res.valid, errors=res.errors, warnings=res.warnings)
+        elif cmd == "canon":
+            out["canon"] = canonicalize(msg, for_hash=not strict)
+            lap("canon")
+        elif cmd == "render":
+            out["render"] = render(msg)
+            lap("render")
+        elif cmd == "compact":
+            out["compact"] = compact(msg)
+            lap("compact")
+    if digest is not None:
+        out["hash"] = f"ref:hash:sha256:{digest}"
+    out["timings"] = {k: round(v * 1e3, 3) for k, v in timings.items()}  # ms
+    return out
+
+
+def _check_chunk(cmd: str, paths: list[str], strict: bool) -> list[dict]:
+    return [check_file(cmd, p, strict) for p in paths]
+
+
+def _chunks(paths: Iterable[str], size: int) -> Iterator[list[str]]:
+    chunk: list[str] = []
+    for p in paths:
+        chunk.append(p)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_results(cmd: str, paths: Iterable[str], strict: bool = False, jobs: int = 1,
+                 collector: Optional[stats.Stats] = None) -> Iterator[dict]:
+    """Check files with `jobs` worker processes, yielding results in input order.
+
+    Paths are consumed lazily and at most a few chunks per worker are in
+    flight, so memory stays bounded however many files there are. `jobs=0`
+    uses one worker per CPU; `jobs=1` runs in this process. With a
+    `collector`, workers run instrumented and their totals are merged into it.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        for p in paths:
+            yield check_file(cmd, p, strict)
+        return
+    chunks = _chunks(paths, _CHUNK)
+    window: deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for chunk in chunks:
+            if collector is None:
+                window.append(pool.submit(_check_chunk, cmd, chunk, strict))
+            else:
+                window.append(pool.submit(stats.collected, _check_chunk, cmd, chunk, strict))
+            if len(window) >= 4 * jobs:
+                yield from _merged(window.popleft().result(), collector)
+        while window:
+            yield from _merged(window.popleft().result(), collector)
+
+
+def _merged(result: list[dict] | tuple[list[dict], dict], collector: Optional[stats.Stats]) -> list[dict]:
+    if collector is None:
+        return result
+    out, totals = result
+    collector.merge(totals)
+    return out
+
+
+def _run_batch(cmd: str, specs: list[str], strict: bool, jobs: int,
+               collector: Optional[stats.Stats] = None) -> int:
+    t0 = time.perf_counter()
+    counts = {"files": 0, "ok": 0, "invalid": 0, "unreadable": 0, "fast_path": 0}
+    status = 0
+    write = sys.stdout.write
+    for res in iter_results(cmd, expand_paths(specs), strict, jobs, collector):
+        write(json.dumps(res, ensure_ascii=False) + "\n")
+        counts["files"] += 1
+        counts["fast_path"] += res.get("fast_path", False)
+        if "error" in res:
+            counts["unreadable"] += 1
+            status = 2
+        elif res.get("valid", True):
+            counts["ok"] += 1
+        else:
+            counts["invalid"] += 1
+            status = max(status, 1)
+    sys.stdout.flush()
+    counts["seconds"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps({"summary": counts}), file=sys.stderr)
+    return status
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+"""Compressed message archive (SPEC §15.2).
+
+Each message is deflated on its own with a preset dictionary, so a message
+a few hundred bytes long still finds back-references: the dictionary holds
+the protocol vocabulary (header lines, intent atoms, record tags, the keys
+each record type carries) and, optionally, fragments learned from a sample of
+real traffic (`build_dictionary()`). Frames are independent and an offset
+index at the end of the file locates each one, so `Archive.raw(i)` inflates
+one message and touches nothing else.
+
+Layout: magic, dictionary length, dictionary; then one frame per message
+(compressed length, CRC-32 of the message text, raw deflate data); then the
+offset of each frame (little-endian, like every field) and a footer pointing
+at them. A file without a footer (the writer was not closed) is read by
+walking its frames, and the torn tail of the last one, if any, is dropped.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, Optional, Union
+
+from .canonical import canonicalize
+from .core import Message, parse
+from .legend import INTENTS
+
+_HEAD = struct.Struct("<8sI")
+_FRAME = struct.Struct("<II")
+_FOOT = struct.Struct("<QQ8s")
+_MAGIC = b"PAIRLAZ1"
+_INDEX = b"PAIRLAZX"
+_WBITS = -15  # raw deflate: no zlib header or adler-32 per frame
+DICT_SIZE = 32768  # deflate reaches back at most 32 KiB
+
+# Protocol vocabulary, least useful first: deflate codes short distances in
+# fewer bits, so the fragments most messages use go at the end.
+_KEYS = {
+    "evid": ('claim="', "src=", "conf=0."), "cost": ("val=", "cur=USD", "model="),
+    "quota": ("type=tokens", "total=", "used=", "rem="), "call": ("tool=", "path=/", "args="),
+    "ret": ("call=", "status=ok", "status=err", "lines="), "think": ('summary="',),
+    "edit": ("file=", "changes="), "req": ('content="',), "rpt": ('content="', "mode=cond"),
+    "rule": (), "fact": (), "ref": ("=ref:url:", "=ref:doc:"),
+}
+VOCABULARY: tuple[str, ...] = (
+    *(f"{name}{{t=" for name in INTENTS),
+    ",s=f", ",s=c", ",s=t", ",l=1", ",l=2", ",m=+", ",m=!", ",a=i", ",a=c", ",u=lo", ",u=md", ",fmt=bul}",
+    "#msg ", " r=u parent=", " r=a parent=", "ref:msg:", "#s ",
+    *(f"#{t} {k}" if k else f"#{t} " for t, keys in _KEYS.items() for k in keys[:1] or ("",)),
+    *(f" {k}" for keys in _KEYS.values() for k in keys[1:]),
+    "\n@p ", "\n@root ", "\n@deps ", "\n@budget ", "\n@limit ", "\n@hash ref:hash:sha256:",
+    "\n\n#u1\n", "\n#a2\n", "\n#u3\n", " @m=u1", " @rid=",
+    "@v 1\n@id ", "\n@sid ref:sess:", "\n@ts 2026-",
+)
+_PIECE = re.compile(r'[ ,{]?[^ ,{"]+(?:"[^"]*"?)?')
+
+
+def build_dictionary(samples: Iterable[Union[str, Message]] = (), *, size: int = DICT_SIZE) -> bytes:
+    """A preset dictionary: the protocol vocabulary, plus fragments of `samples`.
+
+    Sample lines and their space-separated pieces are counted once per
+    message they occur in; those in at least two messages are kept, best
+    (count times length) last, until `size` bytes are used.
+    """
+    vocab = "".join(VOCABULARY)
+    counts: Counter[str] = Counter()
+    for text in samples:
+        if isinstance(text, Message):
+            text = canonicalize(text, for_hash=False)
+        seen: set[str] = set()
+        for line in text.split("\n"):
+            seen.add("\n" + line)
+            seen.update(_PIECE.findall(line))
+        counts.update(seen)
+    budget = size - len(vocab.encode("utf-8"))
+    picked: list[str] = []
+    for piece, n in sorted(counts.items(), key=lambda kv: (-kv[1] * len(kv[0]), kv[0])):
+        if n < 2 or len(piece) < 3 or piece in vocab:
+            continue
+        cost = len(piece.encode("utf-8"))
+        if cost > budget:
+            continue
+        picked.append(piece)
+        budget -= cost
+    return ("".join(reversed(picked)) + vocab).encode("utf-8")
+
+
+DEFAULT_DICTIONARY = build_dictionary()
+
+
+def _text(msg: Union[Message, str, bytes]) -> bytes:
+    if isinstance(msg, Message):
+        return canonicalize(msg, for_hash=False).encode("utf-8")
+    return msg.encode("utf-8") if isinstance(msg, str) else bytes(msg)
+
+
+def _walk(buf: Union[bytes, mmap.mmap], zdict: bytes, start: int, end: int) -> tuple[list[int], int]:
+    """Offsets of the whole, intact frames in buf[start:end], and where they stop."""
+    offsets = []
+    pos = start
+    while pos + _FRAME.size <= end:
+        length, crc = _FRAME.unpack_from(buf, pos)
+        stop = pos + _FRAME.size + length
+        if stop > end:
+            break
+        try:
+            data = zlib.decompressobj(_WBITS, zdict=zdict).decompress(buf[pos + _FRAME.size:stop])
+        except zlib.error:
+            break
+        if zlib.crc32(data) != crc:
+            break
+        offsets.append(pos)
+        pos = stop
+    return offsets, pos
+
+
+def _dictionary(buf: Union[bytes, mmap.mmap]) -> bytes:
+    magic, n = _HEAD.unpack_from(buf, 0) if len(buf) >= _HEAD.size else (b"", 0)
+    if magic != _MAGIC:
+        raise ValueError("not a PAIRL archive")
+    return bytes(buf[_HEAD.size:_HEAD.size + n])
+
+
+def _layout(buf: Union[bytes, mmap.mmap]) -> tuple[bytes, list[int], int]:
+    """(dictionary, frame offsets, end of the last frame) of an archive."""
+    zdict = _dictionary(buf)
+    start = _HEAD.size + len(zdict)
+    if len(buf) >= start + _FOOT.size:
+        index, count, magic = _FOOT.unpack_from(buf, len(buf) - _FOOT.size)
+        if magic == _INDEX and index + 8 * count + _FOOT.size == len(buf):
+            offsets = array("Q", buf[index:index + 8 * count])
+            if sys.byteorder == "big":
+                offsets.byteswap()
+            return zdict, offsets.tolist(), index
+    offsets, end = _walk(buf, zdict, start, len(buf))
+    return zdict, offsets, end
+
+
+class ArchiveWriter:
+    """Append messages to an archive; `close()` writes the offset index.
+
+    A new archive takes `dictionary` (default: the protocol vocabulary). An
+    existing one is reopened for appending with its own dictionary (passing
+    another raises ValueError): its index is dropped and rewritten on close,
+    and a torn last frame is cut.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], *, dictionary: Optional[bytes] = None,
+                 level: int = 9) -> None:
+        self.path = os.fspath(path)
+        self.level = level
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self._fh = open(self.path, "r+b")
+            try:
+                # Mapped, so that with an index only the footer and index are read.
+                with mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    self.dictionary, offsets, end = _layout(mm)
+                if dictionary is not None and bytes(dictionary) != self.dictionary:
+                    raise ValueError(f"{self.path} was written with a different dictionary")
+            except BaseException:
+                self._fh.close()
+                raise
+            self._fh.truncate(end)
+            self._fh.seek(end)
+        else:
+            self.dictionary = DEFAULT_DICTIONARY if dictionary is None else bytes(dictionary)
+            if len(self.dictionary) > DICT_SIZE:
+                raise ValueError(f"dictionary larger than {DICT_SIZE} bytes")
+            self._fh = open(self.path, "wb")
+            self._fh.write(_HEAD.pack(_MAGIC, len(self.dictionary)) + self.dictionary)
+            offsets, end = [], self._fh.tell()
+        self._offsets = array("Q", offsets)
+        self._end = end
+
+    def __enter__(self) -> ArchiveWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, msg: Union[Message, str, bytes]) -> int:
+        """Compress one message into a new frame; return its index."""
+        return self.extend([msg])[0]
+
+    def extend(self, msgs: Iterable[Union[Message, str, bytes]]) -> list[int]:
+        """Compress messages (canonical text for a `Message`); return their indexes."""
+        out, chunk = [], []
+        for msg in msgs:
+            data = _text(msg)
+            c = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS, zdict=self.dictionary)
+            packed = c.compress(data) + c.flush()
+            out.append(len(self._offsets))
+            self._offsets.append(self._end)
+            chunk.append(_FRAME.pack(len(packed), zlib.crc32(data)) + packed)
+            self._end += _FRAME.size + len(packed)
+        self._fh.write(b"".join(chunk))
+        return out
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        index = array("Q", self._offsets)
+        if sys.byteorder == "big":
+            index.byteswap()
+        self._fh.write(index.tobytes() + _FOOT.pack(self._end, len(self._offsets), _INDEX))
+        self._fh.close()
+
+
+class Archive:
+    """Read an archive: `raw(i)` and `get(i)` inflate message i alone."""
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = os.fspath(path)
+        self._fh = open(self.path, "rb")
+        try:
+            if os.fstat(self._fh.fileno()).st_size < _HEAD.size:  # mmap refuses empty files
+                raise ValueError("not a PAIRL archive")
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._fh.close()
+            raise
+        self.dictionary, offsets, _ = _layout(self._mm)
+        self._offsets = array("Q", offsets)
+
+    def __enter__(self) -> Archive:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def raw(self, i: int) -> bytes:
+        """The text of message i, as it was archived."""
+        pos = self._offsets[i]
+        length, crc = _FRAME.unpack_from(self._mm, pos)
+        pos += _FRAME.size
+        data = zlib.decompressobj(_WBITS, zdict=self.dictionary).decompress(self._mm[pos:pos + length])
+        if zlib.crc32(data) != crc:
+            raise ValueError(f"archive frame {i} is corrupt")
+        return data
+
+    def get(self, i: int) -> Message:
+        return parse(self.raw(i).decode("utf-8"))
+
+    def __iter__(self) -> Iterator[Message]:
+        return (self.get(i) for i in range(len(self._offsets)))
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
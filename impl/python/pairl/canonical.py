@@ -7,20 +7,23 @@ canonicalization (§9.4a), so a message hashes identically in either form.
 from __future__ import annotations
 
 import hashlib
+import re
+from typing import Any, Callable, Optional
 
-from .core import Message, Record
+from .core import Message, Record, parse
 
 # Canonical header order (§9.1). Unknown headers are appended, sorted.
 _HEADER_ORDER = ["v", "id", "mid", "sid", "ts", "p", "parent", "root", "deps", "budget", "limit"]
-_ATOM_OK = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789:._/@+-")
+# A value stays a bare atom only if non-empty and made of these characters.
+_NOT_ATOM = re.compile(r"[^A-Za-z0-9:._/@+-]")
 
 
 def _needs_quote(v: str) -> bool:
-    return v == "" or any(c not in _ATOM_OK for c in v)
+    return v == "" or _NOT_ATOM.search(v) is not None
 
 
 def _fmt_value(v: str) -> str:
-    if _needs_quote(v):
+    if v == "" or _NOT_ATOM.search(v):
         return '"' + v.replace('"', '\\"') + '"'
     return v
 
@@ -48,31 +51,221 @@ def serialize_record(r: Record) -> str:
     return head + trail
 
 
-def canonicalize(msg: Message, *, for_hash: bool = True) -> str:
-    """Produce the canonical text. With for_hash, @hash is omitted (§9.6)."""
-    lines: list[str] = []
-    keys = list(msg.headers.keys())
-    ordered = [k for k in _HEADER_ORDER if k in msg.headers]
-    ordered += sorted(k for k in keys if k not in _HEADER_ORDER and k != "hash")
-    if not for_hash and "hash" in msg.headers:
+def header_lines(headers: dict[str, str], *, for_hash: bool = True) -> list[str]:
+    """The canonical header block (§9.1), without the separating blank line."""
+    ordered = [k for k in _HEADER_ORDER if k in headers]
+    ordered += sorted(k for k in headers if k not in _HEADER_ORDER and k != "hash")
+    if not for_hash and "hash" in headers:
         ordered.append("hash")
-    for k in ordered:
-        lines.append(f"@{k} {msg.headers[k]}")
+    return [f"@{k} {headers[k]}" for k in ordered]
+
 
+def canonicalize(msg: Message, *, for_hash: bool = True) -> str:
+    """Produce the canonical text. With for_hash, @hash is omitted (§9.6)."""
+    lines = header_lines(msg.headers, for_hash=for_hash)
     lines.append("")  # blank line separating header block from body
 
-    # Records already include columnar rows expanded into Record objects (§9.4a),
-    # so iterating msg.records yields the canonical, expanded body.
-    for r in msg.records:
+    # Columnar rows are expanded into record views on the fly (§9.4a), so this
+    # walks the canonical, expanded body without materializing msg.records.
+    for r in msg.iter_records():
         lines.append(serialize_record(r))
 
     return "\n".join(lines) + "\n"
 
 
+class CanonicalWriter:
+    """Write a message's canonical bytes (§9) record by record.
+
+    Sinks are binary files and other objects with `write()`, sockets
+    (`sendall()`), and hashlib objects (`update()`); every sink receives the
+    same bytes. Output is buffered in chunks of about `buffer_size` bytes, so
+    memory stays constant however large the body is.
+    """
+
+    def __init__(self, *sinks: Any, buffer_size: int = 1 << 16) -> None:
+        self._sinks: list[Callable[[bytes], object]] = []
+        for sink in sinks:
+            for name in ("update", "sendall", "write"):
+                fn = getattr(sink, name, None)
+                if fn is not None:
+                    self._sinks.append(fn)
+                    break
+            else:
+                raise TypeError(f"not a byte sink: {sink!r}")
+        self._buf: list[str] = []
+        self._size = 0
+        self._limit = buffer_size
+
+    def write_headers(self, headers: dict[str, str], *, for_hash: bool = True) -> None:
+        """The header block and the blank line that ends it."""
+        for line in header_lines(headers, for_hash=for_hash):
+            self._line(line)
+        self._line("")
+
+    def write_record(self, r: Record) -> None:
+        self._line(serialize_record(r))
+
+    def write_message(self, msg: Message, *, for_hash: bool = True) -> None:
+        """The whole message, then flush; columnar rows are expanded on the fly."""
+        self.write_headers(msg.headers, for_hash=for_hash)
+        for r in msg.iter_records():
+            self._line(serialize_record(r))
+        self.flush()
+
+    def _line(self, line: str) -> None:
+        self._buf.append(line)
+        self._size += len(line) + 1
+        if self._size >= self._limit:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._buf.append("")
+            data = "\n".join(self._buf).encode("utf-8")
+            self._buf, self._size = [], 0
+            for send in self._sinks:
+                send(data)
+
+
+# Fast-path recognizers (V5): a line they accept is exactly what
+# serialize_record() gives for the record parse() reads from it. They are
+# conservative — anything unusual (bare tokens, empty keys, stray spaces,
+# columnar blocks) simply takes the full round trip.
+_CANON_VALUE = r'(?:[A-Za-z0-9:._/@+-]+|"[^"\\]*(?:\\"[^"\\]*)*")'
+_CANON_KEY = r'[^\s=,"@{}\[\]][^\s=,"{}\[\]]*'
+_CANON_TAGS = r"((?: @m=\S+)?(?: @rid=\S+)?)"
+_CANON_KV = re.compile(r"#(?!s(?![a-z0-9_]))[a-z][a-z0-9_]*((?: " + _CANON_KEY + "=" + _CANON_VALUE + ")*)"
+                       + _CANON_TAGS)
+_CANON_INTENT = re.compile(r"(?:[a-z0-9]{2,4}|[a-z][a-z0-9_-]*(?:\.[a-z][a-z0-9_-]*)+)\{((?:"
+                           + _CANON_KEY + "=" + _CANON_VALUE + "(?:," + _CANON_KEY + "=" + _CANON_VALUE
+                           + r")*)?)\}" + _CANON_TAGS)
+_CANON_S = re.compile(r"#s(?: \S(?:.*?\S)??)??" + _CANON_TAGS)
+_CANON_MSG = re.compile(r"#msg \S+ r=\S+ parent=\S+")
+_CANON_PAIR = re.compile(r'(?:^|[ ,])([^\s=,]+)=(?:[A-Za-z0-9:._/@+-]+|"([^"\\]*(?:\\"[^"\\]*)*)")')
+_CANON_HEADER = re.compile(r"@(\w+) (\S(?:.*\S)?)")
+_HASH_REF = re.compile(r"ref:hash:([A-Za-z0-9_-]+):([0-9A-Fa-f]+)")
+
+
+def _canonical_line(line: str) -> bool:
+    """Whether a body line is already in canonical form."""
+    if line[:1] == "#":
+        m = _CANON_KV.fullmatch(line) or _CANON_S.fullmatch(line)
+        if m is None:
+            return _CANON_MSG.fullmatch(line) is not None
+    else:
+        m = _CANON_INTENT.fullmatch(line)
+        if m is None:
+            return False
+    pairs = m.group(1) if m.re.groups == 2 else ""
+    if '"' in pairs or pairs.count("=") > 1:
+        keys = set()
+        for pm in _CANON_PAIR.finditer(pairs):
+            q = pm.group(2)
+            if pm.group(1) in keys or (q and not _NOT_ATOM.search(q)):
+                return False  # repeated key, or a quoted atom that canonicalizes bare
+            keys.add(pm.group(1))
+    # What is left must not end like a tag, or parse() would peel it off too.
+    tail = line[:m.start(m.re.groups)].rsplit(None, 1)
+    return len(tail) < 2 or not tail[1].startswith(("@m=", "@rid=")) or tail[1] in ("@m=", "@rid=")
+
+
+def _sha256_ref(value: Optional[str]) -> Optional[str]:
+    """The lowercased hex of a `ref:hash:sha256:<hex>` value, else None."""
+    m = _HASH_REF.fullmatch(value) if value else None
+    return m.group(2).lower() if m and m.group(1) == "sha256" else None
+
+
+def _scan(data: str | bytes) -> Optional[tuple[str, Optional[str]]]:
+    """(digest, `@hash` value) of already-canonical input, else None."""
+    if isinstance(data, str):
+        text = data
+    else:
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+    head, sep, body = text.partition("\n\n")
+    if not sep or not head or (body and body[-1] != "\n"):
+        return None
+    keys, kept, claimed = [], [], None
+    for line in head.split("\n"):
+        hm = _CANON_HEADER.fullmatch(line)
+        if hm is None:
+            return None
+        if hm.group(1) == "hash":
+            if claimed is not None:
+                return None
+            claimed = hm.group(2)
+            continue
+        keys.append(hm.group(1))
+        kept.append(line)
+    order = [k for k in _HEADER_ORDER if k in keys]
+    order += sorted(k for k in keys if k not in _HEADER_ORDER)
+    if keys != order or len(set(keys)) != len(keys):  # parse() keeps only the last of repeated keys
+        return None
+    start, find = 0, body.find
+    while start < len(body):  # line by line, so non-canonical input bails out early
+        end = find("\n", start)
+        if not _canonical_line(body[start:end]):
+            return None
+        start = end + 1
+    h = hashlib.sha256(("\n".join([*kept, ""]) + "\n").encode("utf-8"))  # as canonicalize() joins it
+    if isinstance(data, str):
+        h.update(body.encode("utf-8"))
+    else:
+        h.update(memoryview(data)[len(head.encode("utf-8")) + 2:])
+    return h.hexdigest(), claimed
+
+
+def fast_hash(data: str | bytes) -> Optional[str]:
+    """`compute_hash(parse(data))` for input that is already canonical, else None.
+
+    One linear scan over the raw text, without parsing: the header block must
+    be in canonical order (an `@hash` line anywhere in it is skipped), the
+    body one canonical record per line with no columnar blocks, and the text
+    must end with a single LF. Such input hashes as-is, minus its `@hash` line.
+    """
+    scanned = _scan(data)
+    return scanned[0] if scanned else None
+
+
+class HashVerifier:
+    """V5 `@hash` verification over raw messages, counting the paths taken.
+
+    Input that is already canonical is hashed directly (see `fast_hash`);
+    anything else takes the full `parse()` → `compute_hash()` round trip.
+    `fast` and `full` count the messages checked each way; messages without
+    a sha256 `@hash` are not counted.
+    """
+
+    def __init__(self) -> None:
+        self.fast = 0
+        self.full = 0
+
+    def verify(self, data: str | bytes) -> Optional[bool]:
+        """Whether `@hash` matches; None if there is no sha256 `@hash` to check."""
+        scanned = _scan(data)
+        if scanned is not None:
+            digest, claimed = scanned
+            want = _sha256_ref(claimed)
+            if want is None:
+                return None
+            self.fast += 1
+        else:
+            msg = parse(data if isinstance(data, str) else data.decode("utf-8", "replace"))
+            want = _sha256_ref(msg.headers.get("hash"))
+            if want is None:
+                return None
+            self.full += 1
+            digest = compute_hash(msg)
+        return digest == want
+
+
 def compute_hash(msg: Message) -> str:
-    canon = canonicalize(msg, for_hash=True)
-    digest = hashlib.sha256(canon.encode("utf-8")).hexdigest()
-    return digest
+    """SHA-256 of the canonical text (§9.6), streamed with constant extra memory."""
+    h = hashlib.sha256()
+    CanonicalWriter(h).write_message(msg)
+    return h.hexdigest()
 
 
 def hash_ref(msg: Message) -> str:
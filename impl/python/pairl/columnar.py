@@ -0,0 +1,102 @@
+"""Columnar compaction (SPEC §3.4): re-encode a message in its smallest form.
+
+`compact()` walks the expanded body and finds runs of adjacent fixed-schema
+records (`FIXED_SCHEMA_TYPES`) of one type with the same keys in the same
+order. A run is emitted as a `#type[keys]` block when that is smaller than its
+`key=value` lines, and left as they are otherwise. Nothing is reordered, so a
+run never crosses a turn marker or any other record. Columnar blocks expand
+back to the same records before hashing (§9.4a), so the output hashes like
+the input; each block is also parsed back before it is used, and a run whose
+block would not read back identically stays in `key=value` form.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional
+
+from .canonical import _fmt_value, header_lines, serialize_record
+from .core import FIXED_SCHEMA_TYPES, Message, Record, StreamParser
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(line: str) -> int:
+    """A rough BPE token count: a word per 4 characters, punctuation one each."""
+    return sum((len(w) + 3) // 4 for w in _WORD.findall(line))
+
+
+_MEASURES: dict[str, Callable[[str], int]] = {
+    "bytes": lambda line: len(line.encode("utf-8")) + 1,
+    "tokens": lambda line: estimate_tokens(line) + 1,
+}
+
+
+def _schema(r: Record) -> Optional[tuple[str, tuple[str, ...]]]:
+    if r.kind not in FIXED_SCHEMA_TYPES or r.arg is not None:
+        return None
+    kv = r.kv
+    return (r.name, tuple(kv)) if kv else None
+
+
+def _row(values: list[str]) -> str:
+    fields = [_fmt_value(v) for v in values]
+    # A bare first field must not end the block, nor a bare last one read as a tag.
+    if fields[0].startswith("#") or fields[0] == "---":
+        fields[0] = f'"{fields[0]}"'
+    if fields[-1].startswith(("@m=", "@rid=")):
+        fields[-1] = f'"{fields[-1]}"'
+    return " ".join(fields)
+
+
+def _block(name: str, keys: tuple[str, ...], run: list[Record]) -> list[str]:
+    out = [f"#{name}[{','.join(keys)}]"]
+    for r in run:
+        row = _row(list(r.kv.values()))
+        if r.m:
+            row += f" @m={r.m}"
+        if r.rid:
+            row += f" @rid={r.rid}"
+        out.append(row)
+    return out
+
+
+def _reads_back(block: list[str], plain: list[str]) -> bool:
+    p = StreamParser(body=True)
+    p.feed("\n".join(block) + "\n")
+    p.close()
+    return [serialize_record(r) for r in p.message.iter_records()] == plain
+
+
+def compact(msg: Message, *, measure: str = "bytes") -> str:
+    """`msg` as text with each fixed-schema run in its smaller form.
+
+    `measure` is "bytes" (UTF-8) or "tokens" (`estimate_tokens()`). Headers
+    are in canonical order and `@hash` is kept: it still holds.
+    """
+    cost = _MEASURES[measure]
+    lines = header_lines(msg.headers, for_hash=False)
+    lines.append("")
+    recs = list(msg.iter_records())
+    i, n = 0, len(recs)
+    while i < n:
+        schema = _schema(recs[i])
+        if schema is None:
+            lines.append(serialize_record(recs[i]))
+            i += 1
+            continue
+        j = i + 1
+        while j < n and _schema(recs[j]) == schema:
+            j += 1
+        plain = [serialize_record(r) for r in recs[i:j]]
+        if j - i > 1:
+            block = _block(*schema, recs[i:j])
+            # Rows run until the next line starting with `#`; before anything
+            # else (an intent, say) the block has to be closed with `---`.
+            if j < n and not serialize_record(recs[j]).startswith("#"):
+                block.append("---")
+            if sum(map(cost, block)) < sum(map(cost, plain)) and _reads_back(block, plain):
+                plain = block
+        lines.extend(plain)
+        i = j
+    return "\n".join(lines) + "\n"
@@ -6,9 +6,11 @@ v1.3 turn markers, v1.4 short references, and v1.5 columnar record blocks.
 
 from __future__ import annotations
 
+import codecs
 import re
-from dataclasses import dataclass, field
-from typing import Optional
+import sys
+from array import array
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
 
 SPEC_VERSION = "1.6"
 
@@ -22,201 +24,699 @@ _COMPACT_MARKER = re.compile(r"^#([uas])([0-9]{1,7})$")
 _MSG_MARKER = re.compile(r"^#msg\s+(\S+)\s+r=(\S+)\s+parent=(\S+)\s*$")
 _INTENT = re.compile(r"^([a-z0-9]{2,4}|[a-z][a-z0-9_-]*(?:\.[a-z][a-z0-9_-]*)+)(\{.*\})?(\s+@.*)?$")
 _TRAILING_TAG = re.compile(r"@(m|rid)=([^\s]+)")
+_REV_TAG = re.compile(r"(\S+)\s+")  # a token and the blanks before it, in a reversed line
+_intern = sys.intern
+_RECORD_TAG = re.compile(r"#([a-z][a-z0-9_]*)\s*")
+_HEADER_LINE = re.compile(r"@(\w+)\s+(.+)$")
+
+# Tokenizer (§8.1/§8.2). A quoted run is consumed in one step — plain text in
+# bulk, `\"` as an escaped quote, a lone backslash literally — and an unterminated
+# quote runs to the end of the line. Unquoted fields are atoms up to the next
+# separator: space in columnar rows, space or comma in kvpairs.
+_QUOTED = r'"((?:[^"\\]+|\\"|\\)*)"?'
+_FIELD = re.compile(_QUOTED + r"|([^ ]+)")
+_KVPAIR = re.compile(r"[ ,]*([^=, ]*)(?:=(?:" + _QUOTED + r"|([^ ,]*)))?")
 
 
-@dataclass
 class Record:
-    """A single body record (or a columnar row expanded to a record)."""
-
-    kind: str                      # fact, ref, evid, rule, cost, quota, call, ret, think, edit, req, rpt, s, intent, marker
-    name: Optional[str] = None     # intent name; record type tag; marker id
-    kv: dict[str, str] = field(default_factory=dict)
-    rid: Optional[str] = None
-    m: Optional[str] = None        # @m= turn binding
-    raw: str = ""
-    from_columnar: bool = False
-    # marker-specific
-    role: Optional[str] = None
-    parent: Optional[str] = None
-    # positional payload for records with no key=value body, e.g. #s <phase>:<progress>
-    arg: Optional[str] = None
-
-
-@dataclass
+    """A single body record (or a columnar row expanded to a record).
+
+    Slotted, and `kv` is decoded on first access: a parsed record keeps only
+    its source line (which is also `raw`) plus the payload offsets, and a
+    columnar record is a view of its block and row index, so records that are
+    never inspected cost no dict. Kinds, names, and keys are interned.
+    """
+
+    __slots__ = ("kind", "name", "_kv", "_src", "_span", "rid", "m", "raw",
+                 "from_columnar", "role", "parent", "arg")
+
+    # kind: fact, ref, evid, rule, cost, quota, call, ret, think, edit, req, rpt, s, intent, marker
+    # name: intent name; record type tag; marker id
+    # m: @m= turn binding
+    # role/parent: marker-specific
+    # arg: positional payload for records with no key=value body, e.g. #s <phase>:<progress>
+    _FIELDS = ("kind", "name", "kv", "rid", "m", "raw", "from_columnar", "role", "parent", "arg")
+
+    def __init__(self, kind: str, name: Optional[str] = None, kv: Optional[dict[str, str]] = None,
+                 rid: Optional[str] = None, m: Optional[str] = None, raw: str = "",
+                 from_columnar: bool = False, role: Optional[str] = None,
+                 parent: Optional[str] = None, arg: Optional[str] = None) -> None:
+        self.kind = kind
+        self.name = name
+        self._kv = {} if kv is None else kv
+        self._src = self._span = None
+        self.rid = rid
+        self.m = m
+        self.raw = raw
+        self.from_columnar = from_columnar
+        self.role = role
+        self.parent = parent
+        self.arg = arg
+
+    @property
+    def kv(self) -> dict[str, str]:
+        kv = self._kv
+        if kv is None:
+            src, span = self._src, self._span
+            if isinstance(src, str):
+                kv = _parse_kvpairs(src, *span)
+            else:  # columnar view: src is the block, span the row index
+                kv = src.kv(span)
+            self._kv, self._src, self._span = kv, None, None
+        return kv
+
+    @kv.setter
+    def kv(self, value: dict[str, str]) -> None:
+        self._kv, self._src, self._span = value, None, None
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self._FIELDS)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return "Record(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in self._FIELDS) + ")"
+
+
+def _lazy(kind: str, name: str, src: object, span: object, rid: Optional[str], m: Optional[str],
+          raw: str, from_columnar: bool = False) -> Record:
+    """A Record whose kv is decoded from `src` on first access (see Record.kv)."""
+    rec = Record(kind, name, None, rid, m, raw, from_columnar)
+    rec._kv, rec._src, rec._span = None, src, span
+    return rec
+
+
 class ColumnarBlock:
-    rtype: str
-    columns: list[str]
-    rows: list[list[tuple[str, bool]]]  # each row: list of (value, was_quoted)
-    raw_header: str = ""
+    """A columnar block (§3.4), stored column by column.
+
+    `values[p]` holds column p's cell for every row (None where a short row
+    stops before it), `widths` each row's field count and `quoted` a bitmask of
+    its quoted fields; fields past the header go to `extra`. Each row also
+    keeps its source line and trailing tags (`raws`, `rids`, `ms`). The
+    row-oriented `rows` and the per-row `Record` views are rebuilt on demand,
+    and `floats()` gives a numeric column as a typed `array('d')`.
+    """
+
+    __slots__ = ("rtype", "columns", "raw_header", "values", "widths", "quoted", "extra",
+                 "raws", "rids", "ms", "_floats")
+
+    def __init__(self, rtype: str, columns: list[str],
+                 rows: Optional[Iterable[list[tuple[str, bool]]]] = None, raw_header: str = "") -> None:
+        self.rtype = rtype
+        self.columns = columns
+        self.raw_header = raw_header
+        self.values: list[list[Optional[str]]] = [[] for _ in columns]
+        self.widths: list[int] = []
+        self.quoted: list[int] = []
+        self.extra: dict[int, list[tuple[str, bool]]] = {}
+        self.raws: list[str] = []
+        self.rids: list[Optional[str]] = []
+        self.ms: list[Optional[str]] = []
+        self._floats: dict[str, tuple[array, set[int]]] = {}
+        for cells in rows or ():
+            self.add_row(cells)
+
+    def add_row(self, cells: list[tuple[str, bool]], raw: str = "", rid: Optional[str] = None,
+                m: Optional[str] = None) -> int:
+        """Append a row of (value, was_quoted) cells; return its index."""
+        ri = len(self.widths)
+        values = self.values
+        mask = 0
+        for p, (col, (v, q)) in enumerate(zip(values, cells)):
+            col.append(v)
+            if q:
+                mask |= 1 << p
+        n = len(cells)
+        if n < len(values):
+            for col in values[n:]:
+                col.append(None)
+        elif n > len(values):
+            self.extra[ri] = cells[len(values):]
+        self.widths.append(n)
+        self.quoted.append(mask)
+        self.raws.append(raw)
+        self.rids.append(rid)
+        self.ms.append(m)
+        return ri
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def cells(self, i: int) -> list[tuple[str, bool]]:
+        """Row `i` as (value, was_quoted) cells, as tokenized."""
+        mask = self.quoted[i]
+        out = [(col[i], bool(mask >> p & 1)) for p, col in enumerate(self.values[:self.widths[i]])]
+        return out + self.extra[i] if i in self.extra else out
+
+    @property
+    def rows(self) -> list[list[tuple[str, bool]]]:
+        return [self.cells(i) for i in range(len(self.widths))]
+
+    def kv(self, i: int) -> dict[str, str]:
+        """Row `i` as the `key=value` pairs of its expanded record."""
+        return dict(zip(self.columns, [col[i] for col in self.values[:self.widths[i]]]))
+
+    def record(self, i: int) -> Record:
+        """A `Record` view of row `i`."""
+        return _lazy(self.rtype, self.rtype, self, i, self.rids[i], self.ms[i], self.raws[i], True)
+
+    def index(self) -> Optional[dict[str, int]]:
+        """Column positions by key, or None if a key repeats."""
+        pos = {c: p for p, c in enumerate(self.columns)}
+        return pos if len(pos) == len(self.columns) else None
+
+    def floats(self, key: str) -> tuple[array, set[int]]:
+        """Column `key` as an `array('d')`, plus the rows whose cell is not a number.
+
+        Cells past a short row's end read as NaN without being flagged. Built on
+        first use (typically for conf, val, total, used, rem) and extended as
+        rows are added.
+        """
+        cached = self._floats.get(key)
+        if cached is None:
+            cached = self._floats[key] = (array("d"), set())
+        arr, bad = cached
+        col = self.values[self.columns.index(key)]
+        nan = float("nan")
+        for i in range(len(arr), len(col)):
+            v = col[i]
+            if v is None:
+                arr.append(nan)
+                continue
+            try:
+                arr.append(float(v))
+            except ValueError:
+                arr.append(nan)
+                bad.add(i)
+        return cached
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.rtype, self.columns, self.rows, self.raw_header) == \
+            (other.rtype, other.columns, other.rows, other.raw_header)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (f"ColumnarBlock(rtype={self.rtype!r}, columns={self.columns!r}, "
+                f"rows={self.rows!r}, raw_header={self.raw_header!r})")
+
+
+class _Index:
+    """Positions of a message's records by rid, kind, intent, turn, and call.
+
+    Built on first lookup and extended in place as records are appended, so
+    each record is indexed once however the body grows.
+    """
+
+    __slots__ = ("src", "n", "rids", "kinds", "intents", "calls", "turns", "bound", "open")
+
+    def __init__(self, records: list[Record]) -> None:
+        self.src = records
+        self.n = 0
+        self.rids: dict[str, int] = {}  # lowercase rid -> first record with it (V6 flags the rest)
+        self.kinds: dict[str, list[int]] = {}
+        self.intents: dict[str, list[int]] = {}
+        self.calls: dict[str, int] = {}  # lowercase rid of a #call -> its position
+        self.turns: dict[str, list[int]] = {}  # marker -> [start, end) of its section; end -1 while open
+        self.bound: dict[str, list[int]] = {}  # marker -> records bound to it by @m=
+        self.open: Optional[str] = None
+
+    def update(self) -> None:
+        records, rids, kinds = self.src, self.rids, self.kinds
+        for i in range(self.n, len(records)):
+            r = records[i]
+            kind = r.kind
+            kinds.setdefault(kind, []).append(i)
+            if r.rid:
+                low = r.rid.lower()
+                rids.setdefault(low, i)
+                if kind == "call":
+                    self.calls.setdefault(low, i)
+            if kind == "intent":
+                self.intents.setdefault(r.name, []).append(i)
+            elif kind == "marker":
+                if self.open is not None and self.turns[self.open][1] < 0:
+                    self.turns[self.open][1] = i
+                self.open = r.name
+                self.turns.setdefault(r.name, [i + 1, -1])
+            if r.m:
+                self.bound.setdefault(r.m, []).append(i)
+        self.n = len(records)
 
 
-@dataclass
 class Message:
-    headers: dict[str, str] = field(default_factory=dict)
-    records: list[Record] = field(default_factory=list)
-    blocks: list[ColumnarBlock] = field(default_factory=list)
-    errors: list[str] = field(default_factory=list)  # parse-level errors
+    """A parsed message.
+
+    Columnar rows stay in their block until `records` is first read, which
+    expands the body once; `iter_records()` and `body()` walk it without
+    keeping the expansion.
+
+    Lookups (`by_rid()`, `of_kind()`, `intents()`, `turn()`, `call_of()`)
+    go through an index built on first use. The body is append-only: records
+    appended to `records` are indexed on the next lookup, and assigning a new
+    list starts over.
+    """
+
+    def __init__(self, headers: Optional[dict[str, str]] = None, records: Optional[list[Record]] = None,
+                 blocks: Optional[list[ColumnarBlock]] = None, errors: Optional[list[str]] = None) -> None:
+        self.headers = {} if headers is None else headers
+        self.blocks = [] if blocks is None else blocks
+        self.errors = [] if errors is None else errors  # parse-level errors
+        # Unexpanded body (records plus each block at its position), or None
+        # once `_records` holds the expanded list.
+        self._body: Optional[list[Record | ColumnarBlock]] = [] if records is None else None
+        self._records = records
+        self._index: Optional[_Index] = None
+
+    @property
+    def records(self) -> list[Record]:
+        if self._body is not None:
+            self._records = list(self.iter_records())
+            self._body = None
+        return self._records
+
+    @records.setter
+    def records(self, value: list[Record]) -> None:
+        self._records, self._body = value, None
+        self._index = None
+
+    def _indexed(self) -> _Index:
+        records = self.records
+        idx = self._index
+        if idx is None or idx.src is not records or idx.n > len(records):
+            idx = self._index = _Index(records)
+        if idx.n < len(records):
+            idx.update()
+        return idx
+
+    def by_rid(self, rid: str) -> Optional[Record]:
+        """The record with this @rid, case-insensitively (V6); the first one if repeated."""
+        i = self._indexed().rids.get(rid.lower())
+        return None if i is None else self._records[i]
+
+    def of_kind(self, kind: str) -> list[Record]:
+        """Records of one kind ("fact", "evid", "intent", "marker", ...), in body order."""
+        records = self.records
+        return [records[i] for i in self._indexed().kinds.get(kind, ())]
+
+    def intents(self, name: str) -> list[Record]:
+        """Intent records with this name, in body order."""
+        records = self.records
+        return [records[i] for i in self._indexed().intents.get(name, ())]
+
+    def turn_span(self, marker: str) -> Optional[tuple[int, int]]:
+        """[start, end) positions in `records` of the section under a turn marker."""
+        span = self._indexed().turns.get(marker)
+        if span is None:
+            return None
+        return span[0], len(self._records) if span[1] < 0 else span[1]
+
+    def turn(self, marker: str, kind: Optional[str] = None) -> list[Record]:
+        """Records said in a turn (§3.3): its section, minus records `@m=`-bound
+        elsewhere, plus records bound to it from other sections."""
+        idx = self._indexed()
+        records = self._records
+        span = self.turn_span(marker)
+        pos = [i for i in range(*span) if records[i].m in (None, marker)] if span else []
+        pos += [i for i in idx.bound.get(marker, ()) if not span or not span[0] <= i < span[1]]
+        pos.sort()
+        return [records[i] for i in pos if kind is None or records[i].kind == kind]
+
+    def call_of(self, ret: Record) -> Optional[Record]:
+        """The `#call` a `#ret` answers (its `call=` rid), if in this message."""
+        call = ret.kv.get("call")
+        i = None if call is None else self._indexed().calls.get(call.lower())
+        return None if i is None else self._records[i]
+
+    def body(self) -> list[Record | ColumnarBlock]:
+        """The body in order, with unexpanded blocks standing in for their rows."""
+        return self._records if self._body is None else self._body
+
+    def iter_records(self) -> Iterator[Record]:
+        """Iterate the expanded records without storing row views."""
+        for item in self.body():
+            if item.__class__ is ColumnarBlock:
+                for i in range(len(item)):
+                    yield item.record(i)
+            else:
+                yield item
 
     @property
     def msg_id(self) -> Optional[str]:
         return self.headers.get("id") or self.headers.get("mid")
 
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.headers == other.headers and self.blocks == other.blocks
+                and self.errors == other.errors
+                and list(self.iter_records()) == list(other.iter_records()))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (f"Message(headers={self.headers!r}, records={list(self.iter_records())!r}, "
+                f"blocks={self.blocks!r}, errors={self.errors!r})")
+
 
 def split_fields(s: str) -> list[tuple[str, bool]]:
     """Tokenize a whitespace-separated row into (value, was_quoted) fields.
 
     A double-quoted field (with \\" escaping) is one field and may contain spaces.
     """
-    out: list[tuple[str, bool]] = []
-    i, n = 0, len(s)
-    while i < n:
-        if s[i] == " ":
-            i += 1
-            continue
-        if s[i] == '"':
-            i += 1
-            buf: list[str] = []
-            while i < n:
-                if s[i] == "\\" and i + 1 < n and s[i + 1] == '"':
-                    buf.append('"')
-                    i += 2
-                    continue
-                if s[i] == '"':
-                    i += 1
-                    break
-                buf.append(s[i])
-                i += 1
-            out.append(("".join(buf), True))
-        else:
-            start = i
-            while i < n and s[i] != " ":
-                i += 1
-            out.append((s[start:i], False))
-    return out
+    if '"' not in s:
+        return [(t, False) for t in s.split(" ") if t]
+    return [(m.group(1).replace('\\"', '"'), True) if m.lastindex == 1 else (m.group(2), False)
+            for m in _FIELD.finditer(s)]
 
 
-def _parse_kvpairs(s: str) -> dict[str, str]:
-    """Parse `key=value` pairs (space- or comma-separated), respecting quotes."""
+def _parse_kvpairs(s: str, pos: int = 0, endpos: Optional[int] = None) -> dict[str, str]:
+    """Parse `key=value` pairs (space- or comma-separated), respecting quotes.
+
+    Scans `s[pos:endpos]` in place, so callers can hand over a whole record line
+    without slicing out the payload first. Bare tokens (no `=`) are skipped.
+    """
     kv: dict[str, str] = {}
-    i, n = 0, len(s)
-    while i < n:
-        if s[i] in " ,":
-            i += 1
-            continue
-        # key
-        kstart = i
-        while i < n and s[i] not in "=":
-            if s[i] in " ,":
-                break
-            i += 1
-        key = s[kstart:i]
-        if i >= n or s[i] != "=":
-            # bare token, skip
-            continue
-        i += 1  # skip '='
-        # value: quoted or atom up to space/comma
-        if i < n and s[i] == '"':
-            i += 1
-            buf: list[str] = []
-            while i < n:
-                if s[i] == "\\" and i + 1 < n and s[i + 1] == '"':
-                    buf.append('"')
-                    i += 2
-                    continue
-                if s[i] == '"':
-                    i += 1
-                    break
-                buf.append(s[i])
-                i += 1
-            kv[key] = "".join(buf)
-        else:
-            vstart = i
-            while i < n and s[i] not in " ,":
-                i += 1
-            kv[key] = s[vstart:i]
+    for m in _KVPAIR.finditer(s, pos, len(s) if endpos is None else endpos):
+        if m.lastindex == 2:
+            kv[_intern(m.group(1))] = m.group(2).replace('\\"', '"')
+        elif m.lastindex == 3:
+            kv[_intern(m.group(1))] = m.group(3)
     return kv
 
 
 def _strip_trailing_tags(line: str) -> tuple[str, Optional[str], Optional[str]]:
-    """Return (line_without_tags, m, rid)."""
+    """Return (line_without_tags, m, rid).
+
+    Peels trailing `@m=`/`@rid=` tokens right to left, the leftmost of a kind
+    winning. The line is reversed once and each token matched where the last
+    one ended, so the cost is linear however many tags and blanks it has.
+    """
+    body = line.rstrip()
+    if "@" not in body:
+        return body, None, None
     m_val = rid_val = None
-    # iteratively peel trailing @m=/@rid= tokens
+    rev = body[::-1]
+    pos = 0
     while True:
-        mt = re.search(r"\s+@(m|rid)=([^\s]+)\s*$", line)
-        if not mt:
+        mt = _REV_TAG.match(rev, pos)
+        if mt is None:
             break
-        if mt.group(1) == "rid":
-            rid_val = mt.group(2)
-        else:
-            m_val = mt.group(2)
-        line = line[: mt.start()]
-    return line.rstrip(), m_val, rid_val
-
-
-def parse(text: str) -> Message:
-    msg = Message()
-    parts = text.strip("\n").split("\n\n", 1)
-    if len(parts) != 2:
-        # tolerate header-only or body-only, but record an error
-        msg.errors.append("message must have a header block and a body separated by a blank line")
-        if not parts:
-            return msg
-        # treat the single part as headers if it looks like headers, else body
-        single = parts[0]
-        if single.lstrip().startswith("@"):
-            header_part, body_part = single, ""
+        tok = mt.group(1)
+        if tok.endswith("=m@") and len(tok) > 3:
+            m_val = tok[-4::-1]
+        elif tok.endswith("=dir@") and len(tok) > 5:
+            rid_val = tok[-6::-1]
         else:
-            header_part, body_part = "", single
-    else:
-        header_part, body_part = parts
-
-    for line in header_part.split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        if not line.startswith("@"):
-            msg.errors.append(f"invalid header line (must start with @): {line}")
-            continue
-        m = re.match(r"@(\w+)\s+(.+)$", line)
-        if m:
-            msg.headers[m.group(1)] = m.group(2).strip()
-        else:
-            msg.errors.append(f"malformed header: {line}")
+            break
+        pos = mt.end()
+    return body[:len(body) - pos] if pos else body, m_val, rid_val
+
 
-    lines = [ln.rstrip() for ln in body_part.split("\n")]
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+class LimitExceeded(ValueError):
+    """Raised by a guarded parse when the input crosses a §15.1 limit."""
+
+    def __init__(self, limit: str, value: int, bound: int) -> None:
+        super().__init__(f"{limit} exceeded: {value} > {bound}")
+        self.limit = limit
+        self.value = value
+        self.bound = bound
+
+
+# §15.1 limits a message may tighten for itself with `#rule <name>=<n>`.
+LIMITS = ("max_size_bytes", "max_records", "max_line_len")
+
+
+class StreamParser:
+    """Incremental parser: feed text as it arrives, get records as lines complete.
+
+    The header block is held back until the first body byte confirms it (a
+    header-only message is not a header block, §9.2); after that every complete
+    body line is parsed on arrival, and columnar rows come out one by one as
+    their line closes. `close()` flushes the last partial line. The final
+    `message` is identical to `parse()` of the concatenated input.
+
+    With `lazy=True` (what `parse()` uses) nothing is returned and columnar
+    rows stay in their block until `message.records` is read. With
+    `body=True` the input is a body fragment with no header block, e.g. the
+    records appended to a maintained session (§12b).
+
+    Any of `max_size_bytes` (input bytes), `max_records` (records, columnar
+    rows included), or `max_line_len` (characters per line, the pending
+    partial line included) makes the parse guarded (§15.1): lines are cut
+    one at a time rather than all at once, and `LimitExceeded` is raised as
+    soon as a limit is crossed. With `rule_limits=True` a `#rule` in the
+    message naming one of these limits tightens it from there on.
+    """
+
+    def __init__(self, *, lazy: bool = False, body: bool = False, max_size_bytes: Optional[int] = None,
+                 max_records: Optional[int] = None, max_line_len: Optional[int] = None,
+                 rule_limits: bool = False) -> None:
+        self.message = Message() if lazy else Message(records=[])
+        self.headers_done = body
+        self._state = "body" if body else "lead"  # lead -> header -> sep -> body
+        self._head: list[str] = []
+        self._pending: list[str] = []  # partial line, as received
+        self._decoder = None
+        self._block: Optional[ColumnarBlock] = None
+        self._out: list[Record] = []
+        self.limits = {"max_size_bytes": max_size_bytes, "max_records": max_records,
+                       "max_line_len": max_line_len}
+        self._guarded = rule_limits or any(v is not None for v in self.limits.values())
+        self._rule_limits = rule_limits
+        self._size = self._count = self._partial = 0
+
+    def feed(self, chunk: str | bytes) -> list[Record]:
+        """Consume a chunk; return the records completed by it."""
+        if self._guarded:
+            return self._feed_guarded(chunk)
+        if isinstance(chunk, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self._decoder.decode(chunk)
+        if "\n" not in chunk:
+            if chunk:
+                self._pending.append(chunk)
+                if self._state == "sep":
+                    self._start_body()
+            return self._drain()
+        self._pending.append(chunk)
+        lines = "".join(self._pending).split("\n")
+        tail = lines.pop()
+        self._pending = [tail] if tail else []
+        for ln in lines:
+            self._line(ln)
+        if tail and self._state == "sep":
+            self._start_body()
+        return self._drain()
+
+    def _feed_guarded(self, chunk: str | bytes) -> list[Record]:
+        limits = self.limits
+        if isinstance(chunk, bytes) or chunk.isascii():
+            self._size += len(chunk)
+        else:
+            self._size += len(chunk.encode("utf-8"))
+        self._check("max_size_bytes", self._size)
+        if isinstance(chunk, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self._decoder.decode(chunk)
+        pos = 0
+        nl = chunk.find("\n")
+        while nl >= 0:
+            if limits["max_line_len"] is not None:
+                self._check("max_line_len", self._partial + nl - pos)
+            if self._pending:
+                ln = "".join(self._pending) + chunk[pos:nl]
+                self._pending, self._partial = [], 0
+            else:
+                ln = chunk[pos:nl]
+            self._line(ln)
+            pos = nl + 1
+            nl = chunk.find("\n", pos)
+        if pos < len(chunk):
+            self._partial += len(chunk) - pos
+            if limits["max_line_len"] is not None:
+                self._check("max_line_len", self._partial)
+            self._pending.append(chunk[pos:])
+            if self._state == "sep":
+                self._start_body()
+        return self._drain()
+
+    def _check(self, limit: str, value: int) -> None:
+        bound = self.limits[limit]
+        if bound is not None and value > bound:
+            raise LimitExceeded(limit, value, bound)
+
+    def _counted(self, rec: Optional[Record]) -> None:
+        """Count one record (or row) against max_records; apply a limit-setting #rule."""
+        self._count += 1
+        self._check("max_records", self._count)
+        if self._rule_limits and rec is not None and rec.kind == "rule":
+            for limit in LIMITS:
+                v = rec.kv.get(limit)
+                if v is not None and v.isdigit():
+                    bound = self.limits[limit]
+                    self.limits[limit] = int(v) if bound is None else min(bound, int(v))
+            self._check("max_size_bytes", self._size)
+
+    def close(self) -> list[Record]:
+        """Flush the last partial line and finish the message."""
+        if self._decoder is not None:
+            rest = self._decoder.decode(b"", final=True)
+            if rest:
+                self._pending.append(rest)
+        tail = "".join(self._pending)
+        self._pending = []
+        if tail:
+            if self._guarded and self.limits["max_line_len"] is not None:
+                self._check("max_line_len", len(tail))
+            self._line(tail)
+        if self._state != "body":
+            # no header/body separator: tolerate header-only or body-only
+            msg = self.message
+            msg.errors.append("message must have a header block and a body separated by a blank line")
+            single = "\n".join(self._head)
+            self._head = []
+            self._state = "body"
+            if single.lstrip().startswith("@"):
+                self._headers(single.split("\n"))
+            else:
+                self.headers_done = True
+                for ln in single.split("\n"):
+                    self._body_line(ln)
+        self._block = None
+        return self._drain()
+
+    def _drain(self) -> list[Record]:
+        out, self._out = self._out, []
+        return out
+
+    def _line(self, ln: str) -> None:
+        st = self._state
+        if st == "body":
+            self._body_line(ln)
+        elif st == "lead":
+            if ln:
+                self._head.append(ln)
+                self._state = "header"
+        elif st == "header":
+            if ln:
+                self._head.append(ln)
+            else:
+                self._state = "sep"
+        elif ln:  # sep: first body byte after the blank line
+            self._start_body()
+            self._body_line(ln)
+
+    def _start_body(self) -> None:
+        self._state = "body"
+        self._headers(self._head)
+        self._head = []
+
+    def _headers(self, lines: list[str]) -> None:
+        msg = self.message
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("@"):
+                msg.errors.append(f"invalid header line (must start with @): {line}")
+                continue
+            m = _HEADER_LINE.match(line)
+            if m:
+                msg.headers[m.group(1)] = m.group(2).strip()
+            else:
+                msg.errors.append(f"malformed header: {line}")
+        self.headers_done = True
+
+    def _body_line(self, ln: str) -> None:
+        raw = ln.rstrip()
+        line = raw.strip()
+        blk = self._block
+        if blk is not None:
+            if line and not line.startswith("#") and line != "---":
+                fields, mval, ridval = _strip_trailing_tags(line)
+                ri = blk.add_row(split_fields(fields), raw, ridval, mval)
+                msg = self.message
+                if msg._body is None:
+                    rec = blk.record(ri)
+                    msg._records.append(rec)
+                    self._out.append(rec)
+                if self._guarded:
+                    self._counted(None)
+                return
+            self._block = None
         if not line or line == "---":
-            i += 1
-            continue
+            return
 
         hm = _COL_HEADER.match(line)
         if hm:
-            rtype = hm.group(1)
-            cols = [c.strip() for c in hm.group(2).split(",")]
-            rows: list[list[tuple[str, bool]]] = []
-            i += 1
-            while i < len(lines):
-                row = lines[i].strip()
-                if not row or row.startswith("#") or row == "---":
-                    break
-                fields, mval, ridval = _strip_trailing_tags(row)
-                cells = split_fields(fields)
-                rows.append(cells)
-                rec = Record(kind=rtype, name=rtype, from_columnar=True, raw=lines[i],
-                             rid=ridval, m=mval)
-                for col, (val, _q) in zip(cols, cells):
-                    rec.kv[col] = val
-                msg.records.append(rec)
-                i += 1
-            msg.blocks.append(ColumnarBlock(rtype=rtype, columns=cols, rows=rows, raw_header=line))
-            continue
-
-        msg.records.append(_parse_record(line))
-        i += 1
-
-    return msg
+            cols = [_intern(c.strip()) for c in hm.group(2).split(",")]
+            blk = self._block = ColumnarBlock(rtype=_intern(hm.group(1)), columns=cols, raw_header=line)
+            self.message.blocks.append(blk)
+            if self.message._body is not None:
+                self.message._body.append(blk)
+            return
+
+        rec = _parse_record(line)
+        msg = self.message
+        if msg._body is None:
+            msg._records.append(rec)
+            self._out.append(rec)
+        else:
+            msg._body.append(rec)
+        if self._guarded:
+            self._counted(rec)
+
+
+def parse(text: str, *, max_size_bytes: Optional[int] = None, max_records: Optional[int] = None,
+          max_line_len: Optional[int] = None, rule_limits: bool = False) -> Message:
+    """Parse a whole message; any limit makes it a guarded parse (see StreamParser)."""
+    p = StreamParser(lazy=True, max_size_bytes=max_size_bytes, max_records=max_records,
+                     max_line_len=max_line_len, rule_limits=rule_limits)
+    p.feed(text)
+    p.close()
+    return p.message
+
+
+def parse_stream(chunks: Iterable[str | bytes]) -> Iterator[Message | Record]:
+    """Parse a chunked message, yielding the `Message` once its header block is
+    complete and then each `Record` as soon as its line has arrived."""
+    p = StreamParser()
+    announced = False
+    for chunk in chunks:
+        recs = p.feed(chunk)
+        if not announced and p.headers_done:
+            announced = True
+            yield p.message
+        yield from recs
+    recs = p.close()
+    if not announced:
+        yield p.message
+    yield from recs
+
+
+async def aparse_stream(chunks: AsyncIterable[str | bytes]) -> AsyncIterator[Message | Record]:
+    """`parse_stream` over an async iterator (e.g. an LLM token stream)."""
+    p = StreamParser()
+    announced = False
+    async for chunk in chunks:
+        recs = p.feed(chunk)
+        if not announced and p.headers_done:
+            announced = True
+            yield p.message
+        for r in recs:
+            yield r
+    recs = p.close()
+    if not announced:
+        yield p.message
+    for r in recs:
+        yield r
 
 
 def _parse_record(line: str) -> Record:
@@ -233,24 +733,22 @@ def _parse_record(line: str) -> Record:
     body, mval, ridval = _strip_trailing_tags(line)
 
     if body.startswith("#"):
-        mtype = re.match(r"^#([a-z][a-z0-9_]*)\s*(.*)$", body, re.DOTALL)
+        mtype = _RECORD_TAG.match(body)
         if mtype:
-            tag, rest = mtype.group(1), mtype.group(2)
+            tag = _intern(mtype.group(1))
             if tag == "s":
                 # #s carries a positional <phase>:<progress> payload, not key=value (§7.5)
-                return Record(kind="s", name="s", arg=rest.strip() or None,
+                return Record(kind="s", name="s", arg=body[mtype.end():].strip() or None,
                               rid=ridval, m=mval, raw=raw)
-            return Record(kind=tag, name=tag, kv=_parse_kvpairs(rest),
-                          rid=ridval, m=mval, raw=raw)
+            # body is a prefix of raw, so the payload is decoded from raw on demand
+            return _lazy(tag, tag, raw, (mtype.end(), len(body)), ridval, mval, raw)
 
     # intent: name{params}
     im = _INTENT.match(body)
     if im:
-        name = im.group(1)
-        params = {}
+        name = _intern(im.group(1))
         if im.group(2):
-            inner = im.group(2)[1:-1]
-            params = _parse_kvpairs(inner)
-        return Record(kind="intent", name=name, kv=params, rid=ridval, m=mval, raw=raw)
+            return _lazy("intent", name, raw, (im.start(2) + 1, im.end(2) - 1), ridval, mval, raw)
+        return Record(kind="intent", name=name, rid=ridval, m=mval, raw=raw)
 
     return Record(kind="unknown", raw=raw, rid=ridval, m=mval)
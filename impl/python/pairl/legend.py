@@ -0,0 +1,240 @@
+"""Per-body legends (SPEC §12a).
+
+A legend explains exactly the constructs a body uses, so the body can be
+delivered without the full decoder spec. `scan()` collects the constructs in
+one pass over the body (§12a.1), `body_legend()` assembles the ordered legend
+(§12a.2) or reports that the full spec is needed (§12a.3), and
+`FrozenLegend` keeps a maintained session's legend fixed while later turns
+get a post-body addendum (§12a.4).
+
+Legend text depends only on the constructs in first-occurrence order, so it
+is built once per distinct construct sequence and shared by every body that
+has the same one.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Union
+
+from .core import ColumnarBlock, Message, Record
+
+# §12a.2(7), canonical one-line form.
+FIDELITY_RULES = ("#fact/#ref/#evid values are EXACT — repeat them verbatim; do NOT paraphrase, "
+                  "round, or invent facts, names, or numbers not present above; if a record "
+                  "contradicts what you believe, trust the record; never ask the user to repeat "
+                  "anything encoded here.")
+FRAMING = ("The bracketed block is compressed conversation history (PAIRL); read it as context for answering "
+           "the latest message")
+
+# Core intent registry (§4.2).
+INTENTS = {
+    "ack": "acknowledge", "req": "request", "qst": "question", "pln": "plan/next steps", "nxt": "next action",
+    "sum": "summary", "upd": "status update", "fin": "done", "hld": "on hold", "blk": "blocked/waiting",
+    "ctx": "context", "fnd": "findings", "evl": "assessment", "cmp": "comparison", "lst": "list",
+    "def": "definition", "jbl": "proclamation", "wrn": "warning/risk", "cal": "calming", "cnt": "contrast",
+    "emf": "emphasis", "agr": "agreement", "dis": "disagreement", "alt": "alternative",
+    "rpt": "unconfirmed report",
+    "off": "official statement", "inc": "confirmed incident", "fog": "unclear information", "apx": "apology",
+    "thx": "thanks", "grt": "greeting", "cls": "closing", "bid": "resource bid", "ref": "refusal",
+}
+_PARAMS = ("params: t=topic s=style(f formal,c casual,t terse,p poetic,e elevated) l=length 0-3 "
+           "m=mood(+ positive,- negative,! urgent,0 neutral) a=audience(i internal,c client,p public) "
+           "u=uncertainty(lo,md,hi) fmt=format(par,bul,num)")
+_CARRIAGE = ("content without mode=cond is quoted source text ( [...] marks omitted text); "
+             "mode=cond content is an encoder-written summary")
+RECORD_TYPES = {
+    "fact": "#fact key=value — exact data; treat values as authoritative",
+    "ref": "#ref name=ref:<kind>:<id> — opaque pointer; cite it as-is, never resolve or invent one",
+    "evid": "#evid claim=… src=… conf=0-1 — a claim attributed to a source with a confidence; "
+            "report it as attributed, not as established",
+    "rule": "#rule name=value — a constraint that applies to the answer",
+    "cost": "#cost val=<amount> cur=<unit> — cost already incurred",
+    "quota": "#quota type=<unit> total=… used=… rem=… — resource budget status",
+    "req": "#req content=\"…\" — what the user asked; " + _CARRIAGE,
+    "rpt": "#rpt content=\"…\" — what the assistant answered; " + _CARRIAGE,
+    "call": "#call tool=<name> … — a tool call that was made",
+    "ret": "#ret call=<rid> status=ok|err … — the result of that call",
+    "think": "#think summary=\"…\" — a summarized reasoning step",
+    "edit": "#edit file=… changes=<n> — edits already applied to a file",
+    "s": "#s <phase>:<progress> — the agent's state at that point",
+}
+TOOL_TYPES = {"call", "ret", "think", "edit", "s"}
+_ROLES = {"u": "user", "a": "assistant", "s": "system"}
+
+# Legend sections in §12a.2 order; constructs sort into them by prefix.
+_TURNS, _OVERRIDE, _INTENT, _TYPE, _COLUMNAR = range(5)
+
+
+def _section(c: str) -> int:
+    if c.startswith("turn:"):
+        return _TURNS
+    if c == "@m=":
+        return _OVERRIDE
+    if c.startswith("intent:"):
+        return _INTENT
+    return _COLUMNAR if c == "columnar" else _TYPE
+
+
+class _Scanner:
+    """Running construct scan (§12a.1); fed body items, possibly over several appends."""
+
+    def __init__(self) -> None:
+        self.constructs: list[str] = []
+        self.unexplained: list[str] = []
+        self._seen: set[str] = set()
+        self._verbatim = False  # inside a >>> … <<< tool-output block
+
+    def _add(self, c: str) -> None:
+        if c not in self._seen:
+            self._seen.add(c)
+            self.constructs.append(c)
+
+    def _miss(self, why: str) -> None:
+        if why not in self._seen:
+            self._seen.add(why)
+            self.unexplained.append(why)
+
+    def feed(self, items: Iterable[Union[Record, ColumnarBlock]]) -> None:
+        add = self._add
+        for item in items:
+            if isinstance(item, ColumnarBlock):
+                if not self._verbatim:
+                    add("columnar")
+                    self._type(item.rtype)
+                continue
+            kind = item.kind
+            if self._verbatim or (kind == "unknown" and item.raw.startswith(">>>")):
+                self._verbatim = not item.raw.rstrip().endswith("<<<")
+                continue
+            if kind == "marker":
+                add("turn:msg" if item.parent is not None else f"turn:{item.role}")
+                continue
+            if item.m:
+                add("@m=")
+            if kind == "intent":
+                if item.name in INTENTS:
+                    add(f"intent:{item.name}")
+                else:
+                    self._miss(f"unknown intent: {item.name}")
+            elif kind == "unknown":
+                self._miss(f"free text: {item.raw[:40]}")
+            else:
+                if item.from_columnar:
+                    add("columnar")
+                self._type(kind)
+
+    def _type(self, kind: str) -> None:
+        if kind in RECORD_TYPES:
+            self._add(f"#{kind}")
+        else:
+            self._miss(f"unknown record type: #{kind}")
+
+
+def scan(msg: Message) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """The constructs `msg`'s body uses, in first-occurrence order, and those
+    a legend cannot explain (§12a.1). Columnar blocks are not expanded."""
+    s = _Scanner()
+    s.feed(msg.body())
+    return tuple(s.constructs), tuple(s.unexplained)
+
+
+@lru_cache(maxsize=4096)
+def _lines(constructs: tuple[str, ...], covered: frozenset[str] = frozenset()) -> tuple[str, ...]:
+    """Legend items for `constructs`, in §12a.2 order; `covered` are explained already."""
+    by_section: list[list[str]] = [[] for _ in range(5)]
+    for c in constructs:
+        by_section[_section(c)].append(c)
+    seen = {_section(c) for c in covered}
+    types = [c[1:] for c in by_section[_TYPE]]
+    out = []
+
+    turns = by_section[_TURNS]
+    compact = [c[5:] for c in turns if c != "turn:msg"]
+    if compact:
+        roles = ", ".join(f"#{r}N = {_ROLES[r]} turn N" for r in compact)
+        out.append(roles if _TURNS in seen else
+                   f"Turn markers: {roles}; every line below a marker was said by that speaker")
+    if "turn:msg" in turns:
+        out.append("#msg <id> r=<speaker> parent=<id> starts turn <id> by the named speaker, "
+                   "after turn <parent>; every line below it was said by that speaker")
+    if by_section[_OVERRIDE]:
+        out.append("@m=<turn> at the end of a line binds it to that earlier turn instead of the one above it")
+    intents = by_section[_INTENT]
+    if intents:
+        glossary = ", ".join(f"{c[7:]}={INTENTS[c[7:]]}" for c in intents)
+        out.append(f"More intents: {glossary}" if _INTENT in seen else
+                   f"Intents name{{…}} are stance hints, not facts: {glossary}; {_PARAMS}")
+    out.extend(RECORD_TYPES[t] for t in types)
+    if by_section[_COLUMNAR]:
+        out.append("#type[k1,k2,…] then rows: each row is one #type record, its fields mapped to "
+                   "the keys in order (a quoted string is one field)")
+    if any(t in TOOL_TYPES for t in types) and not any(c[1:] in TOOL_TYPES for c in covered):
+        out.append("Tool records describe completed work; do not repeat or re-execute those actions")
+    return tuple(out)
+
+
+@lru_cache(maxsize=4096)
+def _assemble(constructs: tuple[str, ...]) -> str:
+    return "\n".join((FRAMING, *_lines(constructs), FIDELITY_RULES))
+
+
+@dataclass(frozen=True)
+class Legend:
+    """A legend or addendum for a body. `text` is None when some construct in
+    `unexplained` rules a legend out and the full spec must be sent (§12a.3)."""
+
+    constructs: tuple[str, ...]
+    unexplained: tuple[str, ...] = ()
+    text: Optional[str] = None
+
+    @property
+    def fallback(self) -> bool:
+        return bool(self.unexplained)
+
+    def preamble(self, spec: str) -> str:
+        """What to send ahead of the body: this legend, or `spec` on fallback."""
+        return spec if self.text is None else self.text
+
+
+def body_legend(msg: Message) -> Legend:
+    """The per-body legend for `msg` (§12a.2), or a fallback Legend (§12a.3)."""
+    constructs, unexplained = scan(msg)
+    if unexplained:
+        return Legend(constructs, unexplained)
+    return Legend(constructs, text=_assemble(constructs))
+
+
+class FrozenLegend:
+    """The legend of a maintained session (§12a.4, §12b).
+
+    Built from the session's first body and never changed: `legend.text` is
+    served byte-identically on every request. `feed()` scans only the records
+    appended since, and `addendum()` explains the constructs they added, in
+    first-occurrence order, for placement after the body.
+    """
+
+    def __init__(self, msg: Message) -> None:
+        self._scan = _Scanner()
+        self._scan.feed(msg.body())
+        self.legend = Legend(tuple(self._scan.constructs), tuple(self._scan.unexplained),
+                             None if self._scan.unexplained else _assemble(tuple(self._scan.constructs)))
+        self._frozen = len(self._scan.constructs)
+
+    @property
+    def text(self) -> Optional[str]:
+        return self.legend.text
+
+    def feed(self, items: Iterable[Union[Record, ColumnarBlock]]) -> None:
+        """Scan records appended to the body (e.g. what `Session.append()` returned)."""
+        self._scan.feed(items)
+
+    def addendum(self) -> Legend:
+        """Items the frozen legend does not cover; text is "" when there are none."""
+        new = tuple(self._scan.constructs[self._frozen:])
+        unexplained = tuple(self._scan.unexplained)
+        if unexplained:
+            return Legend(new, unexplained)
+        lines = _lines(new, frozenset(self._scan.constructs[:self._frozen])) if new else ()
+        return Legend(new, text="\n".join(lines))
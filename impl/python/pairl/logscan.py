@@ -0,0 +1,111 @@
+"""Bulk scans of multi-message logs with record-type pushdown.
+
+A log is a file of PAIRL messages one after another, each starting with its
+header block (what `cat *.pairl` gives). `scan_log()` memory-maps it and runs
+one compiled pattern over the raw bytes. The pattern stops only at header
+lines, blank lines, columnar blocks, and lines whose leading `#type` or intent
+name is in the query. Only those are decoded and handed to the record parser;
+the rest of the file is never copied, so memory stays constant however large
+the log is.
+
+A header line after a body starts the next message, so a body line starting
+with `@` (not valid PAIRL) is read as one.
+"""
+
+from __future__ import annotations
+
+import itertools
+import mmap
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, Optional
+
+from .core import Record, StreamParser, _parse_record
+from .store import _message_key
+from .thread import session_id
+
+Hit = tuple[str, Optional[str], Record]  # (sid, id, record)
+
+# Each alternative matches one line, after the newline that starts it, so the
+# search only stops at newlines and fails there on the line's first bytes.
+_HEAD = rb"(?P<h>[ \t]*@(?P<k>\w+)[ \t]+(?P<v>[^\n]*?)[ \t\r]*$)"
+_BLANK = rb"(?P<b>[ \t\r]*$)"
+# A header line and its rows: each non-blank line up to one starting with `#`
+# or a `---` (§3.4), or a header line that starts the next message. Blocks of
+# other types are matched too, so that their rows are never taken for records.
+_BLOCK = (rb"(?P<c>[ \t]*#(?P<t>[a-z][a-z0-9_]*)\[[^\]\n]*\][ \t\r]*$"
+          rb"(?:\n(?![ \t]*(?:---)?[ \t\r]*$|[ \t]*@\w+[ \t])[ \t]*[^#\s][^\n]*)*)")
+
+
+@lru_cache(maxsize=64)
+def _compile(select: tuple[str, ...]
+             ) -> tuple[re.Pattern[bytes], re.Pattern[bytes], frozenset[str], frozenset[str]]:
+    """The first-line and later-line patterns for a query, and its types and intents."""
+    types = frozenset(s[1:] for s in select if s.startswith("#"))
+    intents = frozenset(s for s in select if not s.startswith("#"))
+    parts = [_HEAD, _BLANK, _BLOCK]
+    if types:
+        names = b"|".join(re.escape(t.encode()) for t in sorted(types))
+        parts.append(rb"(?P<r>[ \t]*#(?:" + names + rb")(?![a-z0-9_])[^\n]*)")
+    if intents:
+        names = b"|".join(re.escape(i.encode()) for i in sorted(intents))
+        parts.append(rb"(?P<i>[ \t]*(?:" + names + rb")(?=[{\s]|$)[^\n]*)")
+    line = b"(?:" + b"|".join(parts) + b")"
+    return re.compile(line, re.MULTILINE), re.compile(b"\n" + line, re.MULTILINE), types, intents
+
+
+def scan_buffer(data: bytes | bytearray | memoryview | mmap.mmap, select: Iterable[str],
+                where: Optional[Callable[[Record], bool]] = None) -> Iterator[Hit]:
+    """Yield `(sid, id, record)` for each record in `data` that `select` names.
+
+    `select` holds record types as `#cost` and intent names as `req`; columnar
+    rows of a selected type count as its records. `where` filters the parsed
+    records further. `sid` and `id` are keyed as in `Store` and `ThreadGraph`:
+    bare session id ("" if none), `ref:msg:` stripped.
+    """
+    first, pattern, types, intents = _compile(tuple(select))
+    head = False  # inside a header block
+    sid = mid = None
+    key: tuple[str, Optional[str]] = ("", None)
+    m0 = first.match(data)
+    for m in itertools.chain((m0,) if m0 else (), pattern.finditer(data, m0.end() if m0 else 0)):
+        g = m.lastgroup
+        if g == "h":
+            if not head:
+                head, sid, mid = True, None, None
+            k = m.group("k")
+            if k == b"sid":
+                sid = m.group("v").decode("utf-8")
+            elif k == b"id" or (k == b"mid" and mid is None):
+                mid = m.group("v").decode("utf-8")
+            continue
+        if head:
+            head = False
+            key = _message_key(sid, mid) or (session_id(sid) or "", None)
+        if g == "b":
+            continue
+        if g == "c":
+            if m.group("t").decode() not in types:
+                continue
+            p = StreamParser(body=True)
+            p.feed(m.group("c").decode("utf-8"))
+            p.close()
+            recs: Iterable[Record] = p.message.iter_records()
+        else:
+            rec = _parse_record(m.group().decode("utf-8").strip())
+            if rec.kind not in types and not (rec.kind == "intent" and rec.name in intents):
+                continue
+            recs = (rec,)
+        for rec in recs:
+            if where is None or where(rec):
+                yield key[0], key[1], rec
+
+
+def scan_log(path: str, select: Iterable[str],
+             where: Optional[Callable[[Record], bool]] = None) -> Iterator[Hit]:
+    """`scan_buffer()` over a memory-mapped file."""
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from scan_buffer(mm, select, where)
@@ -0,0 +1,180 @@
+"""Merkle record hashing: partial verification and inclusion proofs.
+
+The flat `compute_hash()` (§9.6) stays the conformance hash. This is an
+optional second digest over the same canonical lines: leaf 0 is the header
+block as hashed (without `@hash`), leaf i + 1 is the `serialize_record()`
+line of record i. The tree has the RFC 6962 shape (each left subtree is
+perfect, holding the largest power of two below the size) and domain
+separation: a leaf hashes 0x00 + line, an inner node 0x01 + left + right.
+
+A `Proof` shows that a run of consecutive leaves (one record, or the records
+from one @rid to another) is in the tree with a given root. It carries the
+roots of the subtrees beside the run, O(log n) of them. `MerkleTree` keeps
+every complete subtree, so appending or replacing a leaf rehashes only its
+O(log n) ancestors.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+from .canonical import header_lines, serialize_record
+from .core import Message
+
+Line = Union[str, bytes]
+
+
+def _leaf(line: Line) -> bytes:
+    return hashlib.sha256(b"\x00" + (line.encode("utf-8") if isinstance(line, str) else line)).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _split(n: int) -> int:
+    """Size of the left subtree of n > 1 leaves: the largest power of two below n."""
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+@dataclass(frozen=True)
+class Proof:
+    """Leaves [start, stop) are in a tree of `size` leaves. `hashes` (hex) are
+    the roots of the subtrees beside them, in left-to-right order."""
+
+    size: int
+    start: int
+    stop: int
+    hashes: tuple[str, ...]
+
+
+class MerkleTree:
+    """A Merkle tree over lines; `append()` and `update()` cost O(log n)."""
+
+    def __init__(self, leaves: Iterable[Line] = ()) -> None:
+        # _levels[k][j] is the root of the perfect subtree over leaves
+        # [j << k, (j + 1) << k); a level holds only complete subtrees.
+        self._levels: list[list[bytes]] = [[]]
+        for line in leaves:
+            self.append(line)
+
+    @classmethod
+    def from_message(cls, msg: Message) -> MerkleTree:
+        return cls(message_leaves(msg))
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    def append(self, line: Line) -> int:
+        """Add a leaf; return its index."""
+        levels = self._levels
+        i = j = len(levels[0])
+        levels[0].append(_leaf(line))
+        k = 0
+        while j & 1:  # a right child completes its parent
+            if k + 1 == len(levels):
+                levels.append([])
+            levels[k + 1].append(_node(levels[k][j - 1], levels[k][j]))
+            j >>= 1
+            k += 1
+        return i
+
+    def update(self, i: int, line: Line) -> None:
+        """Replace leaf i."""
+        levels = self._levels
+        levels[0][i] = _leaf(line)
+        j, k = i, 0
+        while (j | 1) < len(levels[k]):
+            levels[k + 1][j >> 1] = _node(levels[k][j & ~1], levels[k][j | 1])
+            j >>= 1
+            k += 1
+
+    def _hash(self, lo: int, hi: int) -> bytes:
+        n = hi - lo
+        if n & (n - 1) == 0:  # perfect, and aligned by the tree's shape
+            k = n.bit_length() - 1
+            return self._levels[k][lo >> k]
+        k = _split(n)
+        return _node(self._hash(lo, lo + k), self._hash(lo + k, hi))
+
+    def root(self) -> str:
+        """The root digest, hex; O(log n)."""
+        n = len(self)
+        return (self._hash(0, n) if n else hashlib.sha256(b"").digest()).hex()
+
+    def prove(self, start: int, stop: Optional[int] = None) -> Proof:
+        """A proof for leaves [start, stop) (default: leaf `start` alone)."""
+        n = len(self)
+        stop = start + 1 if stop is None else stop
+        if not 0 <= start < stop <= n:
+            raise IndexError(f"leaf range [{start}, {stop}) not in a tree of {n} leaves")
+        out: list[str] = []
+
+        def walk(lo: int, hi: int) -> None:
+            if hi <= start or stop <= lo:
+                out.append(self._hash(lo, hi).hex())
+            elif lo < start or stop < hi:
+                k = _split(hi - lo)
+                walk(lo, lo + k)
+                walk(lo + k, hi)
+
+        walk(0, n)
+        return Proof(n, start, stop, tuple(out))
+
+
+def verify_proof(root: str, lines: Sequence[Line], proof: Proof) -> bool:
+    """Whether `lines` are leaves [proof.start, proof.stop) of the tree with `root`."""
+    start, stop = proof.start, proof.stop
+    if not 0 <= start < stop <= proof.size or len(lines) != stop - start:
+        return False
+    leaves = iter(lines)
+    hashes = iter(proof.hashes)
+
+    def walk(lo: int, hi: int) -> bytes:
+        if hi <= start or stop <= lo:
+            return bytes.fromhex(next(hashes))
+        if hi - lo == 1:
+            return _leaf(next(leaves))
+        k = _split(hi - lo)
+        return _node(walk(lo, lo + k), walk(lo + k, hi))
+
+    try:
+        got = walk(0, proof.size)
+    except (StopIteration, ValueError):  # too few hashes, or not hex
+        return False
+    return next(hashes, None) is None and got.hex() == root
+
+
+def message_leaves(msg: Message) -> Iterator[str]:
+    """The header block as hashed, then each record's canonical line."""
+    yield "\n".join(header_lines(msg.headers))
+    for r in msg.iter_records():
+        yield serialize_record(r)
+
+
+def merkle_root(msg: Message) -> str:
+    return MerkleTree.from_message(msg).root()
+
+
+def prove_records(msg: Message, first: str, last: Optional[str] = None, *,
+                  tree: Optional[MerkleTree] = None) -> tuple[list[str], Proof]:
+    """The canonical lines of the records from @rid `first` to `last` (inclusive), and their proof.
+
+    Pass the message's `tree` to reuse it; otherwise one is built.
+    """
+    rids = msg._indexed().rids
+    span = []
+    for rid in (first, last or first):
+        i = rids.get(rid.lower())
+        if i is None:
+            raise KeyError(rid)
+        span.append(i)
+    a, b = span
+    if b < a:
+        raise ValueError(f"@rid={last} comes before @rid={first}")
+    if tree is None:
+        tree = MerkleTree.from_message(msg)
+    lines = [serialize_record(r) for r in msg.records[a:b + 1]]
+    return lines, tree.prove(a + 1, b + 2)
@@ -0,0 +1,185 @@
+"""V15 quotation integrity (SPEC §3.1, encoder-side).
+
+A `#req`/`#rpt` without `mode=cond` quotes its source turn: its content,
+split on the elision marker ` [...] `, is fragments that each occur in the
+turn after whitespace normalization, in source order and without overlap.
+`verify_quotations()` checks every such record against the source turns,
+re-copies each fragment from the source, and drops the fragments it cannot
+locate (§3.1: never repaired by authoring).
+
+Each source turn is indexed once: its whitespace-normalized text plus, per
+word, where the word starts in the normalized and in the original text, so a
+match maps back to the source's own bytes. A `QuoteIndex` keeps the indexed
+turns of one session; a turn seen again costs nothing and a turn that grew
+(still streaming) only indexes the appended text. Without an explicit index,
+messages with the same `@sid` share one from a small cache.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping, Optional, Union
+
+from .core import Message, Record
+
+ELISION = " [...] "
+_WORD = re.compile(r"\S+")
+_SESSIONS = 64  # session indexes kept by the default cache
+
+
+class _Turn:
+    """One source turn, normalized: words joined by single spaces."""
+
+    __slots__ = ("text", "norm", "starts", "origins")
+
+    def __init__(self, text: str) -> None:
+        self.text = ""
+        self.norm = ""
+        self.starts: list[int] = []  # word i starts at norm[starts[i]]
+        self.origins: list[int] = []  # ... and at text[origins[i]]
+        self.extend(text)
+
+    def extend(self, text: str) -> None:
+        """Index `text`, which must start with the text indexed so far."""
+        pos = len(self.text)
+        if self.starts and pos and not self.text[-1].isspace():
+            pos = self.origins.pop()  # the last word may continue
+            self.norm = self.norm[:self.starts.pop()].rstrip(" ")
+        words = []
+        at = len(self.norm) + 1 if self.norm else 0
+        for m in _WORD.finditer(text, pos):
+            self.starts.append(at)
+            self.origins.append(m.start())
+            words.append(m.group())
+            at += len(words[-1]) + 1
+        if words:
+            self.norm = f"{self.norm} {' '.join(words)}" if self.norm else " ".join(words)
+        self.text = text
+
+    def origin(self, k: int) -> int:
+        """Offset in the original text of normalized character k."""
+        w = bisect_right(self.starts, k) - 1
+        return self.origins[w] + k - self.starts[w]
+
+
+class QuoteIndex:
+    """Indexed source turns of one session, by turn marker."""
+
+    def __init__(self) -> None:
+        self._turns: dict[str, _Turn] = {}
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def turn(self, marker: str, text: str) -> _Turn:
+        """The index of a turn, (re)built only as far as `text` is new."""
+        t = self._turns.get(marker)
+        if t is None:
+            t = self._turns[marker] = _Turn(text)
+        elif t.text is not text and t.text != text:
+            if text.startswith(t.text):
+                t.extend(text)
+            else:
+                t = self._turns[marker] = _Turn(text)
+        return t
+
+
+_cache: OrderedDict[str, QuoteIndex] = OrderedDict()
+
+
+def session_index(sid: str) -> QuoteIndex:
+    """The shared index of a session (least recently used ones are evicted)."""
+    index = _cache.get(sid)
+    if index is None:
+        index = _cache[sid] = QuoteIndex()
+        if len(_cache) > _SESSIONS:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(sid)
+    return index
+
+
+@dataclass
+class Quotation:
+    """The V15 check of one `#req`/`#rpt`.
+
+    `spans` are where each fragment was found in the original turn text
+    (None: dropped). `content` is the re-copied content: the located
+    fragments, whitespace-normalized, joined by the elision marker.
+    """
+
+    record: Record
+    turn: Optional[str]
+    fragments: list[str]
+    spans: list[Optional[tuple[int, int]]]
+    content: str
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def dropped(self) -> list[str]:
+        return [f for f, s in zip(self.fragments, self.spans) if s is None]
+
+    def sources(self, text: str) -> list[str]:
+        """The located fragments as they are in the original turn `text`."""
+        return [text[s[0]:s[1]] for s in self.spans if s is not None]
+
+
+def _locate(t: _Turn, fragments: list[str]) -> list[Optional[tuple[int, int]]]:
+    """One left-to-right pass: each fragment at its first occurrence after the previous one."""
+    spans: list[Optional[tuple[int, int]]] = []
+    pos = 0
+    find, norm = t.norm.find, t.norm
+    for frag in fragments:
+        k = find(frag, pos) if frag else -1
+        if k < 0:
+            spans.append(None)
+            continue
+        end = k + len(frag)
+        spans.append((t.origin(k), t.origin(end - 1) + 1))
+        pos = end + 1 if end < len(norm) and norm[end] == " " else end
+    return spans
+
+
+def verify_quotations(msg: Union[Message, Iterable[Record]], source_turns: Mapping[str, str], *,
+                      index: Optional[QuoteIndex] = None) -> list[Quotation]:
+    """Check each quoting `#req`/`#rpt` of `msg` against its source turn (V15).
+
+    A record's turn is its `@m=` marker, else the turn marker it follows;
+    `source_turns` maps markers ("u1", "a2", or a `#msg` id) to the original
+    text. `msg` may also be bare records, e.g. an increment from
+    `Session.append()`. Only the turns that records quote are indexed.
+    """
+    if index is None:
+        sid = msg.headers.get("sid") if isinstance(msg, Message) else None
+        index = session_index(sid) if sid else QuoteIndex()
+    records = msg.iter_records() if isinstance(msg, Message) else msg
+    out = []
+    current = None
+    for r in records:
+        if r.kind == "marker":
+            current = r.name
+            continue
+        if r.kind not in ("req", "rpt") or r.kv.get("mode") == "cond":
+            continue
+        label = f"#{r.kind}" + (f" @rid={r.rid}" if r.rid else "")
+        turn = r.m or current
+        fragments = [" ".join(f.split()) for f in r.kv.get("content", "").split(ELISION)]
+        text = source_turns.get(turn) if turn is not None else None
+        if text is None:
+            out.append(Quotation(r, turn, fragments, [None] * len(fragments), "",
+                                 [f"V15: {label}: no source for turn {turn or '(none)'}"]))
+            continue
+        t = index.turn(turn, text)
+        spans = _locate(t, fragments)
+        errors = [f"V15: {label}: fragment {i + 1} not found in turn {turn}, dropped: {f[:60]!r}"
+                  for i, (f, s) in enumerate(zip(fragments, spans)) if s is None]
+        content = ELISION.join(f for f, s in zip(fragments, spans) if s is not None)
+        out.append(Quotation(r, turn, fragments, spans, content, errors))
+    return out
@@ -7,6 +7,8 @@ language, feed the message to an LLM renderer instead.
 
 from __future__ import annotations
 
+from typing import Iterable, Optional
+
 from .core import Message, Record
 
 _INTENT_LABELS = {
@@ -19,9 +21,20 @@ _INTENT_LABELS = {
     "apx": "Apology", "thx": "Thanks", "grt": "Greeting", "cls": "Closing", "bid": "Cost proposal",
 }
 _ROLE = {"u": "User", "a": "Assistant", "s": "System"}
+_MEMO_SIZE = 4096  # rendered record lines kept per Renderer
+_MISS = object()
 
 
 def render(msg: Message) -> str:
+    out = _head(msg)
+    for r in msg.iter_records():
+        line = _heading(r) if r.kind == "marker" else _render_record(r)
+        if line:
+            out.append(line)
+    return "\n".join(out).rstrip() + "\n"
+
+
+def _head(msg: Message) -> list[str]:
     out: list[str] = []
     mid = msg.msg_id or "(no id)"
     out.append(f"# PAIRL message {mid}")
@@ -35,22 +48,93 @@ def render(msg: Message) -> str:
     if meta:
         out.append("_" + " · ".join(meta) + "_")
     out.append("")
+    return out
 
-    current_turn = None
-    for r in msg.records:
-        if r.kind == "marker":
-            current_turn = r
-            speaker = _ROLE.get(r.role or "", r.role or "?")
-            out.append(f"## {speaker} ({r.name})")
-            continue
-        line = _render_record(r)
-        if line:
-            out.append(line)
 
-    return "\n".join(out).rstrip() + "\n"
+def _heading(r: Record) -> str:
+    speaker = _ROLE.get(r.role or "", r.role or "?")
+    return f"## {speaker} ({r.name})"
+
+
+class Renderer:
+    """`render()` of a growing message, one increment at a time.
+
+    Built from a message (e.g. `Session.message`), it renders the body once
+    and keeps the output. `append()` renders only the records appended since
+    (what `Session.append()` returned) and returns the change. `text()` is
+    always byte-identical to `render()` of the whole message. Record lines are
+    memoized by record content (tags aside), so a repeated record (a common
+    `#rule`, a `#quota` snapshot) is formatted once; `misses` counts the
+    records that were formatted.
+    """
+
+    def __init__(self, msg: Message) -> None:
+        self.current_turn: Optional[Record] = None
+        # The output is "".join(_done) + "\n": _done holds everything up to
+        # the last non-blank character, and _blank the whitespace after it,
+        # which render() strips unless more lines follow.
+        self._done: list[str] = []
+        self._size = 0
+        self._blank = ""
+        self._memo: dict[object, Optional[str]] = {}
+        self.misses = 0  # records formatted rather than taken from the memo
+        for line in _head(msg):
+            self._add(line)
+        self.append(msg.iter_records())
+
+    def _add(self, line: str) -> None:
+        s = self._blank + "\n" + line if self._done or self._blank else line
+        kept = s.rstrip()
+        if kept:
+            self._done.append(kept)
+            self._size += len(kept)
+        self._blank = s[len(kept):]
+
+    def _line(self, r: Record) -> Optional[str]:
+        # Keys leave out @rid=/@m=, which rendering ignores. A record still
+        # holding its source line is keyed by that line up to its trailing
+        # tags; others by the fields _render_record() reads.
+        if r._kv is None and r._src.__class__ is str:
+            key: object = r._src[:r._span[1]]
+        else:
+            key = (r.kind, r.name, r.arg, tuple(r.kv.items()))
+        line = self._memo.get(key, _MISS)
+        if line is _MISS:
+            self.misses += 1
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            line = self._memo[key] = _render_record(r)
+        return line
+
+    def append(self, records: Iterable[Record]) -> tuple[int, str]:
+        """Render appended records; return `(pos, text)` such that the new
+        output is the previous one cut at `pos`, then `text`.
+
+        `pos` is the previous length unless its last line ended in blanks
+        (which the new output keeps), in which case it is one less.
+        """
+        start, size = len(self._done), self._size
+        for r in records:
+            if r.kind == "marker":
+                self.current_turn = r
+                self._add(_heading(r))
+                continue
+            line = self._line(r)
+            if line:
+                self._add(line)
+        if len(self._done) == start:
+            return size + 1, ""
+        text = "".join(self._done[start:]) + "\n"
+        if text[0] == "\n":
+            return size + 1, text[1:]
+        return size, text
+
+    def text(self) -> str:
+        """The whole output, as `render()` gives it."""
+        return "".join(self._done) + "\n"
 
 
-def _render_record(r: Record) -> str:
+def _render_record(r: Record) -> Optional[str]:
     if r.kind == "intent":
         label = _INTENT_LABELS.get(r.name or "", (r.name or "intent"))
         topic = r.kv.get("t")
@@ -0,0 +1,234 @@
+"""Long-running validation/render service (PLAN-v1.7 §4): python -m pairl serve.
+
+    python -m pairl serve [--unix PATH | --host HOST --port PORT] [--jobs N]
+                          [--batch N] [--window MS] [--timeout S] [--max-pending N] [--max-bytes N]
+
+Clients send JSON Lines over a Unix socket or localhost TCP, one request per
+line: `{"id": 7, "op": "validate", "text": "...", "strict": false,
+"timeout": 2}`. `op` is parse, validate, hash, canon, or render; `id` and the
+last two fields are optional. Each request gets one response line carrying
+its `id`, `{"id": 7, "ok": true, "result": ...}` or `{"ok": false, "error":
+...}`. A connection may pipeline requests; responses come as they finish.
+
+The event loop only reads, decodes, and answers. Requests are queued and a
+batcher hands them to a process pool a batch at a time: it takes whatever
+is queued (up to `--batch`), waiting `--window` ms for more when the queue
+is short, and keeps at most two batches per worker in flight, so batches
+grow with the load. Backpressure: once `--max-pending` requests are
+unanswered, connections are not read until some finish. A request line
+longer than `--max-bytes` gets an error and closes its connection. A request
+not answered within its timeout gets an error; its work still runs to
+completion in the pool.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Optional
+
+from .canonical import canonicalize, compute_hash, fast_hash, serialize_record
+from .core import parse
+from .render import render
+from .validate import validate
+
+OPS = ("parse", "validate", "hash", "canon", "render")
+
+
+def run(op: str, text: str, strict: bool = False) -> Any:
+    """The result of one operation on a message, as JSON-ready data."""
+    if op == "hash":
+        return f"ref:hash:sha256:{fast_hash(text) or compute_hash(parse(text))}"
+    if op == "validate":
+        msg = parse(text)
+        # Only V5 needs the digest; canonical input hashes without a round
+        # trip, anything else is left to V5.
+        digest = fast_hash(text) if msg.headers.get("hash") else None
+        res = validate(msg, strict=strict, digest=digest)
+        return {"valid": res.valid, "errors": res.errors, "warnings": res.warnings}
+    msg = parse(text)
+    if op == "canon":
+        return canonicalize(msg, for_hash=not strict)
+    if op == "render":
+        return render(msg)
+    return {"headers": msg.headers, "errors": msg.errors,
+            "records": [serialize_record(r) for r in msg.iter_records()]}
+
+
+def run_batch(jobs: list[tuple[str, str, bool]]) -> list[dict]:
+    """Run a batch in a worker; one `{"ok": ...}` dict per job."""
+    out = []
+    for op, text, strict in jobs:
+        try:
+            out.append({"ok": True, "result": run(op, text, strict)})
+        except Exception as e:  # a bad message must not take the batch down
+            out.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+    return out
+
+
+class Server:
+    """The service; `start()` listens, `close()` stops it and the pool."""
+
+    def __init__(self, *, jobs: Optional[int] = None, batch_size: int = 64, window: float = 0.001,
+                 timeout: float = 10.0, max_pending: int = 1024, max_bytes: int = 1 << 22,
+                 executor: Optional[Executor] = None) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.window = window
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self._pool = executor or ProcessPoolExecutor(max_workers=self.jobs)
+        self._queue: asyncio.Queue[tuple[tuple[str, str, bool], asyncio.Future]] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._inflight = asyncio.Semaphore(2 * self.jobs)
+        self._servers: list[asyncio.AbstractServer] = []
+        self._batcher: Optional[asyncio.Task] = None
+        self.served = self.batches = 0
+
+    async def start(self, *, path: Optional[str] = None, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Listen on a Unix socket (`path`) or TCP; return the address."""
+        if self._batcher is None:
+            self._batcher = asyncio.get_running_loop().create_task(self._batch_loop())
+        if path is not None:
+            srv = await asyncio.start_unix_server(self._client, path, limit=self.max_bytes)
+            addr = path
+        else:
+            srv = await asyncio.start_server(self._client, host, port, limit=self.max_bytes)
+            addr = "%s:%d" % srv.sockets[0].getsockname()[:2]
+        self._servers.append(srv)
+        return addr
+
+    async def close(self) -> None:
+        for srv in self._servers:
+            srv.close()
+            await srv.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, op: str, text: str, strict: bool = False, timeout: Optional[float] = None) -> dict:
+        """Queue one operation and wait for its `{"ok": ...}` result."""
+        if op not in OPS:
+            return {"ok": False, "error": f"unknown op: {op!r}"}
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put(((op, text, strict), fut))
+        try:
+            return await asyncio.wait_for(fut, self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": "timeout"}
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.batch_size and self.window > 0:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._inflight.acquire()
+            self.batches += 1
+            done = loop.run_in_executor(self._pool, run_batch, [job for job, _ in batch])
+            done.add_done_callback(lambda d, futs=[f for _, f in batch]: self._finish(d, futs))
+
+    def _finish(self, done: asyncio.Future, futs: list[asyncio.Future]) -> None:
+        self._inflight.release()
+        if done.cancelled() or done.exception() is not None:
+            exc = None if done.cancelled() else done.exception()
+            err = "cancelled" if exc is None else f"{type(exc).__name__}: {exc}"
+            results = [{"ok": False, "error": err}] * len(futs)
+        else:
+            results = done.result()
+        for fut, res in zip(futs, results):
+            if not fut.done():  # timed out meanwhile
+                fut.set_result(res)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # longer than max_bytes
+                    await self._send(writer, lock, {"id": None, "ok": False, "error": "request too large"})
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self._slots.acquire()  # stop reading while max_pending are unanswered
+                task = asyncio.ensure_future(self._answer(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        rid = None
+        try:
+            try:
+                req = json.loads(line)
+                rid = req.get("id")
+                text = req["text"]
+                timeout = req.get("timeout")
+                if not isinstance(text, str):
+                    raise TypeError("text must be a string")
+                if timeout is not None and not isinstance(timeout, (int, float)):
+                    raise TypeError("timeout must be a number")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                res = {"ok": False, "error": f"bad request: {e}"}
+            else:
+                res = await self.submit(req.get("op", ""), text, bool(req.get("strict")), timeout)
+        finally:
+            self._slots.release()
+        self.served += 1
+        await self._send(writer, lock, {"id": rid, **res})
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, lock: asyncio.Lock, res: dict) -> None:
+        async with lock:
+            writer.write(json.dumps(res, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pairl serve", description=__doc__.splitlines()[0])
+    ap.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=7435)
+    ap.add_argument("--jobs", type=int, default=0, help="worker processes (0: one per CPU)")
+    ap.add_argument("--batch", type=int, default=64, help="most requests per batch")
+    ap.add_argument("--window", type=float, default=1.0, help="ms to wait for a batch to fill")
+    ap.add_argument("--timeout", type=float, default=10.0, help="default per-request timeout, s")
+    ap.add_argument("--max-pending", type=int, default=1024)
+    ap.add_argument("--max-bytes", type=int, default=1 << 22, help="longest request line")
+    args = ap.parse_args(argv)
+
+    async def serve() -> None:
+        server = Server(jobs=args.jobs, batch_size=args.batch, window=args.window / 1e3, timeout=args.timeout,
+                        max_pending=args.max_pending, max_bytes=args.max_bytes)
+        addr = await server.start(path=args.unix, host=args.host, port=args.port)
+        print(f"pairl serve: listening on {addr}", file=sys.stderr, flush=True)
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)  # shut the pool down too
+        try:
+            await stop.wait()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
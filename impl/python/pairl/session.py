@@ -0,0 +1,131 @@
+"""Append-only maintained bodies (SPEC §12b).
+
+A `Session` holds one growing conversation body in canonical form. Every
+record is serialized once, when it is appended, and the SHA-256 state of the
+canonical prefix is carried forward, so an append costs only the new records
+and the hash never re-reads the body. `merkle()` optionally keeps a Merkle
+tree over the same lines, extended on each append.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+
+from .canonical import header_lines, serialize_record
+from .core import ColumnarBlock, Message, Record, StreamParser
+from .merkle import MerkleTree
+from .validate import Result, ValidationError
+
+
+class Session:
+    """A maintained body: frozen headers plus records appended in increments.
+
+    The header block is frozen at creation (it precedes the body, so it is part
+    of the byte-stable prefix, §12b item 2). `append()` takes body text or
+    `Record`s, enforces V6 across the whole body (§12b item 4), and keeps each
+    record's canonical line. `canonical()` and `hash()` equal `canonicalize()`
+    and `compute_hash()` of `message`, and `content_blocks()` splits the
+    canonical text at the append boundaries (§12b item 5).
+    """
+
+    def __init__(self, headers: Mapping[str, str]) -> None:
+        self._headers = dict(headers)
+        self.message = Message(headers=dict(headers), records=[])
+        head = "\n".join([*header_lines(self._headers), ""]) + "\n"  # as canonicalize() joins it
+        self._head = head.encode("utf-8")
+        self._sha = hashlib.sha256(self._head)  # canonical prefix so far
+        self._lines: list[bytes] = []  # canonical line per record, "\n" included
+        self._bounds: list[int] = []  # record count at the end of each increment
+        self._tree: Optional[MerkleTree] = None  # built by the first merkle()
+
+    @classmethod
+    def from_message(cls, msg: Message) -> Session:
+        """Start a session whose first increment is `msg`'s body."""
+        session = cls(msg.headers)
+        session.append(msg.iter_records(), blocks=msg.blocks)
+        return session
+
+    @property
+    def headers(self) -> Mapping[str, str]:
+        return MappingProxyType(self._headers)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def append(self, records: str | Iterable[Record], *,
+               blocks: Optional[list[ColumnarBlock]] = None) -> list[Record]:
+        """Append one increment; return its records.
+
+        `records` is body text (no header block) or parsed records. Raises
+        `ValidationError` without appending anything if a record reuses an
+        @rid already in the body or in the increment.
+        """
+        if isinstance(records, str):
+            p = StreamParser(body=True)
+            new = p.feed(records) + p.close()
+            blocks = p.message.blocks
+        else:
+            new = list(records)
+        seen: set[str] = set()
+        errors = []
+        for r in new:
+            if r.rid:
+                low = r.rid.lower()
+                if low in seen or self.message.by_rid(low) is not None:
+                    errors.append(f"V6: duplicate @rid: {r.rid}")
+                seen.add(low)
+        if errors:
+            raise ValidationError(errors[0], Result(errors=errors))
+        if not new:
+            return new
+
+        lines = [(serialize_record(r) + "\n").encode("utf-8") for r in new]
+        self._sha.update(b"".join(lines))
+        self._lines.extend(lines)
+        if self._tree is not None:
+            for line in lines:
+                self._tree.append(line[:-1])
+        self._bounds.append(len(self._lines))
+        self.message.records.extend(new)
+        if blocks:
+            self.message.blocks.extend(blocks)
+        return new
+
+    def hash(self) -> str:
+        """SHA-256 of the canonical text (§9.6); O(1) in the body length."""
+        return self._sha.copy().hexdigest()
+
+    def hash_ref(self) -> str:
+        return f"ref:hash:sha256:{self.hash()}"
+
+    def merkle(self) -> MerkleTree:
+        """The Merkle tree of the body (see `pairl.merkle`), kept up to date by `append()`.
+
+        Built on the first call; each later append adds O(log n) hashing per record.
+        """
+        if self._tree is None:
+            self._tree = MerkleTree([self._head.rstrip(b"\n"), *(line[:-1] for line in self._lines)])
+        return self._tree
+
+    def canonical(self) -> str:
+        """The canonical text, assembled from the cached record lines."""
+        return (self._head + b"".join(self._lines)).decode("utf-8")
+
+    def content_blocks(self) -> list[str]:
+        """The canonical text split at append boundaries.
+
+        The first block carries the header block and the first increment. A
+        block never changes once emitted, so a transport that delivers them as
+        separate content blocks lets a prompt cache re-match the stable prefix.
+        """
+        out, start = [], 0
+        for end in self._bounds:
+            out.append(b"".join(self._lines[start:end]))
+            start = end
+        if out:
+            out[0] = self._head + out[0]
+        else:
+            out.append(self._head)
+        return [b.decode("utf-8") for b in out]
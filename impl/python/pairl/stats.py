@@ -0,0 +1,273 @@
+"""Opt-in instrumentation: counters and timings for the hot paths.
+
+Nothing is measured, and nothing is slowed down, until `enable()`. It swaps
+timing and counting wrappers into the package (the stage entry points below,
+the methods of every registered rule, and the regexes of `_parse_record` and
+`_strip_trailing_tags`), and `disable()` puts the originals back. Methods
+are patched on their classes; the stage functions are replaced in the
+package's modules, so a name bound elsewhere before `enable()` (`from pairl
+import render` at the top of a module) still calls the plain function, and
+`pairl.render` is what gets timed. Rules registered after `enable()` are not
+timed.
+
+Each measurement goes to the collector as `add(metric, labels, value)`,
+where labels is a sorted tuple of (name, value) pairs. The collector is any
+object with that `add` method, or a callable with the same signature.
+`Stats`, the default collector, keeps running totals and writes them in the
+Prometheus text format. All metrics are counters:
+
+    pairl_parse_messages_total            StreamParser.close() calls (every parse() is one)
+    pairl_parse_bytes_total               input bytes
+    pairl_parse_lines_total               lines, header and blank lines included
+    pairl_parse_records_total             body records, columnar rows not included
+    pairl_parse_rows_total                columnar rows
+    pairl_stage_seconds_total{stage}      parse, validate, canonical, hash, render
+    pairl_stage_calls_total{stage}
+    pairl_rule_seconds_total{rule}        one validation rule's methods
+    pairl_rule_calls_total{rule}
+    pairl_regex_calls_total{fn,pattern}   regex matches in _parse_record and _strip_trailing_tags
+
+Times are exclusive: while a rule runs, the clock of the validate stage is
+stopped, and V5's `compute_hash()` counts as hash. The stages are entered
+through StreamParser (parse), Validator (validate), canonicalize()
+(canonical), compute_hash() and fast_hash() (hash, serialization included),
+and render() and Renderer (render).
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from . import canonical, core
+from .render import Renderer, render
+from .validate import _RULES, Validator
+
+Labels = tuple[tuple[str, str], ...]
+_ABSENT = object()
+
+
+class Stats:
+    """The default collector: a running total per metric and labels."""
+
+    def __init__(self) -> None:
+        self.totals: dict[tuple[str, Labels], float] = {}
+
+    def add(self, metric: str, labels: Labels, value: float) -> None:
+        key = (metric, labels)
+        self.totals[key] = self.totals.get(key, 0) + value
+
+    def merge(self, totals: dict[tuple[str, Labels], float]) -> None:
+        """Add another collector's totals (e.g. from a worker process)."""
+        for (metric, labels), value in totals.items():
+            self.add(metric, labels, value)
+
+    def get(self, metric: str, **labels: str) -> float:
+        return self.totals.get((metric, tuple(sorted(labels.items()))), 0)
+
+    def prometheus(self) -> str:
+        """The totals in the Prometheus text exposition format."""
+        out = []
+        last = None
+        for (metric, labels), value in sorted(self.totals.items()):
+            if metric != last:
+                out.append(f"# TYPE {metric} counter")
+                last = metric
+            if labels:
+                pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                metric = f"{metric}{{{pairs}}}"
+            out.append(f"{metric} {int(value) if float(value).is_integer() else repr(value)}")
+        return "\n".join(out) + "\n" if out else ""
+
+    def write_prometheus(self, path: str | os.PathLike) -> None:
+        """Write `prometheus()` to a file atomically (e.g. for node_exporter's textfile collector)."""
+        tmp = f"{os.fspath(path)}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -- wrappers -----------------------------------------------------------------
+
+_add: Callable[[str, Labels, float], None] = Stats().add
+_local = threading.local()  # .stack: [metric, labels, start] per running timed call
+_installed: list[tuple[Any, str, Any]] = []  # (owner, attribute, original or _ABSENT)
+_collector: Any = None
+
+
+def _timed(fn: Callable, metric: str, labels: Labels) -> Callable:
+    calls = metric.replace("_seconds_", "_calls_")
+
+    @functools.wraps(fn)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        now = time.perf_counter()
+        if stack:  # pause the caller's clock
+            outer = stack[-1]
+            _add(outer[0], outer[1], now - outer[2])
+        frame = [metric, labels, now]
+        stack.append(frame)
+        _add(calls, labels, 1)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            _add(metric, labels, end - frame[2])
+            if stack:
+                stack[-1][2] = end
+
+    return timed
+
+
+class _CountedPattern:
+    """A compiled regex that counts its match calls."""
+
+    __slots__ = ("pattern", "labels")
+
+    def __init__(self, pattern: Any, labels: Labels) -> None:
+        self.pattern = pattern
+        self.labels = labels
+
+    def match(self, *args: Any) -> Any:
+        _add("pairl_regex_calls_total", self.labels, 1)
+        return self.pattern.match(*args)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pattern, name)
+
+
+def _feed(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def feed(self: core.StreamParser, chunk: str | bytes) -> list:
+        size = len(chunk) if isinstance(chunk, bytes) or chunk.isascii() else len(chunk.encode("utf-8"))
+        _add("pairl_parse_bytes_total", (), size)
+        return fn(self, chunk)
+
+    return feed
+
+
+def _line(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def line(self: core.StreamParser, ln: str) -> None:
+        _add("pairl_parse_lines_total", (), 1)
+        fn(self, ln)
+
+    return line
+
+
+def _close(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def close(self: core.StreamParser) -> list:
+        out = fn(self)
+        msg = self.message
+        rows = sum(len(b) for b in msg.blocks)
+        records = len(msg._body) - len(msg.blocks) if msg._body is not None else len(msg._records) - rows
+        _add("pairl_parse_messages_total", (), 1)
+        _add("pairl_parse_records_total", (), records)
+        _add("pairl_parse_rows_total", (), rows)
+        return out
+
+    return close
+
+
+def _set(owner: Any, name: str, value: Any) -> None:
+    _installed.append((owner, name, vars(owner).get(name, _ABSENT)))
+    setattr(owner, name, value)
+
+
+def _install() -> None:
+    def stage(name: str) -> Labels:
+        return (("stage", name),)
+
+    # Methods, patched on their class.
+    methods = [
+        (core.StreamParser, "feed",
+         lambda f: _timed(_feed(f), "pairl_stage_seconds_total", stage("parse"))),
+        (core.StreamParser, "close",
+         lambda f: _timed(_close(f), "pairl_stage_seconds_total", stage("parse"))),
+        (core.StreamParser, "_line", _line),
+        *((Validator, m, lambda f: _timed(f, "pairl_stage_seconds_total", stage("validate")))
+          for m in ("__init__", "feed", "feed_many", "finish")),
+        *((Renderer, m, lambda f: _timed(f, "pairl_stage_seconds_total", stage("render")))
+          for m in ("__init__", "append")),
+    ]
+    for cls in _RULES.values():
+        for m in ("start", "record", "columns", "block", "row", "finish"):
+            if m in vars(cls):
+                methods.append((cls, m, functools.partial(
+                    _timed, metric="pairl_rule_seconds_total", labels=(("rule", cls.name),))))
+    for cls, name, wrap in methods:
+        _set(cls, name, wrap(vars(cls)[name]))
+
+    # Functions, replaced wherever the package imported them by name.
+    functions = {id(fn): _timed(fn, "pairl_stage_seconds_total", stage(name)) for fn, name in (
+        (canonical.canonicalize, "canonical"), (canonical.compute_hash, "hash"),
+        (canonical.fast_hash, "hash"), (render, "render"))}
+    for mod in [m for n, m in sys.modules.items()  # `python -m pairl` runs as __main__
+                if n == "pairl" or n.startswith("pairl.") or getattr(m, "__package__", None) == "pairl"]:
+        for name, value in list(vars(mod).items()):
+            wrapped = functions.get(id(value))
+            if wrapped is not None:
+                _set(mod, name, wrapped)
+
+    for fn, names in (("_strip_trailing_tags", ("_REV_TAG",)),
+                      ("_parse_record", ("_COMPACT_MARKER", "_MSG_MARKER", "_RECORD_TAG", "_INTENT"))):
+        for name in names:
+            _set(core, name, _CountedPattern(getattr(core, name), (("fn", fn), ("pattern", name))))
+
+
+def enable(collector: Any = None) -> Any:
+    """Start collecting into `collector` (default: a new `Stats`); return it."""
+    global _add, _collector
+    disable()
+    _collector = Stats() if collector is None else collector
+    _add = getattr(_collector, "add", _collector)
+    _install()
+    return _collector
+
+
+def disable() -> None:
+    """Stop collecting and restore the uninstrumented package."""
+    global _collector
+    while _installed:
+        owner, name, original = _installed.pop()
+        if original is _ABSENT:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+    _collector = None
+
+
+def enabled() -> bool:
+    return _collector is not None
+
+
+@contextmanager
+def instrument(collector: Any = None) -> Iterator[Any]:
+    """`enable()` for the duration of a `with` block."""
+    try:
+        yield enable(collector)
+    finally:
+        disable()
+
+
+def collected(fn: Callable, *args: Any) -> tuple[Any, Optional[dict]]:
+    """Run `fn(*args)` instrumented into a fresh `Stats`; return its result and totals.
+
+    For worker processes, whose totals the parent merges with `Stats.merge()`.
+    """
+    with instrument() as stats:
+        out = fn(*args)
+    return out, stats.totals
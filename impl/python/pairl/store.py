@@ -0,0 +1,450 @@
+"""Append-only message store (SPEC §15.2).
+
+A store is a directory of segment files, each a log of messages in canonical
+form, plus three on-disk hash tables that map the `compute_hash()` digest,
+`(sid, id)`, and `(sid, id, rid)` to byte offsets in the log. Segments and
+tables are memory-mapped, so opening a store reads no message and no index
+entry, and a lookup touches one table slot and the one frame it points at —
+the cost stays the same however large the store grows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterable, Iterator, Optional, Union
+
+from .canonical import header_lines, serialize_record
+from .core import Message, Record, _parse_record, parse
+from .thread import session_id
+
+# Segment frame: payload length, CRC-32 of the payload, SHA-256 digest of the
+# message (§9.6, @hash excluded), then the canonical text with @hash kept.
+_FRAME = struct.Struct("<II32s")
+# Table file: magic, capacity, count, done, hwm, then `capacity` slots of
+# key (16 bytes), segment, frame offset, record line offset.
+_HEAD = struct.Struct("<8sQQQQ")
+_SLOT = struct.Struct("<16sIQI")
+_MARK = struct.Struct("<QQ")
+_COUNT = struct.Struct("<Q")
+_MAGIC = b"PAIRLIX1"
+_EMPTY = bytes(16)
+_SEG_SHIFT = 40  # a log position is segment << 40 | offset
+_SEGMENT_SIZE = 1 << 30
+
+Key = Union[str, bytes, tuple[str, str]]
+
+
+def _key(*parts: str) -> bytes:
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).digest()
+
+
+def _message_key(sid: Optional[str], mid: Optional[str]) -> Optional[tuple[str, str]]:
+    """(sid, id) as `ThreadGraph` keys it: bare session id, `ref:msg:` stripped."""
+    if not mid:
+        return None
+    if mid.startswith("ref:msg:"):
+        mid = mid[8:]
+    return session_id(sid) or "", mid
+
+
+def _encode(msg: Message) -> tuple[bytes, bytes, list[tuple[str, int]]]:
+    """Canonical text of `msg` (with @hash), its §9.6 digest (without), and
+    the (rid, offset) of each line with an @rid, as `_entries()` reads them."""
+    lines, rids = [], []
+    pos = 0
+    for r in msg.iter_records():
+        line = (serialize_record(r) + "\n").encode("utf-8")
+        if r.rid:
+            rids.append((r.rid.lower(), pos))
+        lines.append(line)
+        pos += len(line)
+    body = b"".join(lines)
+    head = ("\n".join(header_lines(msg.headers)) + "\n\n").encode("utf-8")
+    sha = hashlib.sha256(head)
+    sha.update(body)
+    if "hash" in msg.headers:
+        head = ("\n".join(header_lines(msg.headers, for_hash=False)) + "\n\n").encode("utf-8")
+    return head + body, sha.digest(), [(rid, len(head) + off) for rid, off in rids]
+
+
+def _entries(payload: bytes) -> tuple[Optional[tuple[str, str]], list[tuple[str, int]]]:
+    """(sid, id) of a canonical payload and its (rid, line offset) pairs."""
+    end = payload.find(b"\n\n")
+    head: dict[str, str] = {}
+    for line in payload[:end].decode("utf-8").split("\n"):
+        k, _, v = line[1:].partition(" ")
+        head[k] = v
+    rids = []
+    pos = end + 2
+    while pos < len(payload):
+        nl = payload.find(b"\n", pos)
+        if nl < 0:
+            nl = len(payload)
+        if payload.find(b"@rid=", pos, nl) >= 0:  # markers never carry one
+            rid = _parse_record(payload[pos:nl].decode("utf-8")).rid
+            if rid:
+                rids.append((rid.lower(), pos))
+        pos = nl + 1
+    return _message_key(head.get("sid"), head.get("id") or head.get("mid")), rids
+
+
+class _Table:
+    """Linear-probing hash table in a memory-mapped file.
+
+    Keys are 16-byte digests and values (segment, frame offset, aux). The
+    header holds two log positions: every frame below `done` is indexed, and
+    no entry points at or past `hwm`. `Store` replays the frames between them
+    on open; a table whose `hwm` is past the end of the log indexed frames
+    that were lost, and is rebuilt.
+    """
+
+    def __init__(self, path: str, capacity: int = 1 << 16) -> None:
+        self.path = path
+        self._initial = capacity
+        if not os.path.exists(path):
+            self._create(path, capacity)
+        self._open()
+
+    @staticmethod
+    def _create(path: str, capacity: int) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEAD.pack(_MAGIC, capacity, 0, 0, 0))
+            f.truncate(_HEAD.size + capacity * _SLOT.size)
+        os.replace(tmp, path)
+
+    def _open(self) -> None:
+        self._fh = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._fh.fileno(), 0)
+        magic, self.capacity, self.count, self.done, self.hwm = _HEAD.unpack_from(self._mm)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"not a PAIRL store index: {self.path}")
+        self._mask = self.capacity - 1
+
+    def get(self, key: bytes) -> Optional[tuple[int, int, int]]:
+        mm, mask = self._mm, self._mask
+        i = int.from_bytes(key[:8], "little") & mask
+        while True:
+            pos = _HEAD.size + i * _SLOT.size
+            k = mm[pos:pos + 16]
+            if k == _EMPTY:
+                return None
+            if k == key:
+                return _SLOT.unpack_from(mm, pos)[1:]
+            i = (i + 1) & mask
+
+    def put(self, key: bytes, seg: int, off: int, aux: int = 0) -> bool:
+        """Insert unless present; return whether it was inserted."""
+        if 3 * (self.count + 1) > 2 * self.capacity:
+            self._grow()
+        mm, mask = self._mm, self._mask
+        i = int.from_bytes(key[:8], "little") & mask
+        while True:
+            pos = _HEAD.size + i * _SLOT.size
+            k = mm[pos:pos + 16]
+            if k == _EMPTY:
+                _SLOT.pack_into(mm, pos, key, seg, off, aux)
+                self.count += 1
+                _COUNT.pack_into(mm, 16, self.count)
+                return True
+            if k == key:
+                return False
+            i = (i + 1) & mask
+
+    def _grow(self) -> None:
+        tmp = self.path + ".grow"
+        self._create(tmp, self.capacity * 2)
+        new = _Table(tmp)
+        view = memoryview(self._mm)[_HEAD.size:]
+        for key, seg, off, aux in _SLOT.iter_unpack(view):
+            if key != _EMPTY:
+                new.put(key, seg, off, aux)
+        view.release()
+        new.mark(self.done, self.hwm)
+        new.close()
+        self.close()
+        os.replace(tmp, self.path)
+        self._open()
+
+    def mark(self, done: int, hwm: int) -> None:
+        self.done, self.hwm = done, hwm
+        _MARK.pack_into(self._mm, 24, done, hwm)
+
+    def clear(self) -> None:
+        self.close()
+        self._create(self.path, self._initial)
+        self._open()
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
+
+
+class Store:
+    """Immutable, content-addressed message log in a directory (§15.2).
+
+    `append()`/`extend()` write messages in canonical form, a batch at a time,
+    to the current segment (a new one is started past `segment_size` bytes).
+    A message is addressed by its digest (hex, or a `ref:hash:sha256:` ref),
+    by `(sid, id)`, or, for one record, by `(sid, id, rid)`. `raw()` returns
+    the stored text as a memoryview of the mapped segment; `get()` parses
+    only that message. Writes are visible to lookups at once and durable
+    after `flush()` or `close()`; after a crash the torn tail of the log is
+    cut and the indexes catch up from the log on the next open. One writer
+    at a time.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], *, segment_size: int = _SEGMENT_SIZE) -> None:
+        self.path = os.fspath(path)
+        self.segment_size = segment_size
+        os.makedirs(self.path, exist_ok=True)
+        segs = sorted(int(n[:-4]) for n in os.listdir(self.path) if n.endswith(".seg") and n[:-4].isdigit())
+        self._seg = segs[-1] if segs else 0
+        self._maps: dict[int, mmap.mmap] = {}
+        self._hash = _Table(os.path.join(self.path, "hash.idx"))
+        self._ids = _Table(os.path.join(self.path, "id.idx"))
+        self._rids = _Table(os.path.join(self.path, "rid.idx"))
+        self._fh = open(self._segment(self._seg), "ab")
+        self._end = self._fh.tell()
+        self._recover()
+
+    def __enter__(self) -> Store:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Number of distinct messages stored."""
+        return self._hash.count
+
+    def __contains__(self, key: object) -> bool:
+        return self._locate(key) is not None  # type: ignore[arg-type]
+
+    def _segment(self, seg: int) -> str:
+        return os.path.join(self.path, f"{seg:08d}.seg")
+
+    # -- writing --------------------------------------------------------------
+
+    def append(self, msg: Union[Message, str, bytes]) -> str:
+        """Store one message; return its digest (hex)."""
+        return self.extend([msg])[0]
+
+    def extend(self, msgs: Iterable[Union[Message, str, bytes]]) -> list[str]:
+        """Store messages with one write per segment; return their digests (hex).
+
+        A message already stored (same digest) is not written again. Raises
+        ValueError, writing nothing, if a message reuses the `(sid, id)` of a
+        different message in the store or in the batch.
+        """
+        digests, frames, entries = [], [], []
+        batch: set[bytes] = set()
+        ids: set[bytes] = set()
+        for msg in msgs:
+            if not isinstance(msg, Message):
+                msg = parse(msg.decode("utf-8") if isinstance(msg, bytes) else msg)
+            payload, digest, rids = _encode(msg)
+            digests.append(digest.hex())
+            if digest in batch or self._hash.get(digest[:16]) is not None:
+                continue
+            key = _message_key(msg.headers.get("sid"), msg.msg_id)
+            entries.append((key, rids))
+            if key is not None:
+                k = _key(*key)
+                if k in ids or self._ids.get(k) is not None:
+                    raise ValueError(f"message already stored: {key[1]} in session {key[0]!r}")
+                ids.add(k)
+            batch.add(digest)
+            frames.append((_FRAME.pack(len(payload), zlib.crc32(payload), digest) + payload, digest))
+        if frames:
+            self._write(frames, entries)
+        return digests
+
+    def _write(self, frames: list[tuple[bytes, bytes]],
+               entries: list[tuple[Optional[tuple[str, str]], list[tuple[str, int]]]]) -> None:
+        placed = []
+        chunk: list[bytes] = []
+        for frame, _ in frames:
+            if self._end and self._end + len(frame) > self.segment_size:
+                self._fh.write(b"".join(chunk))
+                chunk = []
+                self._roll()
+            placed.append((self._seg, self._end))
+            chunk.append(frame)
+            self._end += len(frame)
+        self._fh.write(b"".join(chunk))
+        self._fh.flush()
+
+        end = self._position()
+        tables = (self._hash, self._ids, self._rids)
+        for t in tables:
+            t.mark(t.done, end)
+        for (seg, off), (_, digest), (key, rids) in zip(placed, frames, entries):
+            self._index(seg, off, digest, key, rids, tables)
+        for t in tables:
+            t.mark(end, end)
+
+    def _roll(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self._seg += 1
+        self._fh = open(self._segment(self._seg), "ab")
+        self._end = 0
+
+    def _position(self) -> int:
+        return self._seg << _SEG_SHIFT | self._end
+
+    def _index(self, seg: int, off: int, digest: bytes, key: Optional[tuple[str, str]],
+               rids: list[tuple[str, int]], tables: tuple[_Table, ...]) -> None:
+        if self._hash in tables:
+            self._hash.put(digest[:16], seg, off)
+        if key is None:
+            return
+        if self._ids in tables:
+            self._ids.put(_key(*key), seg, off)
+        if self._rids in tables:
+            for rid, line in rids:
+                self._rids.put(_key(*key, rid), seg, off, line)
+
+    def flush(self) -> None:
+        """Make everything appended so far durable."""
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        for t in (self._hash, self._ids, self._rids):
+            t.flush()
+
+    def close(self) -> None:
+        """Flush and release files; memoryviews from `raw()` keep their segment mapped."""
+        if self._fh.closed:
+            return
+        self.flush()
+        self._fh.close()
+        for t in (self._hash, self._ids, self._rids):
+            t.close()
+        self._maps.clear()
+
+    # -- recovery -------------------------------------------------------------
+
+    def _recover(self) -> None:
+        """Cut a torn tail off the log and bring the indexes up to its end."""
+        tables = (self._hash, self._ids, self._rids)
+        start = min(t.done for t in tables)
+        off = start & ((1 << _SEG_SHIFT) - 1) if start >> _SEG_SHIFT == self._seg else 0
+        if any(max(t.done, t.hwm) > self._position() for t in tables):
+            off = 0  # the log lost frames the indexes saw: re-check the segment from its first frame
+        mm = self._map(self._seg, self._end) if self._end else None
+        while off < self._end:
+            if off + _FRAME.size > self._end:
+                break
+            n, crc, _ = _FRAME.unpack_from(mm, off)
+            body = off + _FRAME.size
+            if body + n > self._end or zlib.crc32(mm[body:body + n]) != crc:
+                break
+            off = body + n
+        if off < self._end:
+            self._maps.pop(self._seg, None)
+            self._fh.truncate(off)
+            self._end = off
+        end = self._position()
+        for t in tables:
+            if t.hwm > end or t.done > end:
+                t.clear()
+        stale = tuple(t for t in tables if t.done < end)
+        if not stale:
+            return
+        for pos, seg, off, payload, digest in self._frames(min(t.done for t in stale)):
+            self._index(seg, off, digest, *_entries(payload), tuple(t for t in stale if t.done <= pos))
+        for t in tables:
+            t.mark(end, end)
+
+    def _frames(self, start: int) -> Iterator[tuple[int, int, int, bytes, bytes]]:
+        """(position, segment, offset, payload, digest) of every frame from `start` on."""
+        seg, off = start >> _SEG_SHIFT, start & ((1 << _SEG_SHIFT) - 1)
+        while seg <= self._seg:
+            path = self._segment(seg)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            mm = self._map(seg, size) if size else None
+            while off < size:
+                n, crc, digest = _FRAME.unpack_from(mm, off)
+                body = off + _FRAME.size
+                payload = mm[body:body + n]
+                if len(payload) != n or zlib.crc32(payload) != crc:
+                    raise ValueError(f"corrupt frame in {path} at offset {off}")
+                yield seg << _SEG_SHIFT | off, seg, off, payload, digest
+                off = body + n
+            seg, off = seg + 1, 0
+
+    # -- reading --------------------------------------------------------------
+
+    def _map(self, seg: int, end: int) -> mmap.mmap:
+        mm = self._maps.get(seg)
+        if mm is None or len(mm) < end:
+            with open(self._segment(seg), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[seg] = mm
+        return mm
+
+    def _span(self, seg: int, off: int) -> tuple[mmap.mmap, int, int]:
+        """The mapped segment holding a frame, and its payload's start and end."""
+        mm = self._map(seg, off + _FRAME.size)
+        n = _FRAME.unpack_from(mm, off)[0]
+        start = off + _FRAME.size
+        return self._map(seg, start + n), start, start + n
+
+    def _locate(self, key: Key) -> Optional[tuple[int, int, int]]:
+        if isinstance(key, tuple):
+            mkey = _message_key(*key)
+            return None if mkey is None else self._ids.get(_key(*mkey))
+        if isinstance(key, str):
+            if key.startswith("ref:hash:"):
+                algo, _, key = key[9:].partition(":")
+                if algo != "sha256":
+                    return None
+            try:
+                key = bytes.fromhex(key)
+            except ValueError:  # not a digest, so not stored
+                return None
+        return self._hash.get(key[:16])
+
+    def raw(self, key: Key) -> Optional[memoryview]:
+        """The stored canonical text of a message, without copying it."""
+        hit = self._locate(key)
+        if hit is None:
+            return None
+        mm, start, end = self._span(hit[0], hit[1])
+        return memoryview(mm)[start:end]
+
+    def get(self, key: Key) -> Optional[Message]:
+        """The message for a digest or `(sid, id)`, parsed from its frame alone."""
+        hit = self._locate(key)
+        if hit is None:
+            return None
+        mm, start, end = self._span(hit[0], hit[1])
+        return parse(mm[start:end].decode("utf-8"))
+
+    def digest(self, key: Key) -> Optional[str]:
+        """The digest (hex) of the message for `key`, read from its frame header."""
+        hit = self._locate(key)
+        if hit is None:
+            return None
+        return _FRAME.unpack_from(self._map(hit[0], hit[1] + _FRAME.size), hit[1])[2].hex()
+
+    def record(self, sid: str, mid: str, rid: str) -> Optional[Record]:
+        """One record by its message's `(sid, id)` and its @rid, parsed from its line alone."""
+        mkey = _message_key(sid, mid)
+        hit = None if mkey is None else self._rids.get(_key(*mkey, rid.lower()))
+        if hit is None:
+            return None
+        seg, off, line = hit
+        mm, start, end = self._span(seg, off)
+        nl = mm.find(b"\n", start + line, end)
+        return _parse_record(mm[start + line:end if nl < 0 else nl].decode("utf-8"))
@@ -0,0 +1,326 @@
+"""Thread graph index for V4 (parent resolution) and V7 (dependency cycles).
+
+Messages form a DAG through `@p` (v1.3 `@parent`), `@root`, and `@deps` (§2.2).
+`ThreadGraph` keeps one node per message, keyed by session id plus `@id` (or
+v1.3 `@mid`), so references resolve with a dict lookup. Cycles are caught as
+each edge is added: nodes carry a topological order that is only repaired
+locally when an edge runs against it (a late message's few ancestors move
+below everything, else Pearce–Kelly), so appending a reply to an existing
+thread is O(1) and nothing is ever re-walked from the roots.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from typing import Iterator, Optional
+
+from .core import Message
+
+_SMALL = 1024  # ancestor sets up to this size move wholesale instead of a Pearce–Kelly reorder
+_LEGACY = "ref:msg"  # key namespace of v1.3 ULID message ids, global across sessions
+# m1 | @m1 | @m1#a2 | ref:msg:<sid>:<id>[#rid] | v1.3 ref:msg:<ULID>[#rid]
+_MSG_REF = re.compile(r"(?:(ref:msg:)(?:([^\s:#]+):)?|@)?([^\s:#@]+)(?:#([^\s#]+))?")
+
+
+def session_id(value: Optional[str]) -> Optional[str]:
+    """The bare id of an `@sid` value (`ref:sess:<id>` or a plain id)."""
+    if not value:
+        return None
+    return value[9:] if value.startswith("ref:sess:") else value
+
+
+def split_ref(ref: str) -> Optional[tuple[Optional[str], str, Optional[str]]]:
+    """(sid, message id, rid) of a message or record reference (§10).
+
+    Accepts `m1`, `@m1`, `@m1#a2`, `ref:msg:<sid>:<id>[#rid]`, and v1.3
+    `ref:msg:<ULID>[#rid]`. The sid is None for session-local references and
+    "ref:msg" for v1.3 ones. Returns None for anything else.
+    """
+    m = _MSG_REF.fullmatch(ref)
+    if m is None:
+        return None
+    prefix, sid, mid, rid = m.groups()
+    return (sid or _LEGACY) if prefix else None, mid, rid
+
+
+def message_edges(msg: Message) -> list[str]:
+    """The dependency references of a message, parent first (`@p`, `@root`, `@deps`)."""
+    h = msg.headers
+    out = []
+    parent = h.get("p") or h.get("parent")
+    if parent:
+        out.append(parent)
+    if h.get("root"):
+        out.append(h["root"])
+    if h.get("deps"):
+        out.extend(d for d in (d.strip() for d in h["deps"].split(",")) if d)
+    return out
+
+
+class ThreadGraph:
+    """Index of messages across sessions, fed one parsed `Message` at a time.
+
+    `add()` registers a message with its rids and its edges to the messages it
+    depends on. A reference to a message not yet added creates a placeholder
+    node, filled in when that message arrives, so edges may come in any order.
+    An edge that would close a cycle is not added; `add()` returns the cycle
+    and `cycles()` reports it for that message afterwards (V7).
+
+    A message without `@sid` belongs to the session given as `sid=`, else to
+    the last session seen — the thread it continues (§10.1). `resolve()` maps
+    a reference to its message key in O(1) (V4). Pass the graph to
+    `validate(msg, resolver=graph)` to check V4 and V7 against it.
+    """
+
+    def __init__(self) -> None:
+        self.session: Optional[str] = None  # current session, inherited by messages without @sid
+        self._nodes: dict[tuple[str, str], int] = {}
+        self._keys: list[tuple[str, str]] = []
+        self._defined = bytearray()
+        self._rids: list[frozenset[str]] = []
+        self._out: list[list[int]] = []
+        self._in: list[list[int]] = []
+        # Topological order: an edge x -> y has _ord[x] < _ord[y]. New messages
+        # get a label below all others and new placeholders one above, so edges
+        # to known parents and to parents that arrive later both keep the order.
+        self._ord: list[int] = []
+        self._low = self._high = 0
+        self._cycles: dict[int, list[list[str]]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Number of messages added (placeholders excluded)."""
+        return self._count
+
+    def __contains__(self, key: object) -> bool:
+        node = self._nodes.get(key)  # type: ignore[arg-type]
+        return node is not None and bool(self._defined[node])
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return (k for n, k in enumerate(self._keys) if self._defined[n])
+
+    # -- keys -----------------------------------------------------------------
+
+    def key(self, msg: Message, *, sid: Optional[str] = None) -> Optional[tuple[str, str]]:
+        """(sid, id) under which `msg` is (or would be) indexed."""
+        h = msg.headers
+        mid = h.get("id") or h.get("mid")
+        if not mid:
+            return None
+        if mid.startswith("ref:msg:"):
+            mid = mid[8:]
+        return session_id(h.get("sid")) or sid or self.session or "", mid
+
+    def _target(self, ref: str, sid: str) -> Optional[tuple[tuple[str, str], Optional[str]]]:
+        parts = split_ref(ref)
+        if parts is None:
+            return None
+        rsid, mid, rid = parts
+        return (sid if rsid is None else rsid, mid), rid
+
+    def _targets(self, msg: Message, sid: str) -> list[tuple[str, str]]:
+        """Keys of the messages `msg` depends on, without repeats."""
+        targets = (self._target(ref, sid) for ref in message_edges(msg))
+        return list(dict.fromkeys(t[0] for t in targets if t is not None))
+
+    def _own(self, msg: Message, key: tuple[str, str]) -> Optional[int]:
+        """The node already standing for `msg`, e.g. a placeholder, if any."""
+        node = self._nodes.get(key)
+        if node is None and "id" not in msg.headers:  # v1.3 @mid, maybe referenced as ref:msg:<ULID>
+            node = self._nodes.get((_LEGACY, key[1]))
+        return node
+
+    def _node(self, key: tuple[str, str], top: bool = False) -> int:
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = len(self._keys)
+            self._keys.append(key)
+            self._defined.append(0)
+            self._rids.append(frozenset())
+            self._out.append([])
+            self._in.append([])
+            if top:
+                self._high += 1
+                self._ord.append(self._high)
+            else:
+                self._low -= 1
+                self._ord.append(self._low)
+        return node
+
+    # -- lookup ---------------------------------------------------------------
+
+    def resolve(self, ref: str, *, sid: Optional[str] = None) -> Optional[tuple[str, str]]:
+        """Key of the message `ref` points at, or None if it is not in the graph.
+
+        A record reference (`@m1#a2`) also needs the rid in that message.
+        Session-local references resolve in `sid` (default: the current session).
+        """
+        target = self._target(ref, sid or self.session or "")
+        if target is None:
+            return None
+        key, rid = target
+        node = self._nodes.get(key)
+        if node is None or not self._defined[node]:
+            return None
+        if rid is not None and rid.lower() not in self._rids[node]:
+            return None
+        return self._keys[node]
+
+    def parents(self, key: tuple[str, str]) -> list[tuple[str, str]]:
+        """Keys of the messages `key` depends on, in edge order."""
+        node = self._nodes.get(key)
+        return [] if node is None else [self._keys[n] for n in self._out[node]]
+
+    def cycles(self, msg: Message, *, sid: Optional[str] = None) -> list[list[str]]:
+        """Cycles closed by `msg`'s edges, as lists of message ids (V7).
+
+        For a message already added these are the edges `add()` rejected;
+        otherwise the check is read-only and leaves the graph unchanged.
+        """
+        key = self.key(msg, sid=sid)
+        if key is None:
+            return []
+        node = self._own(msg, key)
+        if node is not None and self._defined[node]:
+            return list(self._cycles.get(node, ()))
+        found = []
+        for target in self._targets(msg, key[0]):
+            if target == key:
+                found.append([key[1], key[1]])
+            elif node is not None and target in self._nodes:
+                path = self._path(self._nodes[target], node)
+                if path is not None:
+                    found.append([key[1], *(self._keys[n][1] for n in path)])
+        return found
+
+    # -- updates --------------------------------------------------------------
+
+    def add(self, msg: Message, *, sid: Optional[str] = None) -> list[list[str]]:
+        """Index `msg` and its dependency edges; return the cycles it would close.
+
+        Raises ValueError if the message has no `@id`/`@mid` or was already added.
+        """
+        key = self.key(msg, sid=sid)
+        if key is None:
+            raise ValueError("message has no @id or @mid")
+        if session_id(msg.headers.get("sid")) or sid:
+            self.session = key[0]
+        node = self._own(msg, key)
+        if node is not None and self._defined[node]:
+            raise ValueError(f"message already added: {key[1]}")
+        targets = [self._node(t, top=True) for t in self._targets(msg, key[0])]
+        if node is None:
+            node = self._node(key)
+        self._nodes[key] = node
+        if "id" not in msg.headers:
+            self._nodes[(_LEGACY, key[1])] = node
+        self._defined[node] = 1
+        self._rids[node] = frozenset(sys.intern(r.rid.lower()) for r in msg.iter_records() if r.rid)
+        self._count += 1
+
+        found = []
+        for t in targets:
+            path = self._insert(node, t)
+            if path is not None:
+                found.append([self._keys[n][1] for n in path])
+        if found:
+            self._cycles[node] = found
+        return found
+
+    def _insert(self, x: int, y: int) -> Optional[list[int]]:
+        """Add edge x -> y; on a cycle, leave the graph as is and return it."""
+        ord_ = self._ord
+        if ord_[x] >= ord_[y] and not self._defined[y] and x != y:
+            # A placeholder has no edges out yet, so it can move to the top.
+            self._high += 1
+            ord_[y] = self._high
+        if ord_[x] < ord_[y]:
+            self._out[x].append(y)
+            self._in[y].append(x)
+            return None
+        if x == y:
+            return [x, x]
+        # A message that arrived late usually has few ancestors yet (the ones
+        # delivered before it). If so, move them all below every other node,
+        # keeping their relative order; y among them means a cycle.
+        came = {x: -1}
+        stack = [x]
+        while stack and len(came) <= _SMALL:
+            n = stack.pop()
+            for p in self._in[n]:
+                if p == y:
+                    path = [y]
+                    while n != -1:
+                        path.append(n)
+                        n = came[n]
+                    return [x, *path]
+                if p not in came:
+                    came[p] = n
+                    stack.append(p)
+        if not stack:
+            moved = sorted(came, key=ord_.__getitem__)
+            self._low -= len(moved)
+            for i, n in enumerate(moved):
+                ord_[n] = self._low + i
+            self._out[x].append(y)
+            self._in[y].append(x)
+            return None
+        # Otherwise Pearce–Kelly: everything that has to move lies between the
+        # two labels — descendants of y below x, ancestors of x above y.
+        lo, hi = ord_[y], ord_[x]
+        came: dict[int, int] = {y: -1}
+        fwd, stack = [], [y]
+        while stack:
+            n = stack.pop()
+            fwd.append(n)
+            for s in self._out[n]:
+                if s == x:
+                    path = [x]
+                    while n != -1:
+                        path.append(n)
+                        n = came[n]
+                    return [x, *reversed(path[1:]), x]
+                if s not in came and ord_[s] < hi:
+                    came[s] = n
+                    stack.append(s)
+        seen = {x}
+        bwd, stack = [], [x]
+        while stack:
+            n = stack.pop()
+            bwd.append(n)
+            for p in self._in[n]:
+                if p not in seen and ord_[p] > lo:
+                    seen.add(p)
+                    stack.append(p)
+        bwd.sort(key=ord_.__getitem__)
+        fwd.sort(key=ord_.__getitem__)
+        moved = bwd + fwd
+        for n, o in zip(moved, sorted(ord_[n] for n in moved)):
+            ord_[n] = o
+        self._out[x].append(y)
+        self._in[y].append(x)
+        return None
+
+    def _path(self, src: int, dst: int) -> Optional[list[int]]:
+        """Nodes on a path src -> ... -> dst, if any (searched within the order bounds)."""
+        ord_ = self._ord
+        if src == dst:
+            return [src]
+        if ord_[src] > ord_[dst]:
+            return None
+        came: dict[int, int] = {src: -1}
+        stack = [src]
+        while stack:
+            n = stack.pop()
+            for s in self._out[n]:
+                if s == dst:
+                    path = [dst]
+                    while n != -1:
+                        path.append(n)
+                        n = came[n]
+                    return path[::-1]
+                if s not in came and ord_[s] < ord_[dst]:
+                    came[s] = n
+                    stack.append(s)
+        return None
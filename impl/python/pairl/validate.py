@@ -2,16 +2,24 @@
 
 from __future__ import annotations
 
+import math
 import re
 from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional, Union
 
-from .core import COLUMNAR_FORBIDDEN, Message, split_fields
+from .canonical import _HASH_REF, compute_hash
+from .core import COLUMNAR_FORBIDDEN, ColumnarBlock, Message, Record
+from .thread import ThreadGraph, session_id
 
 _REF = re.compile(r"^ref:[A-Za-z0-9_-]+:[^\s]+$")
 _SLOC = re.compile(r"^@[A-Za-z0-9]{1,8}(?:#[A-Za-z0-9_-]{1,8})?$")
 _BARE_DEP = re.compile(r"^[A-Za-z0-9]{1,8}(?:#[A-Za-z0-9_-]{1,8})?$")
 _BUDGET = re.compile(r"^([0-9]+(?:\.[0-9]+)?)([A-Za-z]{1,16})$")
 _NUMERIC_INTENT_KEYS = {"l", "m"}
+_URL = re.compile(r"https?://")
+_HEXRUN = re.compile(r"[a-fA-F0-9]{12,}")
+_DIGIT = re.compile(r"\d")
+_COL_KEY = re.compile(r"[a-z][a-z0-9_]*")
 
 
 def is_valid_ref(v: str) -> bool:
@@ -35,172 +43,650 @@ class Result:
         return not self.errors
 
 
-def validate(msg: Message, strict: bool = False) -> Result:
-    res = Result()
-    res.errors.extend(msg.errors)
+class ValidationError(ValueError):
+    """Raised by a fail-fast `Validator` on the first hard error."""
 
-    # Required headers
-    for h in ("v", "ts"):
-        if h not in msg.headers:
-            res.errors.append(f"missing required header: @{h}")
-    if "id" not in msg.headers and "mid" not in msg.headers:
-        res.errors.append("missing required header: @id (or legacy @mid)")
+    def __init__(self, message: str, result: Result) -> None:
+        super().__init__(message)
+        self.result = result
 
-    _v1_no_new_facts(msg, res, strict)
-    _v2_evidence(msg, res)
-    _v3_refs(msg, res)
-    _v6_rid_unique(msg, res)
-    _v8_budget(msg, res)
-    _v9_tool_chain(msg, res, strict)
-    _v11_turn_markers(msg, res)
-    _v12_columnar(msg, res)
-    return res
 
+class Rule:
+    """One validation rule, run by `Validator` in a single pass over the records.
 
-def _has_rule(msg: Message, name: str) -> bool:
-    return any(r.kind == "rule" and r.kv.get(name) == "true" for r in msg.records)
+    Subclasses set `name` and `kinds` — the record kinds dispatched to
+    `record()`, where the pseudo-kinds "@rid" and "@m" select records carrying
+    that trailing tag; a rule sees each record at most once — and report with
+    `error()`/`warn()`. The key passed along orders a rule's diagnostics among
+    themselves; rules report in registry order. Rules with `columnar = True`
+    also see columnar blocks via `block()`/`row()`. When an unexpanded block
+    of a dispatched kind is fed, `columns()` may check it column-wide instead
+    of row by row. A fresh instance is made per validation, so a rule may
+    keep running state.
+    """
 
+    name = ""
+    kinds: tuple[str, ...] = ()
+    columnar = False
 
-def _v1_no_new_facts(msg: Message, res: Result, strict: bool) -> None:
-    enforce = strict and _has_rule(msg, "no_new_facts")
-    for r in msg.records:
-        if r.kind != "intent":
-            continue
+    def __init__(self, validator: Validator, rank: int) -> None:
+        self.validator = validator
+        self.rank = rank
+
+    def start(self) -> None:
+        """Header-level checks, run before the first record."""
+
+    def record(self, r: Record, seq: int) -> None:
+        """Check one dispatched record; `seq` is its position in the body."""
+
+    def columns(self, blk: ColumnarBlock, seq: int) -> bool:
+        """Check all rows of a block at once; `seq` is the first row's position.
+
+        Return True if handled, so the rows skip `record()`.
+        """
+        return False
+
+    def block(self, bi: int, blk: ColumnarBlock) -> None:
+        """Check a columnar block header as soon as the block opens."""
+
+    def row(self, bi: int, ri: int, blk: ColumnarBlock) -> None:
+        """Check one columnar row as soon as it is parsed."""
+
+    def finish(self) -> None:
+        """Settle checks that depend on the whole body."""
+
+    def error(self, key: tuple, text: str) -> None:
+        self.validator._error((self.rank, *key), text)
+
+    def warn(self, key: tuple, text: str) -> None:
+        self.validator._warnings.append(((self.rank, *key), text))
+
+    def emit(self, as_error: bool, key: tuple, text: str) -> None:
+        (self.error if as_error else self.warn)(key, text)
+
+
+_RULES: dict[str, type[Rule]] = {}
+
+
+def register_rule(cls: type[Rule]) -> type[Rule]:
+    """Add a rule to the default set (usable as a class decorator)."""
+    if not cls.name:
+        raise ValueError("rule needs a name")
+    _RULES[cls.name] = cls
+    return cls
+
+
+def rule_names() -> list[str]:
+    """Registered rule names, in reporting order."""
+    return list(_RULES)
+
+
+RuleSpec = Union[str, type[Rule]]
+
+
+class Validator:
+    """Record-at-a-time validator (V1–V12) for bodies that are still arriving.
+
+    Construct it on the `Message` whose headers are known (e.g. the first item
+    of `parse_stream`), `feed()` each record as it is parsed, then `finish()`.
+    Each record is dispatched by kind to the enabled rules only; their running
+    state replaces the whole-body passes: the V6 rid set, V8 cost totals per
+    currency, V9 call rids with pending `#ret` forward references, and V11
+    turn ids with pending `@m=`/`parent=` references. Checks that depend on
+    later records (V1 under `#rule no_new_facts`, V9 orphans, V11 dangling
+    refs) are settled at `finish()`.
+
+    `rules` selects the rules to run (registered names or `Rule` subclasses,
+    default: all registered); `skip` removes names from that set. `feed()`
+    returns the hard errors the record produced. With `fail_fast`, the first
+    hard error raises `ValidationError` instead, so a streamed generation can
+    be cancelled early (V8 aborts as soon as the running total crosses the
+    budget, assuming non-negative costs). `finish()` yields exactly what
+    `validate()` reports for the complete message. A caller that already has
+    the message's canonical hash (e.g. from `fast_hash()` on the raw bytes)
+    passes it as `digest`, and V5 compares against it instead of rehashing.
+    With a `resolver` (a `ThreadGraph` of the thread so far), V4 checks that
+    the parent resolves and V7 looks for dependency cycles through the thread;
+    without one, V7 only catches a message that depends on itself.
+    """
+
+    def __init__(self, msg: Message, strict: bool = False, *, fail_fast: bool = False,
+                 rules: Optional[Iterable[RuleSpec]] = None, skip: Iterable[str] = (),
+                 digest: Optional[str] = None, resolver: Optional[ThreadGraph] = None) -> None:
+        self.msg = msg
+        self.strict = strict
+        self.fail_fast = fail_fast
+        self.digest = digest
+        self.resolver = resolver
+        self.cost_totals: dict[str, float] = {}
+        self._errors: list[tuple[tuple, str]] = []
+        self._warnings: list[tuple[tuple, str]] = []
+        self._new: list[str] = list(msg.errors)
+        self._seq = 0
+        self._blk = 0
+        self._row = -1  # -1: current block not announced to the rules yet
+
+        self.rules = [cls(self, rank) for rank, cls in enumerate(_select(rules, skip))]
+        self._plans: dict[tuple[str, bool, bool], list[Callable[[Record, int], None]]] = {}
+        self._columnar = [rule for rule in self.rules if rule.columnar]
+        for rule in self.rules:
+            rule.start()
+        self._raise_new()
+
+    def feed(self, r: Record) -> list[str]:
+        """Check one record; return the hard errors it produced."""
+        seq = self._seq
+        self._seq += 1
+        if self._columnar:
+            self._sync_blocks()
+        key = (r.kind, not r.rid, not r.m)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = self._plan(*key)
+        for check in plan:
+            check(r, seq)
+        return self._raise_new()
+
+    def feed_many(self, records: Iterable[Record | ColumnarBlock]) -> list[str]:
+        """Check a batch of already-parsed records in one tight loop.
+
+        Accepts `Message.body()`: an unexpanded block is checked in place.
+        """
+        if self._columnar:
+            self._sync_blocks()
+        plans, plan_for = self._plans, self._plan
+        fail_fast = self.fail_fast
+        seq = self._seq
+        for r in records:
+            if r.__class__ is ColumnarBlock:
+                seq = self._feed_block(r, seq)
+                if fail_fast and self._new:
+                    self._seq = seq
+                    self._raise_new()
+                continue
+            key = (r.kind, not r.rid, not r.m)
+            plan = plans.get(key)
+            if plan is None:
+                plan = plans[key] = plan_for(*key)
+            for check in plan:
+                check(r, seq)
+            seq += 1
+            if fail_fast and self._new:
+                self._seq = seq
+                self._raise_new()
+        self._seq = seq
+        return self._raise_new()
+
+    def finish(self) -> Result:
+        """Settle deferred checks and return the full result."""
+        if self._columnar:
+            self._sync_blocks()
+        for rule in self.rules:
+            rule.finish()
+        res = self._result()
+        if self.fail_fast and res.errors:
+            raise ValidationError(res.errors[0], res)
+        return res
+
+    def _result(self) -> Result:
+        res = Result()
+        res.errors.extend(self.msg.errors)
+        res.errors.extend(t for _k, t in sorted(self._errors, key=lambda e: e[0]))
+        res.warnings.extend(t for _k, t in sorted(self._warnings, key=lambda e: e[0]))
+        return res
+
+    def _error(self, key: tuple, text: str) -> None:
+        self._errors.append((key, text))
+        self._new.append(text)
+
+    def _raise_new(self) -> list[str]:
+        new, self._new = self._new, []
+        if new and self.fail_fast:
+            raise ValidationError(new[0], self._result())
+        return new
+
+    def _plan(self, kind: str, no_rid: bool, no_m: bool) -> list[Callable[[Record, int], None]]:
+        """The rules a record of this shape is dispatched to, each at most once."""
+        wanted = {kind}
+        if not no_rid:
+            wanted.add("@rid")
+        if not no_m:
+            wanted.add("@m")
+        return [rule.record for rule in self.rules if wanted.intersection(rule.kinds)]
+
+    def _feed_block(self, blk: ColumnarBlock, seq: int) -> int:
+        """Check an unexpanded block; rows get a `Record` view only if a rule needs one."""
+        rtype = blk.rtype
+        handled = [rule for rule in self.rules if rtype in rule.kinds and rule.columns(blk, seq)]
+        shapes: dict[tuple[str, bool, bool], list[Callable[[Record, int], None]]] = {}
+        rids, ms = blk.rids, blk.ms
+        for i in range(len(blk)):
+            key = (rtype, not rids[i], not ms[i])
+            plan = shapes.get(key)
+            if plan is None:
+                plan = self._plans.get(key)
+                if plan is None:
+                    plan = self._plans[key] = self._plan(*key)
+                plan = shapes[key] = [c for c in plan if c.__self__ not in handled]
+            if plan:
+                r = blk.record(i)
+                for check in plan:
+                    check(r, seq + i)
+        return seq + len(blk)
+
+    def _sync_blocks(self) -> None:
+        """Hand columnar headers and rows added since the last call to the rules."""
+        blocks = self.msg.blocks
+        while self._blk < len(blocks):
+            bi, blk = self._blk, blocks[self._blk]
+            if self._row == -1:
+                for rule in self._columnar:
+                    rule.block(bi, blk)
+                self._row = 0
+            n = len(blk)
+            for ri in range(self._row, n):
+                for rule in self._columnar:
+                    rule.row(bi, ri, blk)
+            self._row = n
+            if bi == len(blocks) - 1:
+                return  # the last block may still be growing
+            self._blk += 1
+            self._row = -1
+
+
+def _select(rules: Optional[Iterable[RuleSpec]], skip: Iterable[str]) -> list[type[Rule]]:
+    skipped = set(skip)
+    if rules is None:
+        return [cls for name, cls in _RULES.items() if name not in skipped]
+    wanted = set()
+    extra: list[type[Rule]] = []
+    for spec in rules:
+        if isinstance(spec, str):
+            if spec not in _RULES:
+                raise ValueError(f"unknown validation rule: {spec}")
+            wanted.add(spec)
+        elif _RULES.get(spec.name) is spec:
+            wanted.add(spec.name)
+        else:
+            extra.append(spec)
+    chosen = [cls for name, cls in _RULES.items() if name in wanted]
+    return [cls for cls in chosen + extra if cls.name not in skipped]
+
+
+def validate(msg: Message, strict: bool = False, *, rules: Optional[Iterable[RuleSpec]] = None,
+             skip: Iterable[str] = (), digest: Optional[str] = None,
+             resolver: Optional[ThreadGraph] = None) -> Result:
+    v = Validator(msg, strict, rules=rules, skip=skip, digest=digest, resolver=resolver)
+    v.feed_many(msg.body())
+    return v.finish()
+
+
+# -- built-in rules, in reporting order ---------------------------------------
+
+
+@register_rule
+class RequiredHeaders(Rule):
+    name = "headers"
+
+    def start(self) -> None:
+        h = self.validator.msg.headers
+        n = 0
+        for name in ("v", "ts"):
+            if name not in h:
+                self.error((n,), f"missing required header: @{name}")
+                n += 1
+        if "id" not in h and "mid" not in h:
+            self.error((n,), "missing required header: @id (or legacy @mid)")
+
+
+@register_rule
+class NoNewFacts(Rule):
+    """V1. Whether findings are errors depends on a `#rule` that may come later."""
+
+    name = "V1"
+    kinds = ("intent", "rule")
+
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.found: list[tuple[tuple, str]] = []
+        self.enforced = False
+
+    def record(self, r: Record, seq: int) -> None:
+        if r.kind == "rule":
+            if not self.enforced and self.validator.strict and r.kv.get("no_new_facts") == "true":
+                self.enforced = True
+                self.validator._new.extend(t for _k, t in self.found)
+            return
         for k, v in r.kv.items():
-            if re.search(r"https?://", v):
-                _emit(res, enforce, f"V1: intent param '{k}' has a URL (move to #ref): {v}")
-            elif re.search(r"[a-fA-F0-9]{12,}", v):
-                _emit(res, enforce, f"V1: intent param '{k}' looks like a hash (move to #ref): {v}")
-            elif k not in _NUMERIC_INTENT_KEYS and re.search(r"\d", v):
-                _emit(res, enforce, f"V1: intent param '{k}' has a number (consider #fact): {k}={v}")
-
-
-def _v2_evidence(msg: Message, res: Result) -> None:
-    for r in msg.records:
-        if r.kind != "evid":
-            continue
-        missing = [k for k in ("claim", "src", "conf") if k not in r.kv]
-        if missing:
-            res.errors.append(f"V2: #evid missing {', '.join(missing)}: {r.raw}")
-            continue
+            if _URL.search(v):
+                text = f"V1: intent param '{k}' has a URL (move to #ref): {v}"
+            elif _HEXRUN.search(v):
+                text = f"V1: intent param '{k}' looks like a hash (move to #ref): {v}"
+            elif k not in _NUMERIC_INTENT_KEYS and _DIGIT.search(v):
+                text = f"V1: intent param '{k}' has a number (consider #fact): {k}={v}"
+            else:
+                continue
+            self.found.append(((seq, len(self.found)), text))
+            if self.enforced:
+                self.validator._new.append(text)
+
+    def finish(self) -> None:
+        for key, text in self.found:
+            self.emit(self.enforced, key, text)
+
+
+@register_rule
+class EvidenceCompleteness(Rule):
+    name = "V2"
+    kinds = ("evid",)
+
+    def record(self, r: Record, seq: int) -> None:
+        kv = r.kv
+        if "claim" not in kv or "src" not in kv or "conf" not in kv:
+            missing = [k for k in ("claim", "src", "conf") if k not in kv]
+            self.error((seq,), f"V2: #evid missing {', '.join(missing)}: {r.raw}")
+            return
         try:
-            c = float(r.kv["conf"])
+            c = float(kv["conf"])
             if not (0.0 <= c <= 1.0):
-                res.errors.append(f"V2: #evid conf must be in [0,1]: {r.raw}")
+                self.error((seq,), f"V2: #evid conf must be in [0,1]: {r.raw}")
+        except ValueError:
+            self.error((seq,), f"V2: #evid conf is not a number: {r.raw}")
+
+    def columns(self, blk: ColumnarBlock, seq: int) -> bool:
+        pos = blk.index()
+        if pos is None:
+            return False
+        keys = ("claim", "src", "conf")
+        at = [pos.get(k) for k in keys]
+        widths, raws = blk.widths, blk.raws
+        need = -1 if None in at else max(at)  # a complete row is wider than this
+        short = [i for i, w in enumerate(widths) if w <= need] if need >= 0 else range(len(widths))
+        for i in short:
+            missing = [k for k, p in zip(keys, at) if p is None or p >= widths[i]]
+            self.error((seq + i,), f"V2: #evid missing {', '.join(missing)}: {raws[i]}")
+        if need < 0:
+            return True
+        confs, bad = blk.floats("conf")
+        if not confs or (not short and not bad and 0.0 <= min(confs) and max(confs) <= 1.0
+                         and not math.isnan(sum(confs))):
+            return True
+        skip = set(short)
+        for i, c in enumerate(confs):
+            if not 0.0 <= c <= 1.0 and i not in skip:
+                if i in bad:
+                    self.error((seq + i,), f"V2: #evid conf is not a number: {raws[i]}")
+                else:
+                    self.error((seq + i,), f"V2: #evid conf must be in [0,1]: {raws[i]}")
+        return True
+
+
+@register_rule
+class RefFormat(Rule):
+    name = "V3"
+    kinds = ("ref",)
+
+    def start(self) -> None:
+        h = self.validator.msg.headers
+        n = 0
+        deps = h.get("deps")
+        if deps:
+            for d in deps.split(","):
+                d = d.strip()
+                if not d or not (is_valid_ref(d) or is_sloc_ref(d) or _BARE_DEP.match(d)):
+                    self.error((1, n), f"V3: invalid @deps entry: {d!r}")
+                    n += 1
+        for k in ("p", "root", "parent"):
+            v = h.get(k)
+            if v and v.startswith("ref:") and not is_valid_ref(v):
+                self.error((1, n), f"V3: invalid ref in @{k}: {v}")
+                n += 1
+
+    def record(self, r: Record, seq: int) -> None:
+        for v in r.kv.values():
+            if not (is_valid_ref(v) or is_sloc_ref(v)):
+                self.error((0, seq), f"V3: invalid ref format: {v}")
+
+
+@register_rule
+class ThreadIntegrity(Rule):
+    """V4. Needs a resolver (strict_refs): the parent must be in the thread."""
+
+    name = "V4"
+
+    def start(self) -> None:
+        graph = self.validator.resolver
+        h = self.validator.msg.headers
+        parent = h.get("p") or h.get("parent")
+        if graph is not None and parent and graph.resolve(parent, sid=session_id(h.get("sid"))) is None:
+            self.error((0,), f"V4: parent not found in thread: {parent}")
+
+
+@register_rule
+class HashMatch(Rule):
+    """V5. The hash covers the whole body, so it is recomputed in `finish()`."""
+
+    name = "V5"
+
+    def finish(self) -> None:
+        claimed = self.validator.msg.headers.get("hash")
+        if claimed is None:
+            return
+        m = _HASH_REF.fullmatch(claimed)
+        if m is None:
+            self.error((0,), f"V5: invalid @hash (expected ref:hash:<alg>:<hex>): {claimed}")
+        elif m.group(1) != "sha256":
+            self.warn((0,), f"V5: cannot verify @hash with algorithm {m.group(1)}")
+        else:
+            actual = self.validator.digest or compute_hash(self.validator.msg)
+            if m.group(2).lower() != actual:
+                self.error((0,), f"V5: @hash mismatch: canonical body hashes to ref:hash:sha256:{actual}")
+
+
+@register_rule
+class RidUnique(Rule):
+    name = "V6"
+    kinds = ("@rid",)
+
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.seen: set[str] = set()
+
+    def record(self, r: Record, seq: int) -> None:
+        low = r.rid.lower()
+        if low in self.seen:
+            self.error((seq,), f"V6: duplicate @rid: {r.rid}")
+        self.seen.add(low)
+
+
+@register_rule
+class DependencyCycle(Rule):
+    """V7. Errors in strict mode, warnings otherwise."""
+
+    name = "V7"
+
+    def start(self) -> None:
+        graph = self.validator.resolver or ThreadGraph()
+        for n, path in enumerate(graph.cycles(self.validator.msg)):
+            self.emit(self.validator.strict, (n,), f"V7: dependency cycle: {' -> '.join(path)}")
+
+
+@register_rule
+class BudgetCompliance(Rule):
+    """V8. Totals are kept per currency in `Validator.cost_totals`."""
+
+    name = "V8"
+    kinds = ("cost",)
+
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.budget: Optional[tuple[float, str]] = None
+        self.crossed = False
+
+    def start(self) -> None:
+        b = self.validator.msg.headers.get("budget")
+        if not b:
+            return
+        bm = _BUDGET.match(b)
+        if not bm:
+            self.error((), f"V8: invalid @budget format: {b}")
+        else:
+            self.budget = (float(bm.group(1)), bm.group(2))
+
+    def record(self, r: Record, seq: int) -> None:
+        cur = r.kv.get("cur")
+        if cur is None:
+            return
+        try:
+            val = float(r.kv.get("val", "0"))
         except ValueError:
-            res.errors.append(f"V2: #evid conf is not a number: {r.raw}")
-
-
-def _v3_refs(msg: Message, res: Result) -> None:
-    for r in msg.records:
-        if r.kind == "ref":
-            for v in r.kv.values():
-                if not (is_valid_ref(v) or is_sloc_ref(v)):
-                    res.errors.append(f"V3: invalid ref format: {v}")
-    deps = msg.headers.get("deps")
-    if deps:
-        for d in deps.split(","):
-            d = d.strip()
-            if not d or not (is_valid_ref(d) or is_sloc_ref(d) or _BARE_DEP.match(d)):
-                res.errors.append(f"V3: invalid @deps entry: {d!r}")
-    for k in ("p", "root", "parent"):
-        v = msg.headers.get(k)
-        if v and v.startswith("ref:") and not is_valid_ref(v):
-            res.errors.append(f"V3: invalid ref in @{k}: {v}")
-
-
-def _v6_rid_unique(msg: Message, res: Result) -> None:
-    seen: set[str] = set()
-    for r in msg.records:
-        if r.rid:
-            low = r.rid.lower()
-            if low in seen:
-                res.errors.append(f"V6: duplicate @rid: {r.rid}")
-            seen.add(low)
-
-
-def _v8_budget(msg: Message, res: Result) -> None:
-    b = msg.headers.get("budget")
-    if not b:
-        return
-    bm = _BUDGET.match(b)
-    if not bm:
-        res.errors.append(f"V8: invalid @budget format: {b}")
-        return
-    limit, cur = float(bm.group(1)), bm.group(2)
-    total = 0.0
-    for r in msg.records:
-        if r.kind == "cost" and r.kv.get("cur") == cur:
-            try:
-                total += float(r.kv.get("val", "0"))
-            except ValueError:
-                pass
-    if total > limit:
-        res.errors.append(f"V8: total cost {total} {cur} exceeds budget {limit} {cur}")
-
-
-def _v9_tool_chain(msg: Message, res: Result, strict: bool) -> None:
-    call_rids = {r.rid.lower() for r in msg.records if r.kind == "call" and r.rid}
-    for r in msg.records:
-        if r.kind == "call" and "tool" not in r.kv:
-            res.errors.append(f"V9: #call missing 'tool': {r.raw}")
-        elif r.kind == "ret":
-            if "call" not in r.kv:
-                res.errors.append(f"V9: #ret missing 'call': {r.raw}")
-            elif r.kv["call"].lower() not in call_rids:
-                _emit(res, strict, f"V9: #ret references unknown call '{r.kv['call']}': {r.raw}")
-            status = r.kv.get("status")
+            return
+        self._add(cur, val)
+
+    def columns(self, blk: ColumnarBlock, seq: int) -> bool:
+        pos = blk.index()
+        if pos is None:
+            return False
+        if "cur" not in pos:
+            return True
+        vp = pos.get("val")
+        vals, bad = blk.floats("val") if vp is not None else (None, ())
+        widths = blk.widths
+        for i, cur in enumerate(blk.values[pos["cur"]]):
+            if cur is None or i in bad:
+                continue
+            self._add(cur, 0.0 if vals is None or widths[i] <= vp else vals[i])
+        return True
+
+    def _add(self, cur: str, val: float) -> None:
+        totals = self.validator.cost_totals
+        total = totals[cur] = totals.get(cur, 0.0) + val
+        if self.validator.fail_fast and self.budget and not self.crossed:
+            limit, bcur = self.budget
+            if cur == bcur and total > limit:
+                self.crossed = True
+                self.validator._new.append(f"V8: total cost {total} {cur} exceeds budget {limit} {cur}")
+
+    def finish(self) -> None:
+        if self.budget is not None:
+            limit, cur = self.budget
+            total = self.validator.cost_totals.get(cur, 0.0)
+            if total > limit:
+                self.error((), f"V8: total cost {total} {cur} exceeds budget {limit} {cur}")
+
+
+@register_rule
+class ToolChain(Rule):
+    """V9. A `#ret` may precede its `#call`; orphans are settled at finish."""
+
+    name = "V9"
+    kinds = ("call", "ret", "think", "edit")
+
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.calls: set[str] = set()
+        self.orphans: dict[str, list[tuple[tuple, str]]] = {}
+
+    def record(self, r: Record, seq: int) -> None:
+        kind, kv = r.kind, r.kv
+        if kind == "call":
+            if r.rid:
+                low = r.rid.lower()
+                self.calls.add(low)
+                self.orphans.pop(low, None)
+            if "tool" not in kv:
+                self.error((seq,), f"V9: #call missing 'tool': {r.raw}")
+        elif kind == "ret":
+            if "call" not in kv:
+                self.error((seq,), f"V9: #ret missing 'call': {r.raw}")
+            elif kv["call"].lower() not in self.calls:
+                self.orphans.setdefault(kv["call"].lower(), []).append(
+                    ((seq, 0), f"V9: #ret references unknown call '{kv['call']}': {r.raw}"))
+            status = kv.get("status")
             if status is None:
-                res.errors.append(f"V9: #ret missing 'status': {r.raw}")
+                self.error((seq, 1), f"V9: #ret missing 'status': {r.raw}")
             elif status not in ("ok", "err"):
-                res.errors.append(f"V9: #ret status must be ok|err: {r.raw}")
-        elif r.kind == "think" and "summary" not in r.kv:
-            res.errors.append(f"V9: #think missing 'summary': {r.raw}")
-        elif r.kind == "edit":
-            if "file" not in r.kv:
-                res.errors.append(f"V9: #edit missing 'file': {r.raw}")
-            ch = r.kv.get("changes")
+                self.error((seq, 1), f"V9: #ret status must be ok|err: {r.raw}")
+        elif kind == "think":
+            if "summary" not in kv:
+                self.error((seq,), f"V9: #think missing 'summary': {r.raw}")
+        else:
+            if "file" not in kv:
+                self.error((seq, 0), f"V9: #edit missing 'file': {r.raw}")
+            ch = kv.get("changes")
             if ch is None or not ch.isdigit() or int(ch) < 1:
-                res.errors.append(f"V9: #edit 'changes' must be a positive integer: {r.raw}")
+                self.error((seq, 1), f"V9: #edit 'changes' must be a positive integer: {r.raw}")
 
+    def finish(self) -> None:
+        for pending in self.orphans.values():
+            for key, text in pending:
+                self.emit(self.validator.strict, key, text)
 
-def _v11_turn_markers(msg: Message, res: Result) -> None:
-    ids: set[str] = set()
-    refs: list[tuple[str, str]] = []
-    for r in msg.records:
+
+@register_rule
+class TurnMarkers(Rule):
+    """V11. `@m=`/`parent=` may name a marker declared later in the body."""
+
+    name = "V11"
+    kinds = ("marker", "@m")
+
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.turns: set[str] = set()
+        self.dangling: dict[str, list[tuple[tuple, str]]] = {}
+
+    def record(self, r: Record, seq: int) -> None:
         if r.kind == "marker":
-            if r.name in ids:
-                res.errors.append(f"V11: duplicate turn marker {r.name}")
-            ids.add(r.name)
+            if r.name in self.turns:
+                self.error((0, seq), f"V11: duplicate turn marker {r.name}")
+            self.turns.add(r.name)
+            self.dangling.pop(r.name, None)
             if r.parent and r.parent != "-":
-                refs.append((r.parent, "parent"))
+                self._ref(r.parent, "parent", (1, seq, 0))
         if r.m:
-            refs.append((r.m, "@m"))
-    if ids:
-        for ref_id, kind in refs:
-            if ref_id not in ids:
-                res.errors.append(f"V11: {kind}={ref_id} references undeclared turn marker")
+            self._ref(r.m, "@m", (1, seq, 1))
+
+    def _ref(self, ref_id: str, kind: str, key: tuple) -> None:
+        if ref_id not in self.turns:
+            self.dangling.setdefault(ref_id, []).append(
+                (key, f"V11: {kind}={ref_id} references undeclared turn marker"))
+
+    def finish(self) -> None:
+        if self.turns:
+            for pending in self.dangling.values():
+                for key, text in pending:
+                    self.error(key, text)
+
+
+@register_rule
+class ColumnarIntegrity(Rule):
+    name = "V12"
+    columnar = True
 
+    def __init__(self, validator: Validator, rank: int) -> None:
+        super().__init__(validator, rank)
+        self.malformed: set[int] = set()
 
-def _v12_columnar(msg: Message, res: Result) -> None:
-    for blk in msg.blocks:
+    def block(self, bi: int, blk: ColumnarBlock) -> None:
         label = f"#{blk.rtype}[{','.join(blk.columns)}]"
         if blk.rtype in COLUMNAR_FORBIDDEN:
-            res.errors.append(f"V12: columnar form not allowed for #{blk.rtype} (key is data): {label}")
-        if not blk.columns or any(not re.fullmatch(r"[a-z][a-z0-9_]*", c) for c in blk.columns):
-            res.errors.append(f"V12: malformed column list: {label}")
-            continue
-        if len(set(blk.columns)) != len(blk.columns):
-            res.errors.append(f"V12: duplicate column key in {label}")
-        if not blk.rows:
-            res.warnings.append(f"V12: columnar block has no rows: {label}")
-        for row in blk.rows:
-            if len(row) != len(blk.columns):
-                vals = " ".join(('"%s"' % v if q else v) for v, q in row)
-                res.errors.append(
-                    f"V12: row has {len(row)} field(s), expected {len(blk.columns)} for {label}: {vals}"
-                )
-
-
-def _emit(res: Result, as_error: bool, msg: str) -> None:
-    (res.errors if as_error else res.warnings).append(msg)
+            self.error((bi, 0, 0), f"V12: columnar form not allowed for #{blk.rtype} (key is data): {label}")
+        if not blk.columns or any(not _COL_KEY.fullmatch(c) for c in blk.columns):
+            self.error((bi, 0, 1), f"V12: malformed column list: {label}")
+            self.malformed.add(bi)
+        elif len(set(blk.columns)) != len(blk.columns):
+            self.error((bi, 0, 2), f"V12: duplicate column key in {label}")
+
+    def row(self, bi: int, ri: int, blk: ColumnarBlock) -> None:
+        width = blk.widths[ri]
+        if bi not in self.malformed and width != len(blk.columns):
+            label = f"#{blk.rtype}[{','.join(blk.columns)}]"
+            vals = " ".join(('"%s"' % v if q else v) for v, q in blk.cells(ri))
+            self.error((bi, 2, ri),
+                       f"V12: row has {width} field(s), expected {len(blk.columns)} for {label}: {vals}")
+
+    def finish(self) -> None:
+        for bi, blk in enumerate(self.validator.msg.blocks):
+            if bi not in self.malformed and not len(blk):
+                label = f"#{blk.rtype}[{','.join(blk.columns)}]"
+                self.warn((bi, 1), f"V12: columnar block has no rows: {label}")
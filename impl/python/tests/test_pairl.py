@@ -1,6 +1,17 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
 import unittest
 
-from pairl import canonicalize, compute_hash, parse, render, validate
+from pairl import (Archive, ArchiveWriter, CanonicalWriter, FrozenLegend, HashVerifier, LimitExceeded, MerkleTree,
+                   Message, QuoteIndex, Record, Renderer, Rule, Session, Stats, Store, StreamParser, ThreadGraph,
+                   ValidationError, Validator, aparse_stream, apply_delta, body_legend, canonicalize, compact,
+                   compute_hash, diff, fast_hash, hash_ref, instrument, merkle_root, parse, parse_stream,
+                   prove_records, render, rule_names, scan_buffer, scan_log, validate, verify_proof, verify_quotations)
+from pairl.legend import FIDELITY_RULES
 
 HEADER = "@v 1\n@id m1\n@ts 2026-06-22T10:00:00.000+02:00\n\n"
 
@@ -32,12 +43,156 @@ class TestParse(unittest.TestCase):
         self.assertTrue(all(r.kind == "evid" and r.from_columnar for r in m.records))
         self.assertEqual(m.records[0].kv, {"claim": "a b happened", "src": "s1", "conf": "0.85"})
 
+    def test_tokenizer_edge_cases(self):
+        from pairl.core import _parse_kvpairs, split_fields
+        self.assertEqual(split_fields('a  "b \\" c" "unterminated \\'),
+                         [("a", False), ('b " c', True), ("unterminated \\", True)])
+        self.assertEqual(split_fields('x"y ""z'), [('x"y', False), ("", True), ("z", False)])
+        self.assertEqual(_parse_kvpairs('bare a="x, \\"y\\""b=1,,c= =d'),
+                         {"a": 'x, "y"', "b": "1", "c": "", "": "d"})
+        self.assertEqual(_parse_kvpairs("req{t=x,l=2}", 4, 11), {"t": "x", "l": "2"})
+
+    def test_records_are_slotted_and_decode_lazily(self):
+        from pairl import Record
+        m = msg('#fact k="a b" @rid=f1\n#evid[claim,src,conf]\n"x" s1 0.5\n')
+        fact, evid = m.records
+        self.assertFalse(hasattr(fact, "__dict__"))
+        self.assertIsNone(fact._kv)
+        self.assertEqual(fact.kv, {"k": "a b"})
+        self.assertEqual(evid.kv, {"claim": "x", "src": "s1", "conf": "0.5"})
+        self.assertIs(fact.kind, msg("#fact z=1\n").records[0].kind)
+        self.assertEqual(fact, Record(kind="fact", name="fact", kv={"k": "a b"}, rid="f1",
+                                      raw='#fact k="a b" @rid=f1'))
+        fact.kv = {"k": "c"}
+        self.assertEqual(fact.kv, {"k": "c"})
+
+    def test_columnar_rows_stay_in_column_store(self):
+        m = msg('#cost[item,val,cur]\nsearch 0.25 USD @rid=c1\n"fetch page" x USD\nshort\n#fact a=1\n')
+        blk = m.blocks[0]
+        self.assertEqual(blk.values, [["search", "fetch page", "short"], ["0.25", "x", None],
+                                      ["USD", "USD", None]])
+        self.assertEqual(blk.rows[1], [("fetch page", True), ("x", False), ("USD", False)])
+        vals, bad = blk.floats("val")
+        self.assertEqual((vals[0], bad), (0.25, {1}))
+        self.assertEqual([r.rid for r in m.iter_records()], ["c1", None, None, None])
+        validate(m)
+        canonicalize(m)
+        self.assertIs(m.body()[0], blk)  # nothing expanded the rows yet
+        self.assertEqual(m.records[2].kv, {"item": "short"})
+        self.assertIsNot(m.body()[0], blk)
+
     def test_turn_markers(self):
         m = msg("#u1\nreq{t=x} @rid=a1\n#a2\nack{t=x} @rid=a2\n")
         markers = [r for r in m.records if r.kind == "marker"]
         self.assertEqual([mk.name for mk in markers], ["u1", "a2"])
 
 
+class TestMessageIndex(unittest.TestCase):
+    BODY = ("#u1\nreq{t=x} @rid=A1\n#evid claim=x src=s1 conf=0.5 @rid=e1\n#a2\n#call tool=g @rid=c1\n"
+            "#ret call=C1 status=ok\n#evid claim=y src=s2 conf=1 @m=u1\n#evid[claim,src,conf]\nz s3 0.2\n")
+
+    def test_lookups(self):
+        m = msg(self.BODY)
+        self.assertEqual(m.by_rid("a1").name, "req")
+        self.assertIsNone(m.by_rid("a9"))
+        self.assertEqual([r.kv["src"] for r in m.of_kind("evid")], ["s1", "s2", "s3"])
+        self.assertEqual([r.kv["src"] for r in m.turn("u1", "evid")], ["s1", "s2"])
+        self.assertEqual([r.kv["src"] for r in m.turn("a2", "evid")], ["s3"])
+        self.assertEqual(m.turn_span("a2"), (4, 8))
+        self.assertEqual(m.call_of(m.of_kind("ret")[0]).kv["tool"], "g")
+        self.assertEqual(len(m.intents("req")), 1)
+        self.assertEqual(m.turn("u9"), [])
+
+    def test_appends_are_indexed(self):
+        s = Session.from_message(msg(self.BODY))
+        m = s.message
+        self.assertEqual(m.turn_span("a2"), (4, 8))
+        s.append("#u3\n#fact k=v @rid=F1\n#ret call=c1 status=err @m=a2\n")
+        self.assertEqual(m.by_rid("f1").kv, {"k": "v"})
+        self.assertEqual(m.turn_span("a2"), (4, 8))
+        self.assertEqual(len(m.turn("a2", "ret")), 2)
+        self.assertEqual(m.turn("u3"), [m.by_rid("f1")])
+        m.records = m.records[:2]
+        self.assertIsNone(m.by_rid("f1"))
+        self.assertEqual(m.of_kind("marker"), [m.records[0]])
+
+
+class TestLimits(unittest.TestCase):
+    def test_trailing_tags_linear(self):
+        m = msg("#fact k=v" + " @rid=x" * 20000 + "   @m=u1 \n")
+        self.assertEqual((m.records[0].kv, m.records[0].rid, m.records[0].m), ({"k": "v"}, "x", "u1"))
+
+    def test_limits_stop_early(self):
+        body = "#u1\n" + "".join(f"#fact k{i}=v\n" for i in range(100))
+        for kw, limit in [({"max_records": 10}, "max_records"), ({"max_line_len": 8}, "max_line_len"),
+                          ({"max_size_bytes": 200}, "max_size_bytes")]:
+            with self.assertRaises(LimitExceeded) as cm:
+                parse(HEADER + body, **kw)
+            self.assertEqual(cm.exception.limit, limit)
+        self.assertEqual(len(parse(HEADER + body, max_records=101).records), 101)
+        p = StreamParser(max_line_len=64)
+        with self.assertRaises(LimitExceeded):
+            for _ in range(10):
+                p.feed("x" * 10)  # one unterminated line
+
+    def test_rule_limits(self):
+        body = "#u1\n#rule max_records=4\n#cost[val,cur]\n1 USD\n2 USD\n3 USD\n"
+        self.assertEqual(len(msg(body).records), 5)
+        with self.assertRaises(LimitExceeded) as cm:
+            parse(HEADER + body, rule_limits=True)
+        self.assertEqual((cm.exception.value, cm.exception.bound), (5, 4))
+        with self.assertRaises(LimitExceeded) as cm:
+            parse(HEADER + body, max_records=2, rule_limits=True)  # a #rule never loosens a limit
+        self.assertEqual((cm.exception.value, cm.exception.bound), (3, 2))
+
+
+
+class TestStreamParse(unittest.TestCase):
+    TEXT = (HEADER + '#u1\nreq{t=x} @rid=a1\n#evid[claim,src,conf]\n"a b" s1 0.5\n"c" s2 0.6\n'
+            "#fact k=\"v é\" @m=u1\n")
+
+    def test_records_arrive_as_lines_complete(self):
+        chunks = [self.TEXT[:20], self.TEXT[20:60], self.TEXT[60:90], self.TEXT[90:]]
+        it = parse_stream(iter(chunks))
+        first = next(it)
+        self.assertIsInstance(first, Message)
+        self.assertEqual(first.headers["id"], "m1")
+        rest = list(it)
+        full = parse(self.TEXT)
+        self.assertEqual(rest, full.records)
+        self.assertEqual(first, full)
+
+    def test_columnar_rows_yield_before_block_ends(self):
+        p = StreamParser()
+        p.feed(HEADER + "#quota[type,total]\ntokens 10\napi")
+        self.assertEqual([r.kv for r in p.feed("_calls 5\n")], [{"type": "api_calls", "total": "5"}])
+        self.assertEqual(len(p.message.blocks[0].rows), 2)
+        self.assertEqual(p.close(), [])
+
+    def test_bytes_split_inside_utf8_sequence(self):
+        data = self.TEXT.encode()
+        cut = data.index("é".encode()) + 1
+        items = list(parse_stream([data[:cut], data[cut:]]))
+        self.assertEqual(items[0], parse(self.TEXT))
+
+    def test_async_token_stream(self):
+        async def tokens():
+            for i in range(0, len(self.TEXT), 3):
+                yield self.TEXT[i:i + 3]
+
+        async def collect():
+            return [x async for x in aparse_stream(tokens())]
+
+        items = asyncio.run(collect())
+        self.assertEqual(items[1:], parse(self.TEXT).records)
+
+    def test_missing_separator_matches_parse(self):
+        for text in ("@v 1\n@id m1\n\n\n", "#fact a=1\n", ""):
+            items = list(parse_stream([text]))
+            self.assertEqual(items[0], parse(text))
+            self.assertTrue(items[0].errors)
+
+
 class TestValidate(unittest.TestCase):
     def test_valid_message(self):
         m = msg("#evid claim=\"x happened\" src=s1 conf=0.5\n#ref s1=ref:url:ap:2026-01-01\n")
@@ -74,6 +229,31 @@ class TestValidate(unittest.TestCase):
         self.assertFalse(r.valid)
         self.assertTrue(any("V8" in e for e in r.errors))
 
+    def test_columnar_blocks_checked_column_wide(self):
+        body = ('#u1\n#evid[claim,src,conf]\n"a" s1 0.5\n"b" s2 1.5\n"c" s3 nan\n"d" s4 high @m=u1\n"e" s5\n'
+                "#cost[val,cur]\n0.25 USD\n0.5 USD\nx USD\n")
+        head = HEADER.replace("\n\n", "\n@budget 0.5USD\n\n")
+        col = parse(head + body)
+        rows = parse(head + body)
+        rows.records  # noqa: B018 - expanded: every row is checked as a record
+        v = Validator(col)
+        v.feed_many(col.body())
+        res = v.finish()
+        self.assertEqual(res.errors, validate(rows).errors)
+        self.assertEqual(v.cost_totals, {"USD": 0.75})
+        self.assertEqual([e[:20] for e in res.errors[:4]],
+                         ["V2: #evid conf must ", "V2: #evid conf must ", "V2: #evid conf is no",
+                          "V2: #evid missing co"])
+
+    def test_hash_header_is_verified(self):
+        body = "#fact a=1 @rid=f1\n"
+        good = parse(HEADER.replace("\n\n", f"\n@hash {hash_ref(msg(body))}\n\n") + body)
+        self.assertTrue(validate(good).valid)
+        bad = parse(HEADER.replace("\n\n", f"\n@hash {hash_ref(msg(body))}\n\n") + "#fact a=2 @rid=f1\n")
+        self.assertTrue(validate(bad).errors[0].startswith("V5: @hash mismatch"))
+        junk = parse(HEADER.replace("\n\n", "\n@hash abc\n\n") + body)
+        self.assertTrue(validate(junk).errors[0].startswith("V5: invalid @hash"))
+
     def test_dangling_turn_ref(self):
         m = msg("#u1\nreq{t=x} @rid=a1\n#fact k=v @m=a9 @rid=f1\n")
         r = validate(m)
@@ -81,6 +261,73 @@ class TestValidate(unittest.TestCase):
         self.assertTrue(any("V11" in e for e in r.errors))
 
 
+class TestStreamValidate(unittest.TestCase):
+    def stream(self, body, **kw):
+        it = parse_stream([HEADER + body])
+        v = Validator(next(it), **kw)
+        return v, it
+
+    def test_matches_validate(self):
+        body = ("#ret call=c1 status=ok @m=u1\n#u1\n#call tool=x @rid=c1\n"
+                "req{t=x1} @rid=a1\n#rule no_new_facts=true\n#evid[claim,src]\n\"x\" s1\n")
+        for strict in (False, True):
+            v, it = self.stream(body, strict=strict)
+            new = [v.feed(r) for r in it]
+            self.assertEqual(new[0], [])  # forward #ret and @m= refs are not errors yet
+            res = v.finish()
+            ref = validate(msg(body), strict=strict)
+            self.assertEqual((res.errors, res.warnings), (ref.errors, ref.warnings))
+
+    def test_fail_fast_stops_at_first_hard_error(self):
+        v, it = self.stream("#fact a=1 @rid=f1\n#fact b=2 @rid=F1\n#fact c=3\n", fail_fast=True)
+        v.feed(next(it))
+        with self.assertRaises(ValidationError) as cm:
+            v.feed(next(it))
+        self.assertEqual(str(cm.exception), "V6: duplicate @rid: F1")
+        self.assertFalse(cm.exception.result.valid)
+
+    def test_fail_fast_on_budget_crossing(self):
+        it = parse_stream([HEADER.replace("\n\n", "\n@budget 0.5USD\n\n"),
+                           "#cost val=0.3 cur=USD\n#cost val=0.3 cur=USD\n"])
+        v = Validator(next(it), fail_fast=True)
+        v.feed(next(it))
+        self.assertEqual(v.cost_totals, {"USD": 0.3})
+        with self.assertRaises(ValidationError):
+            v.feed(next(it))
+
+
+class TestRuleRegistry(unittest.TestCase):
+    BODY = ("req{t=x1} @rid=a1\n#evid claim=x src=s1 conf=7 @rid=a1\n#ret call=c9 status=ok\n"
+            "#fact k=v @m=u9\n")
+
+    def test_builtin_order(self):
+        self.assertEqual(rule_names(), ["headers", "V1", "V2", "V3", "V4", "V5", "V6", "V7", "V8", "V9", "V11",
+                                         "V12"])
+
+    def test_subset_and_skip(self):
+        full = validate(msg(self.BODY))
+        hot = validate(msg(self.BODY), rules=("V9", "V2", "V6"))
+        self.assertEqual(hot.errors, [e for e in full.errors if e[:3] in ("V2:", "V6:")])
+        self.assertEqual(hot.warnings, [w for w in full.warnings if w.startswith("V9")])
+        skipped = validate(msg(self.BODY), skip=("V1",))
+        self.assertEqual(skipped.warnings, [w for w in full.warnings if not w.startswith("V1")])
+        with self.assertRaises(ValueError):
+            validate(msg(self.BODY), rules=("V99",))
+
+    def test_custom_rule(self):
+        class FactKeys(Rule):
+            name = "X1"
+            kinds = ("fact",)
+
+            def record(self, r, seq):
+                for k in r.kv:
+                    if not k.islower():
+                        self.error((seq,), f"X1: fact key must be lowercase: {k}")
+
+        res = validate(msg("#fact Bad=1\n#fact ok=2\n"), rules=(*rule_names(), FactKeys))
+        self.assertEqual(res.errors, ["X1: fact key must be lowercase: Bad"])
+
+
 class TestCanonicalAndHash(unittest.TestCase):
     def test_columnar_and_kv_hash_identically(self):
         kv = msg('#evid claim="a b" src=s1 conf=0.5\n#evid claim="c d" src=s2 conf=0.6\n')
@@ -91,10 +338,392 @@ class TestCanonicalAndHash(unittest.TestCase):
         m = msg("#fact a=1\n")
         self.assertEqual(compute_hash(m), compute_hash(parse(canonicalize(m, for_hash=False))))
 
+    def test_writer_streams_to_several_sinks(self):
+        import hashlib
+        m = parse(HEADER.replace("\n\n", "\n@hash x\n\n") + '#u1\n#evid[claim,src,conf]\n"é b" s1 0.5\n'
+                  '#fact k="" @m=u1\n')
+        buf, h = io.BytesIO(), hashlib.sha256()
+        w = CanonicalWriter(buf, h, buffer_size=8)
+        w.write_message(m, for_hash=False)
+        self.assertEqual(buf.getvalue().decode(), canonicalize(m, for_hash=False))
+        self.assertEqual(h.hexdigest(), hashlib.sha256(buf.getvalue()).hexdigest())
+        self.assertEqual(compute_hash(m), hashlib.sha256(canonicalize(m).encode()).hexdigest())
+        with self.assertRaises(TypeError):
+            CanonicalWriter(object())
+
+    def test_fast_hash_only_for_canonical_input(self):
+        text = HEADER.replace("\n\n", "\n@hash x\n@zz 1\n\n") + ('#u1\nreq{t=a,s="b c"} @rid=a1\n'
+                                                                '#fact k="q \\"x\\"" n=1 @m=u1 @rid=f1\n#s go on\n')
+        self.assertEqual(fast_hash(text), compute_hash(parse(text)))
+        self.assertEqual(fast_hash(text.encode()), compute_hash(parse(text)))
+        for before, after in (("@v 1\n@id m1", "@id m1\n@v 1"), ('"b c"', '"bc"'), ("n=1", "n=1 k=2"),
+                              ("#s go on", "#evid[claim,src,conf]\nx s1 0.5"), ("req{t=a,", "req{ t=a,"),
+                              ("#s go on\n", "#s go on")):
+            changed = text.replace(before, after)
+            self.assertIsNone(fast_hash(changed), after)
+            self.assertNotEqual(canonicalize(parse(changed)), changed.replace("@hash x\n", ""))
+
+    def test_fast_hash_matches_full_path(self):
+        for text in ("@v 1.6\n@id m1\n@ts 1\n@x 1\n@x 2\n\n#fact a=1\n", "@v 1\n@v 2\n@id m1\n\n#fact a=1\n",
+                     "@hash ref:hash:sha256:00\n\n", "@hash ref:hash:sha256:00\n\n#fact a=1\n"):
+            self.assertIn(fast_hash(text), (None, compute_hash(parse(text))), text)
+            if "@hash" not in text:
+                signed = text.replace("\n", f"\n@hash {hash_ref(parse(text))}\n", 1)
+                self.assertTrue(HashVerifier().verify(signed), text)
+        self.assertEqual(fast_hash("@hash ref:hash:sha256:00\n\n"), compute_hash(parse("\n")))
+
+    def test_verifier_counts_fast_path(self):
+        body = "#fact a=1 @rid=f1\n"
+        signed = HEADER.replace("\n\n", f"\n@hash {hash_ref(msg(body))}\n\n") + body
+        hv = HashVerifier()
+        self.assertTrue(hv.verify(signed))
+        self.assertTrue(hv.verify(signed.replace("a=1", 'a="1"')))  # not canonical, same hash
+        self.assertFalse(hv.verify(signed.replace("a=1", "a=2").encode()))
+        self.assertIsNone(hv.verify(HEADER + body))  # nothing compared, not counted
+        self.assertEqual((hv.fast, hv.full), (2, 1))
+
     def test_hash_hex_length(self):
         self.assertEqual(len(compute_hash(msg("#fact a=1\n"))), 64)
 
 
+class TestMerkle(unittest.TestCase):
+    def test_record_and_range_proofs(self):
+        facts = "".join(f"#fact k={i} @rid=f{i}\n" for i in range(12))
+        m = msg("#u1\n" + facts + '#evid[claim,src,conf]\n"x y" s1 0.5\n')
+        root = merkle_root(m)
+        self.assertEqual(root, merkle_root(parse(canonicalize(m, for_hash=False))))
+        self.assertNotEqual(root, compute_hash(m))
+        for first, last in (("f0", None), ("F3", "f9"), ("f11", "f11")):
+            lines, proof = prove_records(m, first, last)
+            self.assertEqual(lines[0], f"#fact k={first[1:]} @rid=f{first[1:]}")
+            self.assertTrue(verify_proof(root, lines, proof))
+            self.assertLessEqual(len(proof.hashes), 2 * 4)
+            self.assertFalse(verify_proof(root, [ln.replace("k=", "k=9") for ln in lines], proof))
+            self.assertFalse(verify_proof(root, lines[1:], proof))
+        with self.assertRaises(KeyError):
+            prove_records(m, "nope")
+        with self.assertRaises(ValueError):
+            prove_records(m, "f5", "f2")
+
+    def test_incremental_tree_matches_rebuild(self):
+        s = Session(parse(HEADER).headers)
+        s.append("#fact a=1 @rid=f1\n")
+        tree = s.merkle()
+        for i in range(2, 40):
+            s.append(f"#fact a={i} @rid=f{i}\n")
+            self.assertEqual(tree.root(), merkle_root(s.message))
+        tree.update(5, "#fact a=changed @rid=f5")
+        s.message.records[4] = parse(HEADER + "#fact a=changed @rid=f5\n").records[0]
+        self.assertEqual(tree.root(), MerkleTree.from_message(s.message).root())
+        with self.assertRaises(IndexError):
+            tree.prove(3, 3)
+
+
+class TestDiff(unittest.TestCase):
+    def test_delta_reproduces_target_hash(self):
+        a = msg("#u1\n" + "".join(f"#fact k={i} @rid=f{i}\n" for i in range(20))
+                + '#evid[claim,src,conf]\n"x y" s1 0.5\n"z" s2 0.6\n#rule lang=en\n')
+        b = parse(canonicalize(a).replace("@id m1", "@id m2").replace("k=3 ", "k=33 ")
+                  .replace("#fact k=7 @rid=f7\n", "").replace("#rule", "#fact new=1\n#rule"))
+        delta = diff(a, b)
+        self.assertIn("~#fact k=33 @rid=f3\n=3\n-1\n", delta)
+        self.assertIn("@id m2\n", delta)
+        self.assertIn("+#fact new=1\n", delta)
+        self.assertEqual(compute_hash(apply_delta(a, delta)), compute_hash(b))
+        self.assertEqual(diff(a, a).count("\n"), 2)  # !base and !hash only
+        swapped = parse(canonicalize(b).replace("#u1\n", "").replace("#rule lang=en", "#rule lang=en\n#u1"))
+        self.assertEqual(compute_hash(apply_delta(b, diff(b, swapped))), compute_hash(swapped))
+
+    def test_bad_deltas_are_rejected(self):
+        a, b = msg("#fact a=1 @rid=f1\n"), msg("#fact a=2 @rid=f1\n")
+        delta = diff(a, b)
+        self.assertTrue(delta.endswith("\n~#fact a=2 @rid=f1\n"))
+        for bad in (delta.replace("~", "?"), delta.replace("~#fact a=2 @rid=f1", "=5"), "=x\n"):
+            with self.assertRaises(ValueError):
+                apply_delta(a, bad)
+        with self.assertRaises(ValueError):
+            apply_delta(b, delta)
+        self.assertEqual(compute_hash(apply_delta(b, delta, verify=False)), compute_hash(b))
+
+
+class TestSession(unittest.TestCase):
+    def test_appends_match_full_recanonicalization(self):
+        s = Session.from_message(msg("#u1\n#req content=\"plan it\" @rid=h1\n"))
+        s.append('#a2\n#evid[claim,src,conf]\n"x y" s1 0.5 @rid=e1\n')
+        s.append([parse(HEADER + "#fact k=v @rid=f1\n").records[0]])
+        full = parse(s.canonical())
+        self.assertEqual(s.canonical(), canonicalize(s.message))
+        self.assertEqual(s.hash(), compute_hash(s.message))
+        self.assertEqual(s.hash(), compute_hash(full))
+        blocks = s.content_blocks()
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual("".join(blocks), s.canonical())
+        self.assertTrue(blocks[0].startswith("@v 1\n@id m1\n") and blocks[2] == "#fact k=v @rid=f1\n")
+
+    def test_rid_reuse_across_body_is_rejected(self):
+        s = Session(parse(HEADER).headers)
+        s.append("#fact a=1 @rid=f1\n")
+        before = (s.hash(), s.content_blocks())
+        with self.assertRaises(ValidationError) as cm:
+            s.append("#fact b=2 @rid=f2\n#fact c=3 @rid=F1\n")
+        self.assertEqual(str(cm.exception), "V6: duplicate @rid: F1")
+        self.assertEqual((s.hash(), s.content_blocks(), len(s)), (*before, 1))
+        with self.assertRaises(TypeError):
+            s.headers["ts"] = "later"
+
+    def test_empty_headers(self):
+        s = Session({})
+        self.assertEqual((s.canonical(), s.hash()), (canonicalize(s.message), compute_hash(s.message)))
+        s.append("#fact a=1 @rid=f1\n")
+        self.assertEqual((s.canonical(), s.hash()), (canonicalize(s.message), compute_hash(s.message)))
+        self.assertEqual(s.merkle().root(), merkle_root(s.message))
+
+
+def threaded(mid: str, body: str = "#u1\n", **headers: str):
+    head = "".join(f"@{k} {v}\n" for k, v in headers.items())
+    return parse(f"@v 1\n@id {mid}\n@sid ref:sess:s1\n@ts 2026-06-22T10:00:00Z\n{head}\n{body}")
+
+
+class TestThreadGraph(unittest.TestCase):
+    def test_resolves_local_record_and_qualified_refs(self):
+        g = ThreadGraph()
+        g.add(threaded("m1", "#u1\nreq{t=x} @rid=A2\n"))
+        g.add(parse("@v 1.3\n@mid 01JB\n@ts t\n\n#u1\n"))
+        self.assertEqual(len(g), 2)
+        self.assertEqual(g.resolve("@m1"), ("s1", "m1"))
+        self.assertEqual(g.resolve("@m1#a2"), ("s1", "m1"))
+        self.assertIsNone(g.resolve("@m1#a3"))
+        self.assertEqual(g.resolve("ref:msg:s1:m1#a2"), ("s1", "m1"))
+        self.assertIsNone(g.resolve("@m1", sid="s2"))
+        self.assertEqual(g.resolve("ref:msg:01JB"), ("s1", "01JB"))  # v1.3: no @sid, inherits the thread's
+        self.assertIsNone(g.resolve("ref:msg:s1:m9"))
+        with self.assertRaises(ValueError):
+            g.add(threaded("m1"))
+
+    def test_cycles_found_in_any_arrival_order(self):
+        g = ThreadGraph()
+        self.assertEqual(g.add(threaded("m3", p="m2")), [])
+        self.assertEqual(g.add(threaded("m2", p="m1", deps="@m1,ref:msg:s1:m1")), [])
+        self.assertEqual(g.add(threaded("m4", p="m3")), [])
+        self.assertEqual(g.parents(("s1", "m2")), [("s1", "m1")])
+        self.assertNotIn(("s1", "m1"), g)
+        closing = threaded("m1", p="m4")
+        self.assertEqual(g.cycles(closing), [["m1", "m4", "m3", "m2", "m1"]])
+        self.assertEqual(g.add(closing), [["m1", "m4", "m3", "m2", "m1"]])
+        self.assertEqual(g.cycles(closing), [["m1", "m4", "m3", "m2", "m1"]])
+        self.assertEqual(g.parents(("s1", "m1")), [])  # the closing edge is not added
+        self.assertEqual(g.add(threaded("m5", p="m1", deps="@m4")), [])
+
+    def test_validate_with_resolver(self):
+        g = ThreadGraph()
+        g.add(threaded("m1"))
+        g.add(threaded("m2", p="m3"))
+        self.assertTrue(validate(threaded("m4", p="m1"), resolver=g).valid)
+        self.assertEqual(validate(threaded("m4", p="m9"), resolver=g).errors,
+                         ["V4: parent not found in thread: m9"])
+        self.assertTrue(validate(threaded("m4", p="m9")).valid)  # no resolver: V4 is not checked
+        loop = threaded("m3", p="m1", deps="@m2")
+        self.assertEqual(validate(loop, resolver=g).warnings, ["V7: dependency cycle: m3 -> m2 -> m3"])
+        self.assertEqual(validate(loop, strict=True, resolver=g).errors, ["V7: dependency cycle: m3 -> m2 -> m3"])
+        self.assertEqual(validate(threaded("m7", p="m7")).warnings, ["V7: dependency cycle: m7 -> m7"])
+
+
+class TestStore(unittest.TestCase):
+    def messages(self, n):
+        return [threaded(f"m{i}", f'#u1\nreq{{t=x,s="item {i}"}} @rid=a1\n#evid[claim,src,conf]\n"c {i}" s1 0.5 @rid=E{i}\n')
+                for i in range(n)]
+
+    def test_lookups_survive_reopen(self):
+        msgs = self.messages(40)
+        with tempfile.TemporaryDirectory() as d:
+            with Store(d, segment_size=1024) as s:
+                digests = s.extend(msgs[:30])
+                digests += [s.append(canonicalize(m, for_hash=False)) for m in msgs[30:]]
+                self.assertEqual(s.append(msgs[3]), digests[3])  # same content: stored once
+                with self.assertRaises(ValueError):
+                    s.append(threaded("m3"))
+            self.assertGreater(len([n for n in os.listdir(d) if n.endswith(".seg")]), 1)
+            with Store(d) as s:
+                self.assertEqual(len(s), 40)
+                self.assertEqual(digests[7], compute_hash(msgs[7]))
+                self.assertEqual(canonicalize(s.get(digests[7])), canonicalize(msgs[7]))
+                self.assertEqual(s.get(("ref:sess:s1", "m8")).msg_id, "m8")
+                self.assertEqual(s.digest(("s1", "m8")), digests[8])
+                self.assertEqual(bytes(s.raw(f"ref:hash:sha256:{digests[9]}")).decode(),
+                                 canonicalize(msgs[9], for_hash=False))
+                self.assertEqual(s.record("s1", "m5", "e5").kv, {"claim": "c 5", "src": "s1", "conf": "0.5"})
+                self.assertIsNone(s.record("s1", "m5", "e6"))
+                self.assertNotIn(("s1", "m40"), s)
+                self.assertIsNone(s.get("00" * 32))
+                self.assertNotIn("zz", s)
+                self.assertIsNone(s.get("ref:hash:sha256:not-hex"))
+
+    def test_torn_tail_and_lost_index_recover(self):
+        msgs = self.messages(5)
+        with tempfile.TemporaryDirectory() as d:
+            with Store(d) as s:
+                digests = s.extend(msgs)
+            with open(os.path.join(d, "00000000.seg"), "ab") as f:
+                f.write(b"\xff\x00\x00\x00torn")
+            os.remove(os.path.join(d, "rid.idx"))
+            with Store(d) as s:
+                self.assertEqual(os.path.getsize(os.path.join(d, "00000000.seg")),
+                                 sum(len(s.raw(x)) + 40 for x in digests))
+                self.assertEqual(s.record("s1", "m4", "a1").name, "req")
+                self.assertEqual(s.append(msgs[0]), digests[0])
+                s.append(threaded("m5"))
+                self.assertEqual(len(s), 6)
+
+    def test_log_cut_mid_frame_recovers(self):
+        msgs = self.messages(10)
+        with tempfile.TemporaryDirectory() as d:
+            with Store(d) as s:
+                digests = s.extend(msgs)
+            seg = os.path.join(d, "00000000.seg")
+            os.truncate(seg, os.path.getsize(seg) - 3)  # the indexes already hold the last frame
+            with Store(d) as s:
+                self.assertEqual(len(s), 9)
+                self.assertEqual([x in s for x in digests], [True] * 9 + [False])
+                self.assertIsNone(s.get(("s1", "m9")))
+                self.assertEqual(s.record("s1", "m8", "e8").kv["claim"], "c 8")
+                self.assertEqual(s.append(msgs[9]), digests[9])
+            with Store(d) as s:
+                self.assertEqual(s.digest(("s1", "m9")), digests[9])
+
+
+class TestArchive(unittest.TestCase):
+    def test_frames_and_recovery(self):
+        texts = [HEADER.replace("m1", f"m{i}") + f"#u1\nreq{{t=x{i}}}\n#evid claim=c src=s{i} conf=0.5\n"
+                 for i in range(20)]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "a.pza")
+            with ArchiveWriter(path) as w:
+                self.assertEqual(w.extend(texts[:10]), list(range(10)))
+            with ArchiveWriter(path) as w:  # reopened: appends after the old frames
+                w.append(msg("#fact k=v\n"))
+                w.extend(texts[10:])
+            with Archive(path) as a:
+                self.assertEqual(len(a), 21)
+                self.assertEqual(a.raw(3).decode(), texts[3])
+                self.assertEqual(compute_hash(a.get(10)), compute_hash(msg("#fact k=v\n")))
+            with open(path, "r+b") as f:  # drop the index and tear the last frame
+                f.truncate(os.path.getsize(path) - 8 * 21 - 24 - 5)
+            with Archive(path) as a:
+                self.assertEqual((len(a), a.raw(19).decode()), (20, texts[18]))
+
+    def test_trained_dictionary(self):
+        from pairl.archive import DEFAULT_DICTIONARY, build_dictionary
+        sample = [HEADER + f"#rule lang=de\n#quota type=tokens total=900 used={i} rem={900 - i}\n" for i in range(9)]
+        zdict = build_dictionary(sample, size=4096)
+        self.assertTrue(zdict.endswith(DEFAULT_DICTIONARY) and len(zdict) <= 4096)
+        self.assertIn(b"\n#rule lang=de", zdict)
+
+    def test_reopen_checks_dictionary_and_empty_file(self):
+        from pairl.archive import DEFAULT_DICTIONARY
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "a.pza")
+            open(path, "wb").close()
+            with self.assertRaisesRegex(ValueError, "not a PAIRL archive"):
+                Archive(path)
+            with ArchiveWriter(path, dictionary=b"custom words") as w:
+                w.append(msg("#fact k=v\n"))
+            with self.assertRaises(ValueError):
+                ArchiveWriter(path, dictionary=DEFAULT_DICTIONARY)
+            with ArchiveWriter(path, dictionary=b"custom words") as w:
+                w.append(msg("#fact k=w\n"))
+            with Archive(path) as a:
+                self.assertEqual((len(a), a.dictionary), (2, b"custom words"))
+
+
+class TestLegend(unittest.TestCase):
+    def test_explains_constructs_in_order(self):
+        m = msg('#u1\n#req content="fix it" @rid=h1\n#a2\nwrn{t=risk} @rid=a1\n>>>\n#bogus x=1\n<<<\n'
+                "#call tool=grep q=x @rid=c1\n#fact k=v @m=u1\n#evid[claim,src,conf]\nc s1 0.5\n")
+        lg = body_legend(m)
+        self.assertEqual(lg.constructs, ("turn:u", "#req", "turn:a", "intent:wrn", "#call", "@m=", "#fact",
+                                         "columnar", "#evid"))
+        lines = lg.text.split("\n")
+        self.assertEqual(lines[-1], FIDELITY_RULES)
+        self.assertEqual([ln.split(" ", 1)[0] for ln in lines[1:-1]],
+                         ["Turn", "@m=<turn>", "Intents", "#req", "#call", "#fact", "#evid", "#type[k1,k2,…]", "Tool"])
+        self.assertIn("[...] marks omitted text", lines[4])
+        self.assertIs(body_legend(msg('#u1\n#req content="other" @rid=h1\n#a2\nwrn{t=x}\n#call tool=y\n'
+                                      "#fact a=b @m=u1\n#evid[claim,src,conf]\nd s2 0.7\n")).text, lg.text)
+
+    def test_falls_back_on_unexplained_constructs(self):
+        lg = body_legend(msg("#fact k=v\norg.acme.x{t=a}\nloose words here\n#foo a=1\n"))
+        self.assertIsNone(lg.text)
+        self.assertEqual(lg.unexplained, ("unknown intent: org.acme.x", "free text: loose words here",
+                                          "unknown record type: #foo"))
+        self.assertEqual(lg.preamble("SPEC"), "SPEC")
+
+    def test_frozen_legend_and_addendum(self):
+        s = Session.from_message(msg("#u1\nreq{t=x} @rid=a1\n#fact k=v @rid=f1\n"))
+        fl = FrozenLegend(s.message)
+        frozen = fl.text
+        self.assertEqual(fl.addendum().text, "")
+        fl.feed(s.append("#a2\npln{t=y} @rid=a2\n#fact j=w @rid=f2\n#ret call=a1 status=ok @rid=r1\n"))
+        add = fl.addendum()
+        self.assertEqual(add.constructs, ("turn:a", "intent:pln", "#ret"))
+        self.assertEqual(add.text.split("\n")[:2], ["#aN = assistant turn N", "More intents: pln=plan/next steps"])
+        self.assertNotIn(FIDELITY_RULES, add.text)
+        self.assertEqual(fl.text, frozen)
+        fl.feed(s.append("#zz a=1\n"))
+        self.assertIsNone(fl.addendum().text)
+
+
+class TestCompact(unittest.TestCase):
+    def test_runs_become_blocks_within_turns(self):
+        m = msg('#u1\n#evid claim="a b" src=s1 conf=0.5\n#evid claim=c src=s2 conf=0.9 @m=u1 @rid=e2\n'
+                '#a2\n#evid claim=d src=s3 conf=1\n#cost val=1 cur=USD\n#cost val=2 cur=USD\nack{t=x}\n'
+                '#quota type=t total=5 used=1 rem=4\n#quota type=u total=9 used=1 rem=8\n')
+        out = compact(m)
+        self.assertEqual(out.split("\n\n", 1)[1],
+                         '#u1\n#evid[claim,src,conf]\n"a b" s1 0.5\nc s2 0.9 @m=u1 @rid=e2\n#a2\n'
+                         '#evid claim=d src=s3 conf=1\n#cost[val,cur]\n1 USD\n2 USD\n---\nack{t=x}\n'
+                         '#quota[type,total,used,rem]\nt 5 1 4\nu 9 1 8\n')
+        self.assertEqual(compute_hash(parse(out)), compute_hash(m))
+
+    def test_examples_hash_unchanged(self):
+        examples = os.path.join(os.path.dirname(__file__), "..", "..", "..", "examples")
+        for name in sorted(os.listdir(examples)):
+            if name.endswith(".pairl"):
+                with open(os.path.join(examples, name), encoding="utf-8") as f:
+                    m = parse(f.read())
+                for measure in ("bytes", "tokens"):
+                    with self.subTest(name=name, measure=measure):
+                        out = compact(m, measure=measure)
+                        self.assertEqual(compute_hash(parse(out)), compute_hash(m))
+                        self.assertLessEqual(len(out), len(canonicalize(m, for_hash=False)))
+
+
+class TestLogScan(unittest.TestCase):
+    LOG = ("@v 1\n@id m1\n@sid ref:sess:S1\n\n#u1\nreq{t=a}\n#cost val=1 cur=USD @rid=c1\n#cost[val,cur]\n2 EUR\n"
+           "3 USD @rid=c3\n@v 1\n@id m2\n\n#a2\n#evid[claim,src,conf]\nreq{t=row} s1 0.5\n---\nreq{t=b}\n"
+           "#costly x=1\n#cost val=4 cur=USD\n")
+
+    def test_pushdown_matches_parse(self):
+        hits = list(scan_buffer(self.LOG.encode(), ["#cost"], lambda r: r.kv["cur"] == "USD"))
+        self.assertEqual([(sid, mid, r.kv["val"], r.rid) for sid, mid, r in hits],
+                         [("S1", "m1", "1", "c1"), ("S1", "m1", "3", "c3"), ("", "m2", "4", None)])
+        intents = [(mid, r.kv["t"]) for _, mid, r in scan_buffer(self.LOG.encode(), ["req"])]
+        self.assertEqual(intents, [("m1", "a"), ("m2", "b")])  # a row is not an intent
+
+    def test_block_header_must_end_the_line(self):
+        text = HEADER + "#cost[a]xyz\nreq{t=q}\n#cost val=5 cur=USD\n"
+        self.assertEqual([r.raw for _, _, r in scan_buffer(text.encode(), ["#cost", "req"])],
+                         [r.raw for r in parse(text).records])
+
+    def test_scan_log_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "log.pairl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.LOG)
+            self.assertEqual(len(list(scan_log(path, ["#evid", "#cost"]))), 5)
+            open(os.path.join(d, "empty.pairl"), "w").close()
+            self.assertEqual(list(scan_log(os.path.join(d, "empty.pairl"), ["#cost"])), [])
+
+
 class TestRender(unittest.TestCase):
     def test_render_contains_facts_and_evidence(self):
         out = render(msg('rpt{t=report,s=f,l=2}\n#fact title="Q4"\n#evid claim="rev up" src=s1 conf=0.9\n'))
@@ -102,6 +731,191 @@ class TestRender(unittest.TestCase):
         self.assertIn("rev up", out)
         self.assertIn("90%", out)
 
+    def test_incremental_matches_full(self):
+        s = Session.from_message(msg("#u1\nreq{t=plan}\n#rule lang=de\n"))
+        r = Renderer(s.message)
+        out = r.text()
+        self.assertEqual(out, render(s.message))
+        for inc in ("#a2\n#rule lang=de\n#quota type=t total=5 used=1 rem=4\n", '#fact k="v "\n', "#u3\n", "#s\n",
+                    "#evid claim=x src=s1 conf=0.5\n#quota type=t total=5 used=1 rem=4\n"):
+            pos, delta = r.append(s.append(inc))
+            out = out[:pos] + delta
+            self.assertEqual(out, render(s.message))
+            self.assertEqual(r.text(), out)
+        self.assertEqual(r.current_turn.name, "u3")
+
+    def test_memo_ignores_tags(self):
+        body = "".join(f"#rule lang=de @rid=r{i}\n#quota type=t total=5 used=1 rem=4 @m=u1 @rid=q{i}\n"
+                       for i in range(100))
+        m = msg("#u1\n" + body)
+        r = Renderer(m)
+        self.assertEqual((r.text(), r.misses), (render(m), 2))
+        built = Message(headers=m.headers, records=[Record("rule", "rule", {"lang": "de"}, rid=f"r{i}")
+                                                    for i in range(50)])
+        self.assertEqual(Renderer(built).misses, 1)
+
+
+class TestCLI(unittest.TestCase):
+    def run_cli(self, *args):
+        from pairl.__main__ import main
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            rc = main(["pairl", *args])
+        return rc, out.getvalue(), err.getvalue()
+
+    def test_batch_jsonl_in_input_order(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.mkdir(os.path.join(d, "sub"))
+            names = [f"m{i:02d}.pairl" for i in range(40)] + ["sub/z.pairl"]
+            for i, name in enumerate(names):
+                with open(os.path.join(d, name), "w", encoding="utf-8") as f:
+                    f.write(HEADER + ("#fact a=1 @rid=f1\n" * (1 + (i == 7))))
+            missing = os.path.join(d, "gone.pairl")
+            for jobs in ("1", "3"):
+                rc, out, err = self.run_cli("validate", d, missing, "--jobs", jobs)
+                lines = [json.loads(ln) for ln in out.splitlines()]
+                self.assertEqual([ln["path"] for ln in lines],
+                                 [os.path.join(d, n) for n in names] + [missing])
+                self.assertFalse(lines[7]["valid"])
+                self.assertEqual(lines[0]["hash"], "ref:hash:sha256:" + compute_hash(msg("#fact a=1 @rid=f1\n")))
+                self.assertIn("parse", lines[0]["timings"])
+                self.assertIn("error", lines[-1])
+                self.assertEqual(rc, 2)
+                self.assertEqual(json.loads(err)["summary"]["invalid"], 1)
+                self.assertEqual(json.loads(err)["summary"]["fast_path"], 41)
+            rc, out, _ = self.run_cli("hash", os.path.join(d, "m0*.pairl"))
+            self.assertEqual((rc, len(out.splitlines())), (0, 10))
+
+    def test_single_file_keeps_human_output(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "m.pairl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(HEADER + "#fact a=1\n")
+            rc, out, _ = self.run_cli("validate", "--strict", path)
+            self.assertEqual((rc, out), (0, f"✓ PASSED — {path}\n"))
+            self.assertEqual(self.run_cli("validate")[0], 2)
+
+
+class TestServe(unittest.TestCase):
+    def test_pipelined_requests(self):
+        from pairl.serve import Server
+
+        text = HEADER + "#fact a=1 @rid=f1\n"
+        ops = ("parse", "validate", "hash", "canon", "render")
+        reqs = [{"id": i, "op": op, "text": text} for i, op in enumerate(ops)]
+        reqs += [{"id": 5, "op": "nope", "text": text}, {"id": 6, "op": "validate", "text": text, "timeout": 0}]
+
+        async def go():
+            server = Server(jobs=1, batch_size=4)
+            addr = await server.start(port=0)
+            try:
+                host, port = addr.rsplit(":", 1)
+                reader, writer = await asyncio.open_connection(host, int(port))
+                writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in reqs) + b"{oops\n")
+                await writer.drain()
+                out = [json.loads(await reader.readline()) for _ in range(len(reqs) + 1)]
+                writer.close()
+                return out, server.batches
+            finally:
+                await server.close()
+
+        out, batches = asyncio.run(go())
+        by_id = {r["id"]: r for r in out}
+        self.assertEqual(by_id[1]["result"]["valid"], True)
+        self.assertEqual(by_id[2]["result"], "ref:hash:sha256:" + compute_hash(msg("#fact a=1 @rid=f1\n")))
+        self.assertEqual(by_id[3]["result"], canonicalize(parse(text)))
+        self.assertEqual(by_id[4]["result"], render(parse(text)))
+        self.assertEqual(by_id[0]["result"]["records"], ["#fact a=1 @rid=f1"])
+        self.assertEqual((by_id[5]["ok"], by_id[6]["error"]), (False, "timeout"))
+        self.assertTrue(by_id[None]["error"].startswith("bad request"))
+        self.assertLess(batches, 6)
+
+    def test_run_hashes_like_compute_hash(self):
+        from pairl.serve import run
+
+        text = "@v 1.6\n@id m1\n@ts 1\n@x 1\n@x 2\n\n#fact a=1\n"
+        self.assertEqual(run("hash", text), hash_ref(parse(text)))
+        signed = text.replace("@x 1", f"@hash {hash_ref(parse(text))}\n@x 1")
+        self.assertEqual(run("validate", signed)["errors"], [])
+        self.assertTrue(run("validate", signed.replace("a=1", "a=2"))["errors"][0].startswith("V5"))
+
+
+class TestStats(unittest.TestCase):
+    def test_counts_and_restores(self):
+        import pairl
+        import pairl.core
+        text = HEADER + '#u1\n#fact a=1 @rid=f1\n#evid[claim,src,conf]\n"x" s1 0.5\n"y" s2 0.6 @rid=e2\n'
+        originals = (pairl.compute_hash, pairl.core._INTENT, StreamParser.feed, Validator.feed_many)
+        with instrument() as st:
+            m = parse(text)
+            validate(m)
+            pairl.canonicalize(m)  # the test module's own `canonicalize` was bound before enable()
+        self.assertEqual(originals, (pairl.compute_hash, pairl.core._INTENT, StreamParser.feed, Validator.feed_many))
+        self.assertNotIn("feed", vars(Renderer))
+        self.assertEqual([st.get(f"pairl_parse_{k}_total") for k in ("messages", "bytes", "lines", "records", "rows")],
+                         [1, len(text), 9, 2, 2])
+        self.assertEqual(st.get("pairl_regex_calls_total", fn="_parse_record", pattern="_COMPACT_MARKER"), 2)
+        self.assertEqual(st.get("pairl_stage_calls_total", stage="canonical"), 1)
+        self.assertGreater(st.get("pairl_rule_calls_total", rule="V6"), 0)
+        self.assertGreater(st.get("pairl_rule_seconds_total", rule="V6"), 0)
+        prom = st.prometheus()
+        self.assertIn("# TYPE pairl_rule_seconds_total counter\n", prom)
+        self.assertIn('pairl_stage_calls_total{stage="canonical"} 1\n', prom)
+        parse(text)
+        self.assertEqual(st.get("pairl_parse_messages_total"), 1)
+
+    def test_callback_collector_and_cli(self):
+        from pairl.__main__ import main
+
+        seen = []
+        with instrument(lambda metric, labels, value: seen.append(metric)):
+            render(parse(HEADER + "#fact a=1\n"))
+        self.assertIn("pairl_stage_seconds_total", seen)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "m.pairl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(HEADER + "#fact a=1\n")
+            err = io.StringIO()
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+                self.assertEqual(main(["pairl", "validate", "--stats", path]), 0)
+            self.assertIn("pairl_parse_messages_total 1\n", err.getvalue())
+            st = Stats()
+            st.merge({("pairl_parse_lines_total", ()): 3})
+            st.write_prometheus(os.path.join(d, "pairl.prom"))
+            with open(os.path.join(d, "pairl.prom"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "# TYPE pairl_parse_lines_total counter\npairl_parse_lines_total 3\n")
+
+
+class TestQuote(unittest.TestCase):
+    SOURCE = {"u1": "Please  migrate the\n  billing DB to Postgres 16 by Friday.\nAlso keep the old replica.",
+              "a2": "Migrated. Done."}
+
+    def test_verify_recopy_and_drop(self):
+        m = msg('#u1\n#req content="Please migrate the billing DB [...] keep the old replica"\n'
+                '#a2\n#rpt content="Done [...] Migrated" @rid=r1\n#rpt content="All good" mode=cond\n'
+                '#req content="deploy it" @m=u9\n')
+        ok, order, missing = verify_quotations(m, self.SOURCE)
+        self.assertTrue(ok.ok)
+        self.assertEqual(ok.turn, "u1")
+        self.assertEqual(ok.sources(self.SOURCE["u1"]), ["Please  migrate the\n  billing DB", "keep the old replica"])
+        self.assertEqual(ok.content, "Please migrate the billing DB [...] keep the old replica")
+        self.assertEqual((order.dropped, order.content), (["Migrated"], "Done"))
+        self.assertEqual(order.errors, ["V15: #rpt @rid=r1: fragment 2 not found in turn a2, dropped: 'Migrated'"])
+        self.assertEqual((missing.turn, missing.content, missing.ok), ("u9", "", False))
+
+    def test_index_is_incremental_and_shared(self):
+        from pairl.quote import session_index
+
+        index = QuoteIndex()
+        t = index.turn("u1", "hello wor")
+        self.assertIs(index.turn("u1", "hello world,  again\n"), t)
+        self.assertEqual(t.norm, "hello world, again")
+        self.assertEqual(t.text[t.origin(13):t.origin(17) + 1], "again")
+        self.assertIsNot(index.turn("u1", "other"), t)
+        m = parse("@v 1\n@id m1\n@sid s-quote\n@ts 2026-06-22T10:00:00.000+02:00\n\n#u1\n#req content=\"world\"\n")
+        self.assertTrue(verify_quotations(m, {"u1": "hello world"})[0].ok)
+        self.assertEqual(len(session_index("s-quote")), 1)
+
 
 if __name__ == "__main__":
     unittest.main()